@@ -0,0 +1,39 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'BACKGROUND_TASK_WORKERS', 4),
+    thread_name_prefix='background-task'
+)
+
+
+def _run(func, args, kwargs):
+    try:
+        return func(*args, **kwargs)
+    except Exception as e:
+        logger.error(f"Background task {func.__name__} failed: {str(e)}")
+        raise
+    finally:
+        # Worker threads open their own database connections
+        connections.close_all()
+
+
+def submit(func, *args, **kwargs):
+    """
+    Run a function on the shared background worker pool
+    Returns a concurrent.futures.Future for the result
+    """
+    return _executor.submit(_run, func, args, kwargs)
+
+
+def submit_on_commit(func, *args, **kwargs):
+    """
+    Run a function in the background once the current transaction commits,
+    so the task never sees rows that were rolled back
+    """
+    transaction.on_commit(lambda: submit(func, *args, **kwargs))
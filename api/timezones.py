@@ -0,0 +1,28 @@
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+TIMEZONE_QUERY_PARAM = 'tz'
+TIMEZONE_HEADER = 'HTTP_X_TIMEZONE'
+
+
+def parse_timezone(name):
+    """
+    Return the ZoneInfo for an IANA name such as 'Europe/Berlin', or None
+    """
+    if not name:
+        return None
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def get_client_timezone(request):
+    """
+    The timezone the client sent in the ?tz= parameter or X-Timezone
+    header, or None if it sent no valid one
+    Day boundaries for streaks and calendars are drawn in this timezone.
+    """
+    return parse_timezone(
+        request.query_params.get(TIMEZONE_QUERY_PARAM) or request.META.get(TIMEZONE_HEADER)
+    )
+
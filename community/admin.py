@@ -1,4 +1,4 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from .models import (
     DiscussionGroup,
     DiscussionGroupMembership,
@@ -8,8 +8,12 @@ from .models import (
     CommunityChallenge,
     ChallengeParticipation,
     SuccessStory,
-    StoryEncouragement
+    StoryEncouragement,
+    UserPseudonym,
+    Notification,
+    ReviewQueueEntry
 )
+from .services.story_moderation_service import review_stories
 
 @admin.register(DiscussionGroup)
 class DiscussionGroupAdmin(admin.ModelAdmin):
@@ -55,12 +59,46 @@ class ChallengeParticipationAdmin(admin.ModelAdmin):
 
 @admin.register(SuccessStory)
 class SuccessStoryAdmin(admin.ModelAdmin):
-    list_display = ('title', 'author', 'category', 'is_approved', 'created_at')
+    list_display = ('title', 'author', 'category', 'is_approved', 'is_rejected', 'created_at')
     search_fields = ('title', 'author__username', 'category')
-    list_filter = ('category', 'is_approved', 'created_at')
+    list_filter = ('category', 'is_approved', 'is_rejected', 'created_at')
+    readonly_fields = ('moderation_signals', 'reviewed_at', 'reviewed_by')
+    actions = ['approve_stories', 'reject_stories']
+    
+    @admin.action(description="Approve selected pending stories")
+    def approve_stories(self, request, queryset):
+        updated = review_stories(queryset.values_list('id', flat=True), True, request.user)
+        self.message_user(request, f"{updated} stories approved.", messages.SUCCESS)
+    
+    @admin.action(description="Reject selected pending stories")
+    def reject_stories(self, request, queryset):
+        updated = review_stories(queryset.values_list('id', flat=True), False, request.user)
+        self.message_user(request, f"{updated} stories rejected.", messages.SUCCESS)
 
 @admin.register(StoryEncouragement)
 class StoryEncouragementAdmin(admin.ModelAdmin):
     list_display = ('story', 'user', 'created_at')
     search_fields = ('story__title', 'user__username')
     list_filter = ('created_at',)
+
+
+@admin.register(UserPseudonym)
+class UserPseudonymAdmin(admin.ModelAdmin):
+    list_display = ('pseudonym', 'user', 'created_at')
+    search_fields = ('pseudonym', 'user__username')
+    raw_id_fields = ('user',)
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ('recipient', 'notification_type', 'actor_count', 'is_read', 'updated_at')
+    search_fields = ('recipient__username', 'coalesce_key')
+    list_filter = ('notification_type', 'is_read', 'updated_at')
+    raw_id_fields = ('recipient', 'last_actor', 'thread', 'post', 'challenge')
+
+
+@admin.register(ReviewQueueEntry)
+class ReviewQueueEntryAdmin(admin.ModelAdmin):
+    list_display = ('content_type', 'object_id', 'status', 'excerpt', 'queued_at')
+    search_fields = ('excerpt', 'content_digest')
+    list_filter = ('status', 'content_type', 'queued_at')
@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from community.services.moderation_service import moderation_engine
+
+
+# Inputs that stress each rule: long digit runs and digit groups for the
+# phone/IP rules, dotted word runs for the email rule, and keywords followed
+# by long whitespace for the hate speech rule. None of them match, so the
+# whole text is always scanned.
+WORST_CASE_INPUTS = {
+    'digit_run': lambda n: '1' * n,
+    'digit_groups': lambda n: ('123 456 ' * (n // 8 + 1))[:n],
+    'dotted_groups': lambda n: ('1234.' * (n // 5 + 1))[:n],
+    'dotted_words': lambda n: ('a.b' * (n // 3 + 1))[:n] + '@',
+    'at_signs': lambda n: ('a@' * (n // 2 + 1))[:n],
+    'keyword_spaces': lambda n: 'hate' + ' ' * n + 'x',
+}
+
+
+class Command(BaseCommand):
+    help = 'Time the moderation engine on worst-case inputs of growing size'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='10000,100000,1000000',
+            help='Comma-separated input lengths in characters'
+        )
+        parser.add_argument(
+            '--batch', type=int, default=1000,
+            help='Number of short posts to moderate through check_many'
+        )
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+
+        for name, build in WORST_CASE_INPUTS.items():
+            timings = []
+            for size in sizes:
+                text = build(size)
+                start = time.perf_counter()
+                moderation_engine.first_violation(text)
+                timings.append((size, time.perf_counter() - start))
+
+            base_size, base_time = timings[0]
+            line = ', '.join(
+                f'{size}: {elapsed * 1000:.2f}ms' for size, elapsed in timings
+            )
+            # A linear scan keeps the time per character roughly constant
+            growth = (timings[-1][1] / max(base_time, 1e-9)) / (timings[-1][0] / base_size)
+            self.stdout.write(f'{name:<16} {line} (growth vs linear: {growth:.2f}x)')
+
+        posts = [
+            f'Post {i}: today I tried breathing exercises and felt calmer.'
+            for i in range(options['batch'])
+        ]
+        start = time.perf_counter()
+        moderation_engine.check_many(posts)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f'check_many: {len(posts)} posts in {elapsed * 1000:.2f}ms'
+        )
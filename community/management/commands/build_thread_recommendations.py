@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from community.services.recommendation_service import (
+    build_related_threads, update_related_threads
+)
+
+
+class Command(BaseCommand):
+    help = 'Precompute similar-thread recommendations from a TF-IDF index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Rebuild every thread instead of only threads changed since the last build'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        refreshed = None if options['full'] else update_related_threads()
+        if refreshed is None:
+            indexed = build_related_threads()
+            message = f'Indexed {indexed} threads'
+        else:
+            message = f'Refreshed recommendations for {refreshed} threads'
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'{message} in {elapsed:.2f}s'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from community.services.story_moderation_service import (
+    pending_stories, compute_moderation_signals
+)
+
+
+class Command(BaseCommand):
+    help = 'Compute moderation signals for pending success stories that have none'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Recompute signals for every pending story'
+        )
+
+    def handle(self, *args, **options):
+        queryset = pending_stories()
+        if not options['all']:
+            queryset = queryset.filter(moderation_signals={})
+        story_ids = list(queryset.values_list('id', flat=True))
+        for story_id in story_ids:
+            compute_moderation_signals(story_id)
+        self.stdout.write(self.style.SUCCESS(f'Computed signals for {len(story_ids)} stories'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from community.services.fingerprint_service import prune_fingerprints
+
+
+class Command(BaseCommand):
+    help = 'Delete content fingerprints older than the duplicate detection window'
+
+    def handle(self, *args, **options):
+        removed = prune_fingerprints()
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} expired fingerprints'))
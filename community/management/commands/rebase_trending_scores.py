@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from community.services.trending_service import rebase_scores
+
+
+class Command(BaseCommand):
+    help = 'Rescale trending scores to the current time and drop decayed threads'
+
+    def handle(self, *args, **options):
+        removed = rebase_scores()
+        self.stdout.write(self.style.SUCCESS(
+            f'Trending scores rebased; {removed} decayed threads removed'
+        ))
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('community', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserPseudonym',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='pseudonym', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('pseudonym', models.CharField(max_length=50, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
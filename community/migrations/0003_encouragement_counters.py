@@ -0,0 +1,67 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:41
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def backfill_encouragement_counts(apps, schema_editor):
+    ForumPost = apps.get_model('community', 'ForumPost')
+    SuccessStory = apps.get_model('community', 'SuccessStory')
+    Encouragement = apps.get_model('community', 'Encouragement')
+    StoryEncouragement = apps.get_model('community', 'StoryEncouragement')
+    EncouragementTypeCount = apps.get_model('community', 'EncouragementTypeCount')
+
+    post_counts = Encouragement.objects.values('post_id').annotate(total=Count('id'))
+    for row in post_counts:
+        ForumPost.objects.filter(pk=row['post_id']).update(encouragement_count=row['total'])
+
+    story_counts = StoryEncouragement.objects.values('story_id').annotate(total=Count('id'))
+    for row in story_counts:
+        SuccessStory.objects.filter(pk=row['story_id']).update(encouragement_count=row['total'])
+
+    type_counts = Encouragement.objects.values('post_id', 'encouragement_type').annotate(total=Count('id'))
+    EncouragementTypeCount.objects.bulk_create(
+        [
+            EncouragementTypeCount(
+                post_id=row['post_id'],
+                encouragement_type=row['encouragement_type'],
+                count=row['total']
+            )
+            for row in type_counts
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0002_userpseudonym'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forumpost',
+            name='encouragement_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='successstory',
+            name='encouragement_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='EncouragementTypeCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('encouragement_type', models.CharField(max_length=50)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='encouragement_type_counts', to='community.forumpost')),
+            ],
+            options={
+                'unique_together': {('post', 'encouragement_type')},
+            },
+        ),
+        migrations.RunPython(backfill_encouragement_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:42
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('community', '0003_encouragement_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_type', models.CharField(choices=[('thread', 'New thread'), ('post', 'New reply')], max_length=10)),
+                ('created_at', models.DateTimeField()),
+                ('discussion_group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='community.discussiongroup')),
+                ('post', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='community.forumpost')),
+                ('thread', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='community.forumthread')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Feed entries',
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['user', '-created_at'], name='feedentry_user_created_idx'), models.Index(condition=models.Q(('user__isnull', True)), fields=['discussion_group', '-created_at'], name='feedentry_group_created_idx')],
+            },
+        ),
+    ]
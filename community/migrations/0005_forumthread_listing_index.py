@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0004_feedentry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='forumthread',
+            index=models.Index(fields=['discussion_group', '-is_pinned', '-updated_at', '-id'], name='forumthread_group_listing_idx'),
+        ),
+    ]
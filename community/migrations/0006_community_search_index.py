@@ -0,0 +1,72 @@
+from django.db import migrations
+
+# The full-text index lives outside the ORM models and is maintained by the
+# database itself: a generated tsvector column with a GIN index on
+# PostgreSQL, and an FTS5 table kept in sync by triggers on SQLite.
+# SQLite rebuilds a table to alter it, which drops its triggers, so a later
+# schema change to these tables has to recreate the SQLite triggers too.
+SEARCH_SOURCES = (
+    ('community_forumthread', 'title'),
+    ('community_forumpost', 'content'),
+)
+
+POSTGRES_FORWARD = """
+ALTER TABLE {table} ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', coalesce({column}, ''))) STORED;
+CREATE INDEX {table}_search_idx ON {table} USING GIN (search_vector);
+"""
+
+POSTGRES_REVERSE = """
+DROP INDEX IF EXISTS {table}_search_idx;
+ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector;
+"""
+
+SQLITE_FORWARD = (
+    "CREATE VIRTUAL TABLE {table}_fts USING fts5({column}, content='{table}', content_rowid='id')",
+    "CREATE TRIGGER {table}_fts_ai AFTER INSERT ON {table} BEGIN "
+    "INSERT INTO {table}_fts(rowid, {column}) VALUES (new.id, new.{column}); END",
+    "CREATE TRIGGER {table}_fts_ad AFTER DELETE ON {table} BEGIN "
+    "INSERT INTO {table}_fts({table}_fts, rowid, {column}) VALUES ('delete', old.id, old.{column}); END",
+    "CREATE TRIGGER {table}_fts_au AFTER UPDATE OF {column} ON {table} BEGIN "
+    "INSERT INTO {table}_fts({table}_fts, rowid, {column}) VALUES ('delete', old.id, old.{column}); "
+    "INSERT INTO {table}_fts(rowid, {column}) VALUES (new.id, new.{column}); END",
+    "INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')",
+)
+
+SQLITE_REVERSE = (
+    "DROP TRIGGER IF EXISTS {table}_fts_ai",
+    "DROP TRIGGER IF EXISTS {table}_fts_ad",
+    "DROP TRIGGER IF EXISTS {table}_fts_au",
+    "DROP TABLE IF EXISTS {table}_fts",
+)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table, column in SEARCH_SOURCES:
+        if vendor == 'postgresql':
+            schema_editor.execute(POSTGRES_FORWARD.format(table=table, column=column))
+        elif vendor == 'sqlite':
+            for statement in SQLITE_FORWARD:
+                schema_editor.execute(statement.format(table=table, column=column))
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table, column in SEARCH_SOURCES:
+        if vendor == 'postgresql':
+            schema_editor.execute(POSTGRES_REVERSE.format(table=table))
+        elif vendor == 'sqlite':
+            for statement in SQLITE_REVERSE:
+                schema_editor.execute(statement.format(table=table))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0005_forumthread_listing_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
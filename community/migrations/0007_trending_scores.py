@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0006_community_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingClock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('anchor', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ThreadTrendingScore',
+            fields=[
+                ('thread', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending_score', serialize=False, to='community.forumthread')),
+                ('score', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('discussion_group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='community.discussiongroup')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-score'], name='trending_score_idx'), models.Index(fields=['discussion_group', '-score'], name='trending_group_score_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('community', '0007_trending_scores'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Forum post'), ('thread', 'Thread title'), ('story', 'Success story')], max_length=10)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('fingerprint', models.BigIntegerField()),
+                ('band_0', models.PositiveIntegerField()),
+                ('band_1', models.PositiveIntegerField()),
+                ('band_2', models.PositiveIntegerField()),
+                ('band_3', models.PositiveIntegerField()),
+                ('band_4', models.PositiveIntegerField()),
+                ('band_5', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('author', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['band_0', 'created_at'], name='fingerprint_band_0_idx'), models.Index(fields=['band_1', 'created_at'], name='fingerprint_band_1_idx'), models.Index(fields=['band_2', 'created_at'], name='fingerprint_band_2_idx'), models.Index(fields=['band_3', 'created_at'], name='fingerprint_band_3_idx'), models.Index(fields=['band_4', 'created_at'], name='fingerprint_band_4_idx'), models.Index(fields=['band_5', 'created_at'], name='fingerprint_band_5_idx'), models.Index(fields=['created_at'], name='fingerprint_created_idx')],
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+    ]
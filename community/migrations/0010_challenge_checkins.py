@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:54
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_participant_counts(apps, schema_editor):
+    CommunityChallenge = apps.get_model('community', 'CommunityChallenge')
+    ChallengeParticipation = apps.get_model('community', 'ChallengeParticipation')
+
+    counts = ChallengeParticipation.objects.values('challenge_id').annotate(total=Count('id'))
+    for row in counts:
+        CommunityChallenge.objects.filter(pk=row['challenge_id']).update(participant_count=row['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0009_related_threads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='challengeparticipation',
+            name='checkin_bitmap',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.AddField(
+            model_name='challengeparticipation',
+            name='checkin_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='communitychallenge',
+            name='participant_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='challengeparticipation',
+            index=models.Index(fields=['challenge', '-checkin_count'], name='participation_checkins_idx'),
+        ),
+        migrations.RunPython(backfill_participant_counts, migrations.RunPython.noop),
+    ]
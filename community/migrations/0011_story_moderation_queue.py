@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('community', '0010_challenge_checkins'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='successstory',
+            name='is_rejected',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='successstory',
+            name='moderation_signals',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='successstory',
+            name='reviewed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='successstory',
+            name='reviewed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='successstory',
+            index=models.Index(condition=models.Q(('is_approved', False), ('is_rejected', False)), fields=['created_at', 'id'], name='successstory_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 13:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0012_notifications'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contentfingerprint',
+            index=models.Index(fields=['author', 'created_at'], name='fingerprint_author_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-19 13:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def record_last_actors(apps, schema_editor):
+    Notification = apps.get_model('community', 'Notification')
+    NotificationActor = apps.get_model('community', 'NotificationActor')
+    # Earlier actors are unknown; the last one is enough to avoid counting
+    # them twice on their next event
+    NotificationActor.objects.bulk_create(
+        [
+            NotificationActor(notification_id=notification_id, actor_id=actor_id)
+            for notification_id, actor_id in Notification.objects.filter(
+                is_read=False, last_actor__isnull=False
+            ).values_list('id', 'last_actor_id').iterator()
+        ],
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('community', '0013_fingerprint_author_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationActor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('actor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('notification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='actors', to='community.notification')),
+            ],
+            options={
+                'unique_together': {('notification', 'actor')},
+            },
+        ),
+        migrations.RunPython(record_last_actors, migrations.RunPython.noop),
+    ]
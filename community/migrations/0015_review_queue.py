@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-19 13:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('community', '0014_notification_actors'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewQueueEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('content_digest', models.CharField(max_length=64)),
+                ('excerpt', models.CharField(max_length=200)),
+                ('status', models.CharField(choices=[('pending', 'Awaiting external verdict'), ('flagged', 'Rejected after being accepted')], default='pending', max_length=10)),
+                ('queued_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name_plural': 'Review queue entries',
+                'ordering': ['-queued_at'],
+                'indexes': [models.Index(fields=['content_digest', 'status'], name='review_queue_digest_idx'), models.Index(fields=['status', '-queued_at'], name='review_queue_status_idx')],
+                'unique_together': {('content_type', 'object_id')},
+            },
+        ),
+    ]
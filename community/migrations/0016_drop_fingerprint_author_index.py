@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 13:36
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0015_review_queue'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='contentfingerprint',
+            name='fingerprint_author_idx',
+        ),
+    ]
@@ -1,7 +1,10 @@
 # backend/community/models.py
 from django.db import models
 from django.conf import settings
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
 from django.utils.text import slugify
+from django.utils import timezone
 import uuid
 
 
@@ -71,6 +74,12 @@ class ForumThread(models.Model):
     
     class Meta:
         ordering = ['-is_pinned', '-updated_at']
+        indexes = [
+            models.Index(
+                fields=['discussion_group', '-is_pinned', '-updated_at', '-id'],
+                name='forumthread_group_listing_idx'
+            ),
+        ]
     
     def __str__(self):
         return self.title
@@ -100,6 +109,7 @@ class ForumPost(models.Model):
         through='Encouragement',
         related_name='encouraged_posts'
     )
+    encouragement_count = models.PositiveIntegerField(default=0)
     
     class Meta:
         ordering = ['created_at']
@@ -124,6 +134,25 @@ class Encouragement(models.Model):
         return f"{self.user.username} encouraged post {self.post.id}"
 
 
+class EncouragementTypeCount(models.Model):
+    """
+    Maintained number of encouragements of one type on a post
+    """
+    post = models.ForeignKey(
+        ForumPost,
+        on_delete=models.CASCADE,
+        related_name='encouragement_type_counts'
+    )
+    encouragement_type = models.CharField(max_length=50)
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ('post', 'encouragement_type')
+    
+    def __str__(self):
+        return f"{self.count} {self.encouragement_type} on post {self.post_id}"
+
+
 class CommunityChallenge(models.Model):
     """
     Model for community challenges and group activities
@@ -147,6 +176,8 @@ class CommunityChallenge(models.Model):
         through='ChallengeParticipation',
         related_name='joined_challenges'
     )
+    # Maintained by signals on ChallengeParticipation
+    participant_count = models.PositiveIntegerField(default=0)
     class meta:
         ordering = ['-created_at'] 
     
@@ -163,9 +194,16 @@ class ChallengeParticipation(models.Model):
     joined_at = models.DateTimeField(auto_now_add=True)
     completed = models.BooleanField(default=False)
     completion_date = models.DateTimeField(null=True, blank=True)
+    # Bit i is set when the user checked in on the challenge's day i
+    # (start_date + i days), least significant bit first
+    checkin_bitmap = models.BinaryField(default=b'')
+    checkin_count = models.PositiveIntegerField(default=0)
     
     class Meta:
         unique_together = ('challenge', 'user')
+        indexes = [
+            models.Index(fields=['challenge', '-checkin_count'], name='participation_checkins_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} in {self.challenge.title}"
@@ -185,6 +223,17 @@ class SuccessStory(models.Model):
     )
     is_anonymous = models.BooleanField(default=False)
     is_approved = models.BooleanField(default=False)
+    is_rejected = models.BooleanField(default=False)
+    reviewed_at = models.DateTimeField(null=True, blank=True)
+    reviewed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    # Computed after creation to help moderators triage the queue
+    moderation_signals = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     category = models.CharField(max_length=50)  # anxiety, depression, etc.
     encouragements = models.ManyToManyField(
@@ -192,10 +241,18 @@ class SuccessStory(models.Model):
         through='StoryEncouragement',
         related_name='encouraged_stories'
     )
+    encouragement_count = models.PositiveIntegerField(default=0)
     
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = "Success stories"
+        indexes = [
+            models.Index(
+                fields=['created_at', 'id'],
+                condition=models.Q(is_approved=False, is_rejected=False),
+                name='successstory_pending_idx'
+            ),
+        ]
     
     def __str__(self):
         return self.title
@@ -213,4 +270,305 @@ class StoryEncouragement(models.Model):
         unique_together = ('story', 'user')
     
     def __str__(self):
-        return f"{self.user.username} encouraged story {self.story.id}"
\ No newline at end of file
+        return f"{self.user.username} encouraged story {self.story.id}"
+
+class UserPseudonym(models.Model):
+    """
+    Stable anonymous display name for a user, independent of their username
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='pseudonym'
+    )
+    pseudonym = models.CharField(max_length=50, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return self.pseudonym
+
+
+class FeedEntryType(models.TextChoices):
+    THREAD = 'thread', 'New thread'
+    POST = 'post', 'New reply'
+
+
+class FeedEntry(models.Model):
+    """
+    Entry in the personalized community feed
+    Entries with a user are that user's timeline. Activity in very large
+    groups is written once without a user and merged in when members read.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='feed_entries'
+    )
+    discussion_group = models.ForeignKey(DiscussionGroup, on_delete=models.CASCADE)
+    thread = models.ForeignKey(ForumThread, on_delete=models.CASCADE)
+    post = models.ForeignKey(ForumPost, on_delete=models.CASCADE, null=True, blank=True)
+    entry_type = models.CharField(max_length=10, choices=FeedEntryType.choices)
+    created_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['-created_at', '-id']
+        verbose_name_plural = "Feed entries"
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='feedentry_user_created_idx'),
+            models.Index(
+                fields=['discussion_group', '-created_at'],
+                name='feedentry_group_created_idx',
+                condition=models.Q(user__isnull=True)
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_entry_type_display()} in {self.thread_id}"
+
+
+class ThreadTrendingScore(models.Model):
+    """
+    Exponentially decayed activity score of a forum thread
+    Scores are stored relative to TrendingClock.anchor so that adding
+    activity is a single increment; see services.trending_service.
+    """
+    thread = models.OneToOneField(
+        ForumThread,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending_score'
+    )
+    discussion_group = models.ForeignKey(DiscussionGroup, on_delete=models.CASCADE)
+    score = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score'], name='trending_score_idx'),
+            models.Index(fields=['discussion_group', '-score'], name='trending_group_score_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.thread_id}: {self.score:.2f}"
+
+
+class TrendingClock(models.Model):
+    """
+    Reference time that stored trending scores are scaled to
+    """
+    anchor = models.DateTimeField()
+    
+    def __str__(self):
+        return f"Trending scores relative to {self.anchor}"
+
+
+class FingerprintKind(models.TextChoices):
+    POST = 'post', 'Forum post'
+    THREAD = 'thread', 'Thread title'
+    STORY = 'story', 'Success story'
+
+
+class ContentFingerprint(models.Model):
+    """
+    SimHash fingerprint of a piece of community content
+    The 64-bit fingerprint is also split into six indexed bands of 10-11
+    bits: fingerprints within 5 bits of each other must agree on at least
+    one band, so near-duplicates are found with exact index lookups.
+    See services.fingerprint_service.
+    """
+    kind = models.CharField(max_length=10, choices=FingerprintKind.choices)
+    object_id = models.PositiveBigIntegerField()
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True
+    )
+    fingerprint = models.BigIntegerField()
+    band_0 = models.PositiveIntegerField()
+    band_1 = models.PositiveIntegerField()
+    band_2 = models.PositiveIntegerField()
+    band_3 = models.PositiveIntegerField()
+    band_4 = models.PositiveIntegerField()
+    band_5 = models.PositiveIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        unique_together = ('kind', 'object_id')
+        indexes = [
+            models.Index(fields=['band_0', 'created_at'], name='fingerprint_band_0_idx'),
+            models.Index(fields=['band_1', 'created_at'], name='fingerprint_band_1_idx'),
+            models.Index(fields=['band_2', 'created_at'], name='fingerprint_band_2_idx'),
+            models.Index(fields=['band_3', 'created_at'], name='fingerprint_band_3_idx'),
+            models.Index(fields=['band_4', 'created_at'], name='fingerprint_band_4_idx'),
+            models.Index(fields=['band_5', 'created_at'], name='fingerprint_band_5_idx'),
+            models.Index(fields=['created_at'], name='fingerprint_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} {self.object_id}: {self.fingerprint & 0xFFFFFFFFFFFFFFFF:016x}"
+
+
+class RelatedThread(models.Model):
+    """
+    Precomputed similar thread for a forum thread
+    Built offline by the build_thread_recommendations command; see
+    services.recommendation_service.
+    """
+    thread = models.ForeignKey(
+        ForumThread,
+        on_delete=models.CASCADE,
+        related_name='related_threads'
+    )
+    related = models.ForeignKey(
+        ForumThread,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    score = models.FloatField()
+    
+    class Meta:
+        unique_together = ('thread', 'related')
+        ordering = ['thread', '-score']
+    
+    def __str__(self):
+        return f"{self.thread_id} -> {self.related_id} ({self.score:.3f})"
+
+
+class RecommendationIndexState(models.Model):
+    """
+    When the related-thread index was last built
+    """
+    built_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"Thread recommendations built at {self.built_at}"
+
+
+class NotificationType(models.TextChoices):
+    REPLY = 'reply', 'Reply to your thread'
+    ENCOURAGEMENT = 'encouragement', 'Encouragement on your post'
+    CHALLENGE_JOIN = 'challenge_join', 'New participant in your challenge'
+
+
+class Notification(models.Model):
+    """
+    Inbox entry for a user
+    Events with the same coalesce_key (say, every encouragement on one post)
+    are merged into the recipient's unread notification for that key,
+    counting the distinct actors instead of adding a row each.
+    """
+    recipient = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='notifications'
+    )
+    notification_type = models.CharField(max_length=20, choices=NotificationType.choices)
+    coalesce_key = models.CharField(max_length=100)
+    thread = models.ForeignKey(ForumThread, on_delete=models.CASCADE, null=True, blank=True)
+    post = models.ForeignKey(ForumPost, on_delete=models.CASCADE, null=True, blank=True)
+    challenge = models.ForeignKey(CommunityChallenge, on_delete=models.CASCADE, null=True, blank=True)
+    # Most recent actor, or None when they posted anonymously
+    last_actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    # Distinct actors; anonymous events cannot be told apart, so each counts
+    actor_count = models.PositiveIntegerField(default=1)
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['-updated_at', '-id']
+        indexes = [
+            models.Index(fields=['recipient', '-updated_at', '-id'], name='notification_inbox_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipient', 'coalesce_key'],
+                condition=models.Q(is_read=False),
+                name='notification_unread_key_uniq'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_notification_type_display()} for {self.recipient_id}"
+
+
+class NotificationActor(models.Model):
+    """
+    A user whose events were merged into a notification
+    One row per distinct actor, so actor_count counts people, not events.
+    """
+    notification = models.ForeignKey(
+        Notification,
+        on_delete=models.CASCADE,
+        related_name='actors'
+    )
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    
+    class Meta:
+        unique_together = ('notification', 'actor')
+    
+    def __str__(self):
+        return f"{self.actor_id} on notification {self.notification_id}"
+
+
+class NotificationCounter(models.Model):
+    """
+    Number of unread notifications, maintained alongside the inbox
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='notification_counter'
+    )
+    unread_count = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.user_id}: {self.unread_count} unread"
+
+
+class ReviewStatus(models.TextChoices):
+    PENDING = 'pending', 'Awaiting external verdict'
+    FLAGGED = 'flagged', 'Rejected after being accepted'
+
+
+class ReviewQueueEntry(models.Model):
+    """
+    Content accepted while its external moderation check was still running
+    The entry waits as pending until the verdict arrives: rejected content
+    is flagged for a moderator, accepted content leaves the queue.
+    See services.moderation_service.
+    """
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveBigIntegerField()
+    content_object = GenericForeignKey('content_type', 'object_id')
+    content_digest = models.CharField(max_length=64)
+    excerpt = models.CharField(max_length=200)
+    status = models.CharField(max_length=10, choices=ReviewStatus.choices, default=ReviewStatus.PENDING)
+    queued_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['-queued_at']
+        verbose_name_plural = "Review queue entries"
+        unique_together = ('content_type', 'object_id')
+        indexes = [
+            models.Index(fields=['content_digest', 'status'], name='review_queue_digest_idx'),
+            models.Index(fields=['status', '-queued_at'], name='review_queue_status_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.content_type_id}:{self.object_id} ({self.status})"
@@ -4,9 +4,16 @@ from django.contrib.auth import get_user_model
 from .models import (
     DiscussionGroup, DiscussionGroupMembership, ForumThread, ForumPost,
     Encouragement, CommunityChallenge, ChallengeParticipation,
-    SuccessStory, StoryEncouragement
+    SuccessStory, StoryEncouragement, FeedEntry, RelatedThread,
+    Notification, NotificationType
+)
+from .services.anonymizer_service import anonymize_user_data, get_pseudonyms
+from .services.thread_service import (
+    get_member_group_ids, get_thread_for_post, get_related_threads
+)
+from .services.encouragement_service import (
+    get_encouraged_post_ids, get_encouraged_story_ids
 )
-from .services.anonymizer_service import anonymize_user_data
 
 User = get_user_model()
 
@@ -22,7 +29,7 @@ class AnonymousUserSerializer(serializers.ModelSerializer):
         fields = ['username']
     
     def get_username(self, obj):
-        return anonymize_user_data(obj.username)
+        return anonymize_user_data(obj)
 
 
 class DiscussionGroupSerializer(serializers.ModelSerializer):
@@ -47,7 +54,7 @@ class DiscussionGroupSerializer(serializers.ModelSerializer):
     def get_is_member(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.members.filter(id=request.user.id).exists()
+            return obj.id in get_member_group_ids(request.user)
         return False
 
 
@@ -65,6 +72,8 @@ class ForumThreadListSerializer(serializers.ModelSerializer):
         ]
     
     def get_post_count(self, obj):
+        if hasattr(obj, 'post_count'):
+            return obj.post_count
         return obj.posts.count()
     
     def get_author(self, obj):
@@ -75,13 +84,41 @@ class ForumThreadListSerializer(serializers.ModelSerializer):
         return None
     
     def get_last_post_at(self, obj):
+        if hasattr(obj, 'last_post_at'):
+            return obj.last_post_at or obj.created_at
         last_post = obj.posts.order_by('-created_at').first()
         return last_post.created_at if last_post else obj.created_at
 
 
+class ThreadReferenceField(serializers.PrimaryKeyRelatedField):
+    """
+    Thread reference for a new post, resolved together with the author's
+    membership of its group in a single query
+    Returns a ForumThread carrying only its id, group, locked flag and
+    is_member.
+    """
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            thread_id = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        request = self.context.get('request')
+        meta = get_thread_for_post(thread_id, request.user if request else None)
+        if meta is None:
+            self.fail('does_not_exist', pk_value=data)
+        is_member = meta.pop('is_member')
+        thread = ForumThread(id=thread_id, **meta)
+        thread.is_member = is_member
+        return thread
+
+
 class ForumPostSerializer(serializers.ModelSerializer):
+    thread = ThreadReferenceField(queryset=ForumThread.objects.all())
     author_name = serializers.SerializerMethodField()
-    encouragement_count = serializers.SerializerMethodField()
+    encouragement_count = serializers.IntegerField(read_only=True)
+    encouragement_types = serializers.SerializerMethodField()
     has_encouraged = serializers.SerializerMethodField()
     
     class Meta:
@@ -89,7 +126,7 @@ class ForumPostSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'thread', 'content', 'author', 'author_name',
             'is_anonymous', 'created_at', 'updated_at',
-            'encouragement_count', 'has_encouraged'
+            'encouragement_count', 'encouragement_types', 'has_encouraged'
         ]
     
     def get_author_name(self, obj):
@@ -99,26 +136,47 @@ class ForumPostSerializer(serializers.ModelSerializer):
             return obj.author.username
         return None
     
-    def get_encouragement_count(self, obj):
-        return obj.encouragements.count()
+    def get_encouragement_types(self, obj):
+        if not obj.encouragement_count:
+            return {}
+        return {
+            type_count.encouragement_type: type_count.count
+            for type_count in obj.encouragement_type_counts.all()
+            if type_count.count
+        }
     
     def get_has_encouraged(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.encouragements.filter(id=request.user.id).exists()
+            # Loaded once and shared by every post in the response
+            if 'encouraged_post_ids' not in self.context:
+                self.context['encouraged_post_ids'] = get_encouraged_post_ids(request.user)
+            return obj.id in self.context['encouraged_post_ids']
         return False
 
 
+class RelatedThreadSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='related_id')
+    title = serializers.CharField(source='related.title')
+    discussion_group = serializers.IntegerField(source='related.discussion_group_id')
+    group_name = serializers.CharField(source='related.discussion_group.name')
+    
+    class Meta:
+        model = RelatedThread
+        fields = ['id', 'title', 'discussion_group', 'group_name', 'score']
+
+
 class ForumThreadDetailSerializer(serializers.ModelSerializer):
     posts = ForumPostSerializer(many=True, read_only=True)
     author = serializers.SerializerMethodField()
+    related_threads = serializers.SerializerMethodField()
     
     class Meta:
         model = ForumThread
         fields = [
             'id', 'title', 'discussion_group', 'created_by', 'author',
             'is_anonymous', 'is_pinned', 'is_locked', 'created_at', 
-            'updated_at', 'posts'
+            'updated_at', 'posts', 'related_threads'
         ]
     
     def get_author(self, obj):
@@ -127,6 +185,9 @@ class ForumThreadDetailSerializer(serializers.ModelSerializer):
         elif obj.created_by:
             return obj.created_by.username
         return None
+    
+    def get_related_threads(self, obj):
+        return RelatedThreadSerializer(get_related_threads(obj.id), many=True).data
 
 
 class EncouragementSerializer(serializers.ModelSerializer):
@@ -141,7 +202,7 @@ class EncouragementSerializer(serializers.ModelSerializer):
 
 
 class CommunityChallengeSerializer(serializers.ModelSerializer):
-    participant_count = serializers.SerializerMethodField()
+    participant_count = serializers.IntegerField(read_only=True)
     is_participating = serializers.SerializerMethodField()
 
     start_date = serializers.DateField(format=None)  # ⬅️ return ISO 8601
@@ -156,18 +217,22 @@ class CommunityChallengeSerializer(serializers.ModelSerializer):
             'challenge_type', 'participant_count', 'is_participating'
         ]
 
-    def get_participant_count(self, obj):
-        return obj.participants.count()
-
     def get_is_participating(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.participants.filter(id=request.user.id).exists()
+            # Look up the user's challenges once per response, not per challenge
+            if 'joined_challenge_ids' not in self.context:
+                self.context['joined_challenge_ids'] = set(
+                    ChallengeParticipation.objects.filter(
+                        user=request.user
+                    ).values_list('challenge_id', flat=True)
+                )
+            return obj.id in self.context['joined_challenge_ids']
         return False
     
 class SuccessStorySerializer(serializers.ModelSerializer):
     author_name = serializers.SerializerMethodField()
-    encouragement_count = serializers.SerializerMethodField()
+    encouragement_count = serializers.IntegerField(read_only=True)
     has_encouraged = serializers.SerializerMethodField()
     
     class Meta:
@@ -186,13 +251,12 @@ class SuccessStorySerializer(serializers.ModelSerializer):
             return obj.author.username
         return None
     
-    def get_encouragement_count(self, obj):
-        return obj.encouragements.count()
-    
     def get_has_encouraged(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.encouragements.filter(id=request.user.id).exists()
+            if 'encouraged_story_ids' not in self.context:
+                self.context['encouraged_story_ids'] = get_encouraged_story_ids(request.user)
+            return obj.id in self.context['encouraged_story_ids']
         return False
     
     def create(self, validated_data):
@@ -200,6 +264,29 @@ class SuccessStorySerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class StoryModerationSerializer(serializers.ModelSerializer):
+    """
+    Pending story as seen by moderators, with the real author shown
+    """
+    author_username = serializers.CharField(source='author.username', default=None, read_only=True)
+    
+    class Meta:
+        model = SuccessStory
+        fields = [
+            'id', 'title', 'content', 'author', 'author_username',
+            'is_anonymous', 'category', 'created_at', 'moderation_signals'
+        ]
+        read_only_fields = fields
+
+
+class StoryReviewSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=10000
+    )
+
+
 class StoryEncouragementSerializer(serializers.ModelSerializer):
     class Meta:
         model = StoryEncouragement
@@ -208,4 +295,85 @@ class StoryEncouragementSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
-        return super().create(validated_data)
\ No newline at end of file
+        return super().create(validated_data)
+
+
+class FeedEntrySerializer(serializers.ModelSerializer):
+    group = serializers.SerializerMethodField()
+    thread_title = serializers.CharField(source='thread.title', read_only=True)
+    author_name = serializers.SerializerMethodField()
+    excerpt = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = FeedEntry
+        fields = [
+            'id', 'entry_type', 'group', 'thread', 'thread_title',
+            'post', 'author_name', 'excerpt', 'created_at'
+        ]
+    
+    def get_group(self, obj):
+        return {
+            'id': obj.discussion_group.id,
+            'name': obj.discussion_group.name,
+            'slug': obj.discussion_group.slug,
+        }
+    
+    def get_author_name(self, obj):
+        source = obj.post or obj.thread
+        author = obj.post.author if obj.post else obj.thread.created_by
+        if source.is_anonymous:
+            return "Anonymous"
+        elif author:
+            return author.username
+        return None
+    
+    def get_excerpt(self, obj):
+        if obj.post:
+            return obj.post.content[:200]
+        return None
+
+
+class NotificationListSerializer(serializers.ListSerializer):
+    """
+    Resolves actor pseudonyms for a whole page of notifications in one query
+    """
+    def to_representation(self, data):
+        notifications = list(data.all() if hasattr(data, 'all') else data)
+        get_pseudonyms([notification.last_actor_id for notification in notifications])
+        return super().to_representation(notifications)
+
+
+class NotificationSerializer(serializers.ModelSerializer):
+    actor_name = serializers.SerializerMethodField()
+    message = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Notification
+        fields = [
+            'id', 'notification_type', 'thread', 'post', 'challenge',
+            'actor_name', 'actor_count', 'message', 'is_read',
+            'created_at', 'updated_at'
+        ]
+        list_serializer_class = NotificationListSerializer
+    
+    def get_actor_name(self, obj):
+        # Pseudonyms, as elsewhere in the community: usernames are private
+        if obj.last_actor_id is None:
+            return None
+        return get_pseudonyms([obj.last_actor_id])[obj.last_actor_id]
+    
+    def get_message(self, obj):
+        actor = self.get_actor_name(obj) or "Someone"
+        others = obj.actor_count - 1
+        if obj.notification_type == NotificationType.REPLY:
+            if others:
+                return f"{obj.actor_count} people replied to your thread"
+            return f"{actor} replied to your thread"
+        
+        if obj.notification_type == NotificationType.ENCOURAGEMENT:
+            action = "encouraged your post"
+        else:
+            action = "joined your challenge"
+        if others:
+            return f"{actor} and {others} other{'s' if others > 1 else ''} {action}"
+        return f"{actor} {action}"
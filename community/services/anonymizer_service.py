@@ -1,33 +1,109 @@
-import hashlib
-import uuid
+import secrets
+import threading
+from collections import OrderedDict
 from django.conf import settings
 
-def anonymize_user_data(username):
+ADJECTIVES = ["Brave", "Calm", "Kind", "Wise", "Gentle", "Quiet", "Happy", "Friendly"]
+ANIMALS = ["Wolf", "Bear", "Eagle", "Deer", "Fox", "Owl", "Tiger", "Dolphin"]
+
+
+class _LRUCache:
+    """
+    Small thread-safe LRU mapping of user id to pseudonym
+    Pseudonyms never change once stored, so entries never need invalidating.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+
+_pseudonym_cache = _LRUCache(getattr(settings, 'PSEUDONYM_CACHE_SIZE', 10000))
+
+
+def _generate_pseudonym():
     """
-    Anonymize a username while keeping it consistent for the same input
-    Returns an anonymized version of the username
+    Create a random anonymous name, e.g. CalmOwl3fa9
+    """
+    return f"{secrets.choice(ADJECTIVES)}{secrets.choice(ANIMALS)}{secrets.token_hex(2)}"
+
+
+def get_pseudonyms(user_ids):
     """
-    if not username:
+    Resolve pseudonyms for many users at once
+    Users without a stored pseudonym get one created in bulk.
+    Returns a dict of user id to pseudonym.
+    """
+    from ..models import UserPseudonym
+
+    result = {}
+    missing = set()
+    for user_id in user_ids:
+        if user_id is None:
+            continue
+        pseudonym = _pseudonym_cache.get(user_id)
+        if pseudonym is None:
+            missing.add(user_id)
+        else:
+            result[user_id] = pseudonym
+
+    if missing:
+        stored = UserPseudonym.objects.filter(
+            user_id__in=missing
+        ).values_list('user_id', 'pseudonym')
+        for user_id, pseudonym in stored:
+            result[user_id] = pseudonym
+            missing.discard(user_id)
+
+    # A generated name can collide with an existing one; ignore_conflicts
+    # skips those rows and the next round retries them with a new name
+    while missing:
+        UserPseudonym.objects.bulk_create(
+            [
+                UserPseudonym(user_id=user_id, pseudonym=_generate_pseudonym())
+                for user_id in missing
+            ],
+            ignore_conflicts=True
+        )
+        stored = UserPseudonym.objects.filter(
+            user_id__in=missing
+        ).values_list('user_id', 'pseudonym')
+        for user_id, pseudonym in stored:
+            result[user_id] = pseudonym
+            missing.discard(user_id)
+
+    for user_id, pseudonym in result.items():
+        _pseudonym_cache.set(user_id, pseudonym)
+    return result
+
+
+def get_pseudonym(user):
+    """
+    Return the stable pseudonym for a user, creating it on first use
+    """
+    if user is None or user.pk is None:
         return "Anonymous"
-    
-    # Create a deterministic but anonymized username
-    salt = getattr(settings, 'ANONYMIZER_SALT', 'default_salt_value')
-    hash_input = f"{username}{salt}"
-    hash_obj = hashlib.md5(hash_input.encode())
-    hash_hex = hash_obj.hexdigest()
-    
-    # Create a predictable anonymous name using the hash
-    adjectives = ["Brave", "Calm", "Kind", "Wise", "Gentle", "Quiet", "Happy", "Friendly"]
-    animals = ["Wolf", "Bear", "Eagle", "Deer", "Fox", "Owl", "Tiger", "Dolphin"]
-    
-    # Use the hash to deterministically select an adjective and animal
-    adj_index = int(hash_hex[0:2], 16) % len(adjectives)
-    animal_index = int(hash_hex[2:4], 16) % len(animals)
-    
-    # Construct anonymous name
-    anonymous_name = f"{adjectives[adj_index]}{animals[animal_index]}"
-    
-    # Add a short unique identifier to avoid collisions
-    short_id = hash_hex[-4:]
-    
-    return f"{anonymous_name}{short_id}"
+    return get_pseudonyms([user.pk])[user.pk]
+
+
+def anonymize_user_data(user):
+    """
+    Anonymize a user while keeping the name consistent for the same user
+    Returns the user's stored pseudonym
+    """
+    return get_pseudonym(user)
@@ -0,0 +1,175 @@
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from api.background import submit_on_commit
+from ..models import ChallengeParticipation
+from .anonymizer_service import get_pseudonyms
+from .notification_service import notify_challenge_join
+
+
+class ChallengeCheckInError(Exception):
+    """Exception raised when a check-in falls outside the challenge"""
+    pass
+
+
+class AlreadyParticipatingError(Exception):
+    """Exception raised when joining a challenge twice"""
+    pass
+
+
+def _to_int(bitmap):
+    return int.from_bytes(bytes(bitmap or b''), 'little')
+
+
+def _to_bytes(days):
+    return days.to_bytes((days.bit_length() + 7) // 8, 'little')
+
+
+def challenge_length(challenge):
+    return (challenge.end_date - challenge.start_date).days + 1
+
+
+def day_index(challenge, day):
+    """
+    Return the bit position of a date in the challenge's check-in bitmap
+    Raises ChallengeCheckInError for dates outside the challenge.
+    """
+    index = (day - challenge.start_date).days
+    if index < 0 or index >= challenge_length(challenge):
+        raise ChallengeCheckInError("That day is not part of this challenge.")
+    return index
+
+
+def current_streak(days, through):
+    """
+    Number of consecutive check-ins ending on day `through`, or on the day
+    before if there is no check-in on `through` yet
+    """
+    if through < 0:
+        return 0
+    window = days & ((1 << (through + 1)) - 1)
+    if not window >> through & 1:
+        if through == 0 or not window >> (through - 1) & 1:
+            return 0
+        through -= 1
+    # Flip the bits up to `through`; the nearest zero below it is the
+    # highest set bit of the flipped window
+    gaps = ~window & ((1 << (through + 1)) - 1)
+    return through + 1 - gaps.bit_length() if gaps else through + 1
+
+
+def longest_streak(days):
+    """
+    Length of the longest run of consecutive check-ins
+    Each step shortens every run by one, so this takes as many steps as
+    the longest run rather than the length of the challenge.
+    """
+    length = 0
+    while days:
+        days &= days >> 1
+        length += 1
+    return length
+
+
+def participation_progress(participation, challenge, today=None):
+    """
+    Return check-in statistics for one participation
+    """
+    today = today or timezone.localdate()
+    length = challenge_length(challenge)
+    today_index = (today - challenge.start_date).days
+    elapsed = min(max(today_index + 1, 0), length)
+    days = _to_int(participation.checkin_bitmap)
+    return {
+        'checkins': participation.checkin_count,
+        'checked_in_today': 0 <= today_index < length and bool(days >> today_index & 1),
+        'current_streak': current_streak(days, elapsed - 1),
+        'longest_streak': longest_streak(days),
+        'completion_rate': round(participation.checkin_count / elapsed, 3) if elapsed else 0.0,
+        'days': [bool(days >> index & 1) for index in range(elapsed)],
+        'completed': participation.completed,
+        'completion_date': participation.completion_date,
+    }
+
+
+def join_challenge(user, challenge):
+    """
+    Add the user to a challenge
+    Raises AlreadyParticipatingError if they have already joined.
+    """
+    try:
+        with transaction.atomic():
+            participation = ChallengeParticipation.objects.create(user=user, challenge=challenge)
+            submit_on_commit(notify_challenge_join, challenge.id, user.pk)
+    except IntegrityError:
+        raise AlreadyParticipatingError
+    return participation
+
+
+def check_in(user, challenge, day=None):
+    """
+    Record the user's check-in for a day of the challenge (today by default)
+    Returns (participation, created) where created is False if the user had
+    already checked in that day. Raises ChallengeParticipation.DoesNotExist
+    if the user has not joined, and ChallengeCheckInError for days outside
+    the challenge or in the future.
+    """
+    today = timezone.localdate()
+    day = day or today
+    if day > today:
+        raise ChallengeCheckInError("You cannot check in for a future day.")
+    bit = 1 << day_index(challenge, day)
+
+    with transaction.atomic():
+        participation = ChallengeParticipation.objects.select_for_update().get(
+            user=user,
+            challenge=challenge
+        )
+        days = _to_int(participation.checkin_bitmap)
+        if days & bit:
+            return participation, False
+        participation.checkin_bitmap = _to_bytes(days | bit)
+        participation.checkin_count += 1
+        participation.save(update_fields=['checkin_bitmap', 'checkin_count'])
+    return participation, True
+
+
+def complete_challenge(participation):
+    """
+    Mark a participation completed, recording when it happened the first time
+    """
+    if not participation.completed:
+        participation.completed = True
+        participation.completion_date = timezone.now()
+        participation.save(update_fields=['completed', 'completion_date'])
+    return participation
+
+
+def get_leaderboard(challenge, limit=10):
+    """
+    Return the participants with the most check-ins, with their streaks
+    Ranking uses the maintained check-in counts, served by an index, with
+    earlier joiners first on ties; names are pseudonyms.
+    """
+    today = timezone.localdate()
+    through = min((today - challenge.start_date).days, challenge_length(challenge) - 1)
+    rows = ChallengeParticipation.objects.filter(challenge=challenge).order_by(
+        '-checkin_count', 'joined_at'
+    ).values_list('user_id', 'checkin_count', 'checkin_bitmap', 'completed')[:limit]
+
+    entries = []
+    for user_id, checkins, bitmap, completed in rows:
+        days = _to_int(bitmap)
+        entries.append({
+            'user_id': user_id,
+            'checkins': checkins,
+            'current_streak': current_streak(days, through),
+            'longest_streak': longest_streak(days),
+            'completed': completed,
+        })
+
+    pseudonyms = get_pseudonyms([entry['user_id'] for entry in entries])
+    for rank, entry in enumerate(entries, start=1):
+        entry['rank'] = rank
+        entry['name'] = pseudonyms.get(entry.pop('user_id'))
+    return entries
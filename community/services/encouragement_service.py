@@ -0,0 +1,210 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from api.background import submit_on_commit
+from ..models import (
+    ForumPost, Encouragement, EncouragementTypeCount,
+    SuccessStory, StoryEncouragement
+)
+from .live_updates import get_hub, thread_channel
+from .trending_service import record_activity
+from .notification_service import notify_encouragement
+
+ENCOURAGED_POSTS_CACHE_KEY = 'community:encouraged_posts:{user_id}'
+ENCOURAGED_STORIES_CACHE_KEY = 'community:encouraged_stories:{user_id}'
+
+
+def _cache_timeout():
+    return getattr(settings, 'ENCOURAGED_SET_CACHE_TIMEOUT', 60 * 60)
+
+
+def get_encouraged_post_ids(user):
+    """
+    Return the set of post ids the user has encouraged
+    """
+    key = ENCOURAGED_POSTS_CACHE_KEY.format(user_id=user.pk)
+    post_ids = cache.get(key)
+    if post_ids is None:
+        post_ids = frozenset(
+            Encouragement.objects.filter(user=user).values_list('post_id', flat=True)
+        )
+        cache.set(key, post_ids, _cache_timeout())
+    return post_ids
+
+
+def get_encouraged_story_ids(user):
+    """
+    Return the set of story ids the user has encouraged
+    """
+    key = ENCOURAGED_STORIES_CACHE_KEY.format(user_id=user.pk)
+    story_ids = cache.get(key)
+    if story_ids is None:
+        story_ids = frozenset(
+            StoryEncouragement.objects.filter(user=user).values_list('story_id', flat=True)
+        )
+        cache.set(key, story_ids, _cache_timeout())
+    return story_ids
+
+
+def _adjust_type_count(post_id, encouragement_type, delta):
+    updated = EncouragementTypeCount.objects.filter(
+        post_id=post_id,
+        encouragement_type=encouragement_type
+    ).update(count=F('count') + delta)
+
+    if not updated and delta > 0:
+        try:
+            with transaction.atomic():
+                EncouragementTypeCount.objects.create(
+                    post_id=post_id,
+                    encouragement_type=encouragement_type,
+                    count=delta
+                )
+        except IntegrityError:
+            # Created concurrently by another toggle
+            EncouragementTypeCount.objects.filter(
+                post_id=post_id,
+                encouragement_type=encouragement_type
+            ).update(count=F('count') + delta)
+
+
+def add_post_encouragement(user, post_id, encouragement_type='support'):
+    """
+    Record the user's encouragement of a post, keeping its counters, the
+    user's encouraged set, live viewers and the post's author up to date
+    Raises ForumPost.DoesNotExist if the post does not exist and
+    IntegrityError if the user has already encouraged it.
+    """
+    with transaction.atomic():
+        # The counter update doubles as the existence check for the post
+        if not ForumPost.objects.filter(pk=post_id).update(
+            encouragement_count=F('encouragement_count') + 1
+        ):
+            raise ForumPost.DoesNotExist
+        encouragement = Encouragement.objects.create(
+            post_id=post_id,
+            user=user,
+            encouragement_type=encouragement_type
+        )
+        _adjust_type_count(post_id, encouragement_type, 1)
+
+        key = ENCOURAGED_POSTS_CACHE_KEY.format(user_id=user.pk)
+        transaction.on_commit(lambda: cache.delete(key))
+        submit_on_commit(post_encouragement_changed, post_id, user.pk)
+    return encouragement
+
+
+def remove_post_encouragement(user, post_id):
+    """
+    Withdraw the user's encouragement of a post, with the same upkeep as
+    add_post_encouragement
+    Returns False if the user had not encouraged it.
+    """
+    with transaction.atomic():
+        existing = Encouragement.objects.select_for_update().filter(
+            post_id=post_id,
+            user=user
+        ).first()
+        if existing is None:
+            return False
+        existing.delete()
+        ForumPost.objects.filter(pk=post_id).update(
+            encouragement_count=F('encouragement_count') - 1
+        )
+        _adjust_type_count(post_id, existing.encouragement_type, -1)
+
+        key = ENCOURAGED_POSTS_CACHE_KEY.format(user_id=user.pk)
+        transaction.on_commit(lambda: cache.delete(key))
+        submit_on_commit(post_encouragement_changed, post_id)
+    return True
+
+
+def toggle_post_encouragement(user, post_id, encouragement_type='support'):
+    """
+    Add the user's encouragement to a post, or remove it if already given
+    Returns the new Encouragement, or None if it was removed.
+    Raises ForumPost.DoesNotExist if the post does not exist.
+    """
+    with transaction.atomic():
+        if remove_post_encouragement(user, post_id):
+            return None
+        return add_post_encouragement(user, post_id, encouragement_type)
+
+
+def post_encouragement_changed(post_id, encouraged_by=None):
+    """
+    Tell viewers of the post's thread about its new encouragement count
+    When encouraged_by is given the encouragement was added: it counts
+    towards the thread's trending score and the post's author is notified.
+    """
+    post = ForumPost.objects.filter(pk=post_id).values(
+        'id', 'author_id', 'thread_id', 'thread__discussion_group_id', 'encouragement_count'
+    ).first()
+    if post is None:
+        return
+    get_hub().publish(
+        thread_channel(post['thread_id']),
+        'encouragement_changed',
+        {'post': post['id'], 'encouragement_count': post['encouragement_count']}
+    )
+    if encouraged_by is not None:
+        record_activity(post['thread_id'], post['thread__discussion_group_id'], 'encouragement')
+        notify_encouragement(post['id'], post['author_id'], post['thread_id'], encouraged_by)
+
+
+def add_story_encouragement(user, story_id):
+    """
+    Record the user's encouragement of a story, keeping its counter and
+    the user's encouraged set up to date
+    Raises SuccessStory.DoesNotExist if the story does not exist and
+    IntegrityError if the user has already encouraged it.
+    """
+    with transaction.atomic():
+        if not SuccessStory.objects.filter(pk=story_id).update(
+            encouragement_count=F('encouragement_count') + 1
+        ):
+            raise SuccessStory.DoesNotExist
+        encouragement = StoryEncouragement.objects.create(
+            story_id=story_id,
+            user=user
+        )
+
+        key = ENCOURAGED_STORIES_CACHE_KEY.format(user_id=user.pk)
+        transaction.on_commit(lambda: cache.delete(key))
+    return encouragement
+
+
+def remove_story_encouragement(user, story_id):
+    """
+    Withdraw the user's encouragement of a story
+    Returns False if the user had not encouraged it.
+    """
+    with transaction.atomic():
+        existing = StoryEncouragement.objects.select_for_update().filter(
+            story_id=story_id,
+            user=user
+        ).first()
+        if existing is None:
+            return False
+        existing.delete()
+        SuccessStory.objects.filter(pk=story_id).update(
+            encouragement_count=F('encouragement_count') - 1
+        )
+
+        key = ENCOURAGED_STORIES_CACHE_KEY.format(user_id=user.pk)
+        transaction.on_commit(lambda: cache.delete(key))
+    return True
+
+
+def toggle_story_encouragement(user, story_id):
+    """
+    Add the user's encouragement to a story, or remove it if already given
+    Returns the new StoryEncouragement, or None if it was removed.
+    Raises SuccessStory.DoesNotExist if the story does not exist.
+    """
+    with transaction.atomic():
+        if remove_story_encouragement(user, story_id):
+            return None
+        return add_story_encouragement(user, story_id)
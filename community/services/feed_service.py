@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.db.models import Q
+
+from api.background import submit_on_commit
+from ..models import (
+    DiscussionGroupMembership, FeedEntry, FeedEntryType, ForumThread, ForumPost
+)
+
+
+def _fan_out_limit():
+    return getattr(settings, 'COMMUNITY_FEED_FANOUT_LIMIT', 1000)
+
+
+def fan_out_activity(entry_type, thread_id, post_id=None):
+    """
+    Write a feed entry for new thread or reply activity
+    Groups up to COMMUNITY_FEED_FANOUT_LIMIT members get one entry per
+    member (fan-out on write); larger groups get a single group entry that
+    members pick up when they read their feed (fan-out on read).
+    """
+    if post_id is not None:
+        post = ForumPost.objects.select_related('thread').filter(id=post_id).first()
+        if post is None:
+            return
+        thread = post.thread
+        actor_id = post.author_id
+        created_at = post.created_at
+    else:
+        thread = ForumThread.objects.filter(id=thread_id).first()
+        if thread is None:
+            return
+        actor_id = thread.created_by_id
+        created_at = thread.created_at
+
+    entry = dict(
+        discussion_group_id=thread.discussion_group_id,
+        thread_id=thread.id,
+        post_id=post_id,
+        entry_type=entry_type,
+        created_at=created_at
+    )
+
+    members = DiscussionGroupMembership.objects.filter(
+        discussion_group_id=thread.discussion_group_id
+    )
+    limit = _fan_out_limit()
+    member_ids = list(members.values_list('user_id', flat=True)[:limit + 1])
+
+    if len(member_ids) > limit:
+        FeedEntry.objects.create(user=None, **entry)
+        return
+
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(user_id=user_id, **entry)
+            for user_id in member_ids
+            if user_id != actor_id
+        ],
+        batch_size=1000
+    )
+
+
+def schedule_thread_fan_out(thread):
+    submit_on_commit(fan_out_activity, FeedEntryType.THREAD, thread.id)
+
+
+def schedule_post_fan_out(post):
+    submit_on_commit(fan_out_activity, FeedEntryType.POST, post.thread_id, post.id)
+
+
+def get_feed_queryset(user):
+    """
+    Return the user's feed, newest first
+    Combines the user's own timeline with group entries of the groups they
+    belong to, all served from the feed entry indexes. Entries from groups
+    the user has since left, and the user's own activity picked up from
+    group entries, are left out.
+    """
+    group_ids = DiscussionGroupMembership.objects.filter(
+        user=user
+    ).values('discussion_group_id')
+
+    return FeedEntry.objects.filter(
+        Q(user=user) | Q(user__isnull=True),
+        discussion_group_id__in=group_ids
+    ).exclude(
+        Q(entry_type=FeedEntryType.THREAD, thread__created_by=user)
+        | Q(entry_type=FeedEntryType.POST, post__author=user)
+    ).select_related(
+        'discussion_group', 'thread', 'thread__created_by', 'post', 'post__author'
+    )
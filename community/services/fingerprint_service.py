@@ -0,0 +1,142 @@
+import hashlib
+import re
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import ContentFingerprint, FingerprintKind
+
+FINGERPRINT_BITS = 64
+FINGERPRINT_MASK = (1 << FINGERPRINT_BITS) - 1
+# Widths of the indexed bands, lowest bits first
+BAND_WIDTHS = (11, 11, 11, 11, 10, 10)
+# Fingerprints this many bits apart or fewer are near-duplicates. Each
+# differing bit can spoil at most one band, so any two of them still share
+# at least one band exactly.
+MAX_DISTANCE = len(BAND_WIDTHS) - 1
+# Upper bound on candidates compared per lookup, in case a band is very common
+MAX_CANDIDATES = 200
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def _min_tokens(kind=None):
+    if kind == FingerprintKind.POST:
+        # Short supportive replies ("you are not alone, sending hugs") are
+        # alike across members without being spam, so replies need more words
+        return getattr(settings, 'COMMUNITY_DUPLICATE_REPLY_MIN_TOKENS', 12)
+    return getattr(settings, 'COMMUNITY_DUPLICATE_MIN_TOKENS', 6)
+
+
+def _window():
+    return timedelta(hours=getattr(settings, 'COMMUNITY_DUPLICATE_WINDOW_HOURS', 72))
+
+
+def _feature_hash(feature):
+    return int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), 'big')
+
+
+def simhash(text, kind=None):
+    """
+    Return the 64-bit SimHash of a text, or None if it is too short to judge
+    for content of that kind
+    Features are words weighted by how often they occur, so swapping,
+    adding or reordering a few words only flips a few bits.
+    """
+    tokens = TOKEN_PATTERN.findall((text or '').lower())
+    if len(tokens) < _min_tokens(kind):
+        return None
+
+    weights = [0] * FINGERPRINT_BITS
+    for token, count in Counter(tokens).items():
+        feature = _feature_hash(token)
+        for bit in range(FINGERPRINT_BITS):
+            if feature >> bit & 1:
+                weights[bit] += count
+            else:
+                weights[bit] -= count
+
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def _bands(fingerprint):
+    bands = []
+    for width in BAND_WIDTHS:
+        bands.append(fingerprint & ((1 << width) - 1))
+        fingerprint >>= width
+    return bands
+
+
+def _to_signed(fingerprint):
+    # Stored in a signed 64-bit column
+    return fingerprint - (1 << FINGERPRINT_BITS) if fingerprint >> (FINGERPRINT_BITS - 1) else fingerprint
+
+
+def find_near_duplicate(fingerprint, since=None):
+    """
+    Return the most recent ContentFingerprint within MAX_DISTANCE bits of
+    the fingerprint, or None
+    Only content created since the duplicate window (or `since`) is checked.
+    """
+    if fingerprint is None:
+        return None
+    if since is None:
+        since = timezone.now() - _window()
+
+    band_filter = Q()
+    for index, band in enumerate(_bands(fingerprint)):
+        band_filter |= Q(**{f'band_{index}': band})
+
+    candidates = ContentFingerprint.objects.filter(
+        band_filter, created_at__gte=since
+    ).order_by('-created_at').values_list('id', 'fingerprint')[:MAX_CANDIDATES]
+
+    for candidate_id, candidate in candidates:
+        if ((candidate & FINGERPRINT_MASK) ^ fingerprint).bit_count() <= MAX_DISTANCE:
+            return ContentFingerprint.objects.get(pk=candidate_id)
+    return None
+
+
+def is_near_duplicate(text, kind):
+    """
+    Return (fingerprint, duplicate) for a text about to be posted as `kind`
+    duplicate is the matching ContentFingerprint or None; fingerprint is
+    None for texts too short to fingerprint.
+    """
+    fingerprint = simhash(text, kind)
+    return fingerprint, find_near_duplicate(fingerprint)
+
+
+def record_fingerprint(kind, obj, author, fingerprint):
+    """
+    Store the fingerprint of newly created content
+    """
+    if fingerprint is None:
+        return None
+    bands = {f'band_{index}': band for index, band in enumerate(_bands(fingerprint))}
+    return ContentFingerprint.objects.create(
+        kind=kind,
+        object_id=obj.pk,
+        author=author,
+        fingerprint=_to_signed(fingerprint),
+        created_at=getattr(obj, 'created_at', None) or timezone.now(),
+        **bands
+    )
+
+
+def prune_fingerprints():
+    """
+    Delete fingerprints older than the duplicate window
+    Returns the number removed.
+    """
+    removed, _ = ContentFingerprint.objects.filter(
+        created_at__lt=timezone.now() - _window()
+    ).delete()
+    return removed
@@ -0,0 +1,201 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """
+    A subscriber's queue of messages on one channel
+    Messages may be delivered from any thread; they are handed to the
+    subscriber's event loop. When the queue is full the oldest message is
+    dropped so a slow client cannot hold on to unbounded memory.
+    """
+
+    def __init__(self, backend, channel, max_size=100):
+        self.backend = backend
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_size)
+
+    def deliver(self, message):
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    def _put(self, message):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout):
+        """
+        Wait for the next message, returning None if none arrives in time
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.backend.unsubscribe(self)
+
+
+class InProcessBackend:
+    """
+    Delivers messages to subscribers connected to this process
+    """
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.channel]
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscriptions.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(message)
+
+
+class CacheBackend(InProcessBackend):
+    """
+    Local stand-in for a multi-process broker such as Redis pub/sub
+    Published messages are appended to a short-lived log in the Django cache,
+    and one poller thread per process relays new entries to local
+    subscribers. With a cache shared between processes (memcached, Redis,
+    database cache) every process sees every message.
+    """
+    SEQUENCE_KEY = 'live:{channel}:seq'
+    MESSAGE_KEY = 'live:{channel}:{seq}'
+
+    def __init__(self, poll_interval=None, message_ttl=60):
+        super().__init__()
+        self.poll_interval = poll_interval or getattr(settings, 'COMMUNITY_PUBSUB_POLL_INTERVAL', 1.0)
+        self.message_ttl = message_ttl
+        self._positions = {}
+        self._poller = None
+
+    def subscribe(self, channel):
+        subscription = super().subscribe(channel)
+        with self._lock:
+            self._positions.setdefault(channel, self._current_sequence(channel))
+            if self._poller is None:
+                self._poller = threading.Thread(target=self._poll, name='live-updates-poller', daemon=True)
+                self._poller.start()
+        return subscription
+
+    def publish(self, channel, message):
+        key = self.SEQUENCE_KEY.format(channel=channel)
+        cache.add(key, 0, None)
+        seq = cache.incr(key)
+        cache.set(
+            self.MESSAGE_KEY.format(channel=channel, seq=seq),
+            json.dumps(message),
+            self.message_ttl
+        )
+
+    def _current_sequence(self, channel):
+        return cache.get(self.SEQUENCE_KEY.format(channel=channel), 0)
+
+    def _poll(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                channels = list(self._subscriptions)
+                for channel in list(self._positions):
+                    if channel not in self._subscriptions:
+                        del self._positions[channel]
+            for channel in channels:
+                try:
+                    self._relay(channel)
+                except Exception as e:
+                    logger.error(f"Live update relay failed for {channel}: {str(e)}")
+
+    def _relay(self, channel):
+        start = self._positions.get(channel, 0)
+        latest = self._current_sequence(channel)
+        if latest <= start:
+            return
+        keys = [
+            self.MESSAGE_KEY.format(channel=channel, seq=seq)
+            for seq in range(start + 1, latest + 1)
+        ]
+        messages = cache.get_many(keys)
+        self._positions[channel] = latest
+        for key in keys:
+            if key in messages:
+                super().publish(channel, json.loads(messages[key]))
+
+
+class PubSubHub:
+    """
+    Publishes messages to named channels through a pluggable backend
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def subscribe(self, channel):
+        return self.backend.subscribe(channel)
+
+    def publish(self, channel, event, data):
+        if live_updates_enabled():
+            self.backend.publish(channel, {'event': event, 'data': data})
+
+    def publish_on_commit(self, channel, event, data):
+        if live_updates_enabled():
+            transaction.on_commit(lambda: self.publish(channel, event, data))
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def live_updates_enabled():
+    """
+    Whether thread event streams are served and published
+    Off by default: streams need an ASGI server, and a backend shared
+    between processes (COMMUNITY_PUBSUB_BACKEND) when there are several.
+    """
+    return getattr(settings, 'COMMUNITY_LIVE_UPDATES', False)
+
+
+def get_hub():
+    """
+    Return the process-wide hub, using COMMUNITY_PUBSUB_BACKEND if set
+    """
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                backend_path = getattr(
+                    settings, 'COMMUNITY_PUBSUB_BACKEND',
+                    'community.services.live_updates.InProcessBackend'
+                )
+                _hub = PubSubHub(import_string(backend_path)())
+    return _hub
+
+
+def thread_channel(thread_id):
+    return f'thread:{thread_id}'
@@ -1,7 +1,14 @@
-
 import re
-from django.conf import settings
+import hashlib
 import logging
+import threading
+from concurrent.futures import TimeoutError
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import transaction
+from api.background import submit
+from ..models import ReviewQueueEntry, ReviewStatus
 
 logger = logging.getLogger(__name__)
 
@@ -9,44 +16,99 @@ class ContentModerationException(Exception):
     """Exception raised when content fails moderation checks"""
     pass
 
+
+# Moderation rules as (name, pattern) pairs. Every pattern is written so that
+# a scan stays linear in the length of the text: no nested or overlapping
+# quantifiers, and unbounded runs are anchored so they can only start once
+# per run of characters.
+MODERATION_RULES = (
+    # Hate speech patterns
+    ('hate_speech', r'\b(?:hate|kill|attack|destroy)\s+(?:group|community|people|race|gender)\b'),
+    # Explicit content patterns
+    ('explicit', r'\b(?:explicit|pornographic|obscene)\b'),
+    # Phone numbers: 555-123-4567, (555) 123-4567, 555 1234
+    ('phone_number', r'\b(?:\(\d{3}\)\s*|\d{3}[-.\s]?)?\d{3}[-.\s]?\d{4}\b'),
+    # Email addresses (the local part may only start at the beginning of a run)
+    ('email_address', r'(?<![A-Za-z0-9._%+-])[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b'),
+    # IP addresses
+    ('ip_address', r'\b(?:\d{1,3}\.){3}\d{1,3}\b'),
+)
+
+
+class ModerationEngine:
+    """
+    Rule-based content checker compiled once into a single combined matcher.
+
+    Each rule becomes a named group of one alternation, so a text is scanned
+    in a single pass and the name of the rule that matched is available from
+    the match itself.
+    """
+
+    def __init__(self, rules=MODERATION_RULES, flags=re.IGNORECASE):
+        self.rules = tuple(rules)
+        self.matcher = re.compile(
+            '|'.join(f'(?P<{name}>{pattern})' for name, pattern in self.rules),
+            flags
+        )
+
+    def first_violation(self, content):
+        """
+        Return the name of the first rule the content violates, or None
+        """
+        match = self.matcher.search(content)
+        return match.lastgroup if match else None
+
+    def check(self, content):
+        """
+        Return True if the content passes every rule
+        """
+        if not content or not isinstance(content, str):
+            return False
+
+        rule = self.first_violation(content)
+        if rule:
+            logger.warning(f"Content moderation failed: matched rule '{rule}'")
+            return False
+        return True
+
+    def check_many(self, contents):
+        """
+        Check a list of texts, returning one boolean per text in order
+        """
+        return [self.check(content) for content in contents]
+
+
+# Compiled at import time and shared by every caller
+moderation_engine = ModerationEngine()
+
+
+def _use_external_api():
+    return getattr(settings, 'USE_EXTERNAL_MODERATION_API', False)
+
+
 def check_content(content):
     """
     Check if content passes moderation rules
     Returns True if content is acceptable, False otherwise
     """
-    if not content or not isinstance(content, str):
+    if not moderation_engine.check(content):
         return False
-    
-    # List of patterns to check
-    patterns = [
-        # Hate speech patterns
-        r'\b(hate|kill|attack|destroy)\s+(group|community|people|race|gender)\b',
-        # Explicit content patterns
-        r'\b(explicit|pornographic|obscene)\b',
-        # Personal information patterns
-        r'\b(\d{3}[-\.\s]??\d{3}[-\.\s]??\d{4}|\(\d{3}\)\s*\d{3}[-\.\s]??\d{4}|\d{3}[-\.\s]??\d{4})\b',  # Phone numbers
-        r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',  # Email addresses
-        r'\b(?:\d{1,3}\.){3}\d{1,3}\b',  # IP addresses
-    ]
-    
-    # Check for any pattern matches
-    for pattern in patterns:
-        if re.search(pattern, content, re.IGNORECASE):
-            logger.warning(f"Content moderation failed: matched pattern '{pattern}'")
-            return False
-    
+
     # Optional integration with external API for more sophisticated checks
-    if hasattr(settings, 'USE_EXTERNAL_MODERATION_API') and settings.USE_EXTERNAL_MODERATION_API:
-        try:
-            # This would be replaced with actual API call
-            return _check_with_external_api(content)
-        except Exception as e:
-            logger.error(f"External moderation API error: {str(e)}")
-            # Fall back to passed if external API fails
-            return True
-    
+    if _use_external_api():
+        return _check_with_budget(content)
+
     return True
 
+
+def check_many(contents):
+    """
+    Check a list of texts in one call, e.g. when re-moderating existing content
+    Returns a list of booleans in the same order as the input
+    """
+    return [check_content(content) for content in contents]
+
+
 def _check_with_external_api(content):
     """
     Placeholder for external API integration
@@ -59,3 +121,131 @@ def _check_with_external_api(content):
     # - Azure Content Moderator
     return True  # Assume passes for now
 
+
+# External verdicts are cached by content hash, so identical text is only
+# sent to the external API once per TTL
+VERDICT_CACHE_PREFIX = 'moderation:verdict:'
+
+_in_flight = {}
+# Re-entrant: a future that is already done runs its callback immediately
+_lock = threading.RLock()
+
+
+def _content_digest(content):
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def _check_with_budget(content):
+    """
+    Run the external check under a per-request time budget
+    A cached verdict is returned immediately. Content whose check misses the
+    deadline is provisionally accepted; the check keeps running and its
+    verdict is cached. Callers record the content they then create with
+    track_provisional, so a late rejection can be queued for review.
+    """
+    digest = _content_digest(content)
+    verdict = cache.get(VERDICT_CACHE_PREFIX + digest)
+    if verdict is not None:
+        return verdict
+
+    with _lock:
+        # Identical text submitted concurrently shares a single API call
+        future = _in_flight.get(digest)
+        if future is None:
+            future = submit(_check_with_external_api, content)
+            _in_flight[digest] = future
+            future.add_done_callback(
+                lambda done: _on_external_verdict(digest, content, done)
+            )
+
+    timeout = getattr(settings, 'MODERATION_EXTERNAL_TIMEOUT', 0.5)
+    try:
+        return future.result(timeout=timeout)
+    except TimeoutError:
+        future.missed_deadline = True
+        logger.info(f"External moderation missed its {timeout}s budget; content {digest[:12]} provisionally accepted")
+        return True
+    except Exception as e:
+        logger.error(f"External moderation API error: {str(e)}")
+        # Fall back to passed if external API fails
+        return True
+
+
+def _on_external_verdict(digest, content, future):
+    if future.exception() is not None:
+        with _lock:
+            _in_flight.pop(digest, None)
+        return
+
+    with _lock:
+        # Cached before the future leaves _in_flight, so track_provisional
+        # always finds one or the other
+        cache.set(
+            VERDICT_CACHE_PREFIX + digest,
+            future.result(),
+            getattr(settings, 'MODERATION_CACHE_TTL', 60 * 60 * 24)
+        )
+        _in_flight.pop(digest, None)
+
+
+def _settle_entry(entry_id, future):
+    """
+    Flag a pending review queue entry once its verdict comes back
+    negative, or drop it from the queue if the content passed
+    """
+    if future.exception() is not None:
+        return
+    entry = ReviewQueueEntry.objects.filter(pk=entry_id, status=ReviewStatus.PENDING)
+    if future.result():
+        entry.delete()
+    elif entry.update(status=ReviewStatus.FLAGGED):
+        logger.warning(f"Provisionally accepted content in review entry {entry_id} was rejected by external moderation")
+
+
+def track_provisional(obj, content):
+    """
+    Queue newly created content for review if it was only provisionally
+    accepted: flagged straight away if its verdict has since come back
+    negative, otherwise pending until the verdict arrives
+    Returns the ReviewQueueEntry, or None if there is nothing to review.
+    """
+    if not _use_external_api():
+        return None
+    digest = _content_digest(content)
+    with _lock:
+        verdict = cache.get(VERDICT_CACHE_PREFIX + digest)
+        future = _in_flight.get(digest) if verdict is None else None
+    if verdict or (verdict is None and not getattr(future, 'missed_deadline', False)):
+        # Passed, checked in time, or the check failed and was let through
+        return None
+
+    entry = ReviewQueueEntry.objects.create(
+        content_type=ContentType.objects.get_for_model(obj),
+        object_id=obj.pk,
+        content_digest=digest,
+        excerpt=content[:200],
+        status=ReviewStatus.FLAGGED if verdict is False else ReviewStatus.PENDING
+    )
+    if verdict is None:
+        # Once the entry is visible to other connections; a future that is
+        # already done runs the callback straight away. Settling is its own
+        # background task: done callbacks run on the executor thread after
+        # the check's task has closed its database connections.
+        transaction.on_commit(
+            lambda: future.add_done_callback(lambda done: submit(_settle_entry, entry.pk, done))
+        )
+    return entry
+
+
+def get_review_queue():
+    """
+    Return the flagged review queue entries, newest first
+    """
+    return ReviewQueueEntry.objects.filter(status=ReviewStatus.FLAGGED)
+
+
+def get_cached_verdict(content):
+    """
+    Return the cached external verdict for the content, or None if unknown
+    """
+    return cache.get(VERDICT_CACHE_PREFIX + _content_digest(content))
@@ -0,0 +1,166 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import (
+    Notification, NotificationActor, NotificationCounter, NotificationType,
+    ForumPost, CommunityChallenge
+)
+
+
+def _adjust_unread(user_id, delta):
+    updated = NotificationCounter.objects.filter(user_id=user_id).update(
+        unread_count=F('unread_count') + delta
+    )
+    if not updated and delta > 0:
+        try:
+            with transaction.atomic():
+                NotificationCounter.objects.create(user_id=user_id, unread_count=delta)
+        except IntegrityError:
+            # Created concurrently by another notification
+            NotificationCounter.objects.filter(user_id=user_id).update(
+                unread_count=F('unread_count') + delta
+            )
+
+
+def _add_actor(notification_id, actor_id):
+    """
+    Record an actor on a notification
+    Returns True if they had not acted on it before. Anonymous actors
+    cannot be told apart, so each of their events counts as new.
+    """
+    if actor_id is None:
+        return True
+    try:
+        with transaction.atomic():
+            NotificationActor.objects.create(notification_id=notification_id, actor_id=actor_id)
+    except IntegrityError:
+        return False
+    return True
+
+
+def _merge(notification_id, actor_id, now):
+    increment = 1 if _add_actor(notification_id, actor_id) else 0
+    Notification.objects.filter(pk=notification_id).update(
+        actor_count=F('actor_count') + increment,
+        last_actor_id=actor_id,
+        updated_at=now
+    )
+
+
+def notify(recipient_id, notification_type, coalesce_key, actor_id=None, **targets):
+    """
+    Deliver an event to a user's inbox
+    If the user already has an unread notification with the same key the
+    event is merged into it, so the unread count only grows for new keys
+    and actor_count only for actors not already on it.
+    """
+    now = timezone.now()
+    unread = Notification.objects.filter(
+        recipient_id=recipient_id,
+        coalesce_key=coalesce_key,
+        is_read=False
+    )
+    with transaction.atomic():
+        notification_id = unread.values_list('id', flat=True).first()
+        if notification_id is not None:
+            _merge(notification_id, actor_id, now)
+            return
+
+        try:
+            with transaction.atomic():
+                notification = Notification.objects.create(
+                    recipient_id=recipient_id,
+                    notification_type=notification_type,
+                    coalesce_key=coalesce_key,
+                    last_actor_id=actor_id,
+                    created_at=now,
+                    updated_at=now,
+                    **targets
+                )
+        except IntegrityError:
+            # Another event with the same key got there first
+            notification_id = unread.values_list('id', flat=True).first()
+            if notification_id is not None:
+                _merge(notification_id, actor_id, now)
+            return
+
+        _add_actor(notification.pk, actor_id)
+        _adjust_unread(recipient_id, 1)
+
+
+def notify_reply(post_id):
+    """
+    Tell a thread's author about a new post in it
+    """
+    post = ForumPost.objects.filter(pk=post_id).values(
+        'author_id', 'is_anonymous', 'thread_id', 'thread__created_by_id'
+    ).first()
+    if post is None or post['thread__created_by_id'] in (None, post['author_id']):
+        return
+    notify(
+        post['thread__created_by_id'],
+        NotificationType.REPLY,
+        f"reply:thread:{post['thread_id']}",
+        actor_id=None if post['is_anonymous'] else post['author_id'],
+        thread_id=post['thread_id'],
+        post_id=post_id
+    )
+
+
+def notify_encouragement(post_id, author_id, thread_id, actor_id):
+    """
+    Tell a post's author that someone encouraged it
+    """
+    if author_id is None or author_id == actor_id:
+        return
+    notify(
+        author_id,
+        NotificationType.ENCOURAGEMENT,
+        f"encouragement:post:{post_id}",
+        actor_id=actor_id,
+        thread_id=thread_id,
+        post_id=post_id
+    )
+
+
+def notify_challenge_join(challenge_id, actor_id):
+    """
+    Tell a challenge's creator that someone joined it
+    """
+    creator_id = CommunityChallenge.objects.filter(pk=challenge_id).values_list(
+        'created_by_id', flat=True
+    ).first()
+    if creator_id is None or creator_id == actor_id:
+        return
+    notify(
+        creator_id,
+        NotificationType.CHALLENGE_JOIN,
+        f"challenge_join:challenge:{challenge_id}",
+        actor_id=actor_id,
+        challenge_id=challenge_id
+    )
+
+
+def get_unread_count(user):
+    """
+    Return the user's unread notification count from the maintained counter
+    """
+    return NotificationCounter.objects.filter(user=user).values_list(
+        'unread_count', flat=True
+    ).first() or 0
+
+
+def mark_read(user, notification_ids=None):
+    """
+    Mark some (or, with no ids, all) of the user's notifications read
+    Returns the number that were unread.
+    """
+    with transaction.atomic():
+        queryset = Notification.objects.filter(recipient=user, is_read=False)
+        if notification_ids is not None:
+            queryset = queryset.filter(id__in=notification_ids)
+        updated = queryset.update(is_read=True)
+        if updated:
+            _adjust_unread(user.pk, -updated)
+    return updated
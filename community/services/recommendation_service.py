@@ -0,0 +1,203 @@
+import math
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+from scipy import sparse
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery
+from django.utils import timezone
+
+from ..models import ForumThread, ForumPost, RelatedThread, RecommendationIndexState
+
+TOKEN_PATTERN = re.compile(r'[a-z][a-z0-9]+')
+STOP_WORDS = frozenset("""
+    about after again all also am an and any are as at be because been before
+    being but by can could did do does doing don for from had has have having
+    he her here hers him his how if in into is it its just me more most my no
+    not now of off on once only or other our out over own same she should so
+    some such than that the their them then there these they this those to
+    too under until up very was we were what when where which while who why
+    will with would you your
+""".split())
+# Title terms count this many times as much as first post terms
+TITLE_WEIGHT = 2
+# Pairs scoring below this are not worth recommending
+MIN_SCORE = 0.05
+# Rows of the similarity product computed at a time, bounding memory use
+CHUNK_SIZE = 500
+
+
+def _neighbour_count():
+    return getattr(settings, 'COMMUNITY_RELATED_THREADS', 5)
+
+
+def _terms(text):
+    return [term for term in TOKEN_PATTERN.findall((text or '').lower()) if term not in STOP_WORDS]
+
+
+def _load_documents():
+    """
+    Return (thread ids, term lists) for every thread, from its title and
+    first post
+    """
+    first_post = ForumPost.objects.filter(
+        thread=OuterRef('pk')
+    ).order_by('created_at', 'id').values('content')[:1]
+    rows = ForumThread.objects.annotate(
+        first_post=Subquery(first_post)
+    ).order_by('id').values_list('id', 'title', 'first_post')
+
+    ids = []
+    documents = []
+    for thread_id, title, content in rows.iterator(chunk_size=2000):
+        ids.append(thread_id)
+        documents.append(_terms(title) * TITLE_WEIGHT + _terms(content))
+    return np.array(ids, dtype=np.int64), documents
+
+
+def build_tfidf(documents):
+    """
+    Return an L2-normalised TF-IDF matrix with one row per document
+    Term frequencies are sublinear (1 + log tf) and IDF is smoothed.
+    """
+    vocabulary = {}
+    indptr = [0]
+    indices = []
+    data = []
+    for terms in documents:
+        for term, count in Counter(terms).items():
+            indices.append(vocabulary.setdefault(term, len(vocabulary)))
+            data.append(1.0 + math.log(count))
+        indptr.append(len(indices))
+
+    matrix = sparse.csr_matrix(
+        (np.array(data, dtype=np.float64), np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+        shape=(len(documents), len(vocabulary))
+    )
+    document_frequency = np.bincount(matrix.indices, minlength=len(vocabulary))
+    idf = np.log((1 + len(documents)) / (1 + document_frequency)) + 1
+    matrix = matrix @ sparse.diags(idf)
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return (sparse.diags(1 / norms) @ matrix).tocsr()
+
+
+def _top_neighbours(similarities, row_ids, ids, k):
+    """
+    Yield (thread id, [(related id, score)]) for each row of a block of
+    the similarity matrix, best first
+    """
+    for row, thread_id in enumerate(row_ids):
+        start, end = similarities.indptr[row], similarities.indptr[row + 1]
+        columns = similarities.indices[start:end]
+        scores = similarities.data[start:end]
+        keep = (scores >= MIN_SCORE) & (ids[columns] != thread_id)
+        columns, scores = columns[keep], scores[keep]
+        if len(scores) > k:
+            top = np.argpartition(-scores, k)[:k]
+            columns, scores = columns[top], scores[top]
+        order = np.argsort(-scores)
+        yield int(thread_id), [
+            (int(ids[column]), float(score))
+            for column, score in zip(columns[order], scores[order])
+        ]
+
+
+def _save_neighbours(neighbours, built_at, replace_all=False):
+    rows = [
+        RelatedThread(thread_id=thread_id, related_id=related_id, score=score)
+        for thread_id, related in neighbours.items()
+        for related_id, score in related
+    ]
+    with transaction.atomic():
+        if replace_all:
+            RelatedThread.objects.all().delete()
+        else:
+            RelatedThread.objects.filter(thread_id__in=list(neighbours)).delete()
+        RelatedThread.objects.bulk_create(rows, batch_size=1000)
+        RecommendationIndexState.objects.update_or_create(id=1, defaults={'built_at': built_at})
+
+
+def build_related_threads():
+    """
+    Rebuild the top-k similar threads of every thread
+    Returns the number of threads indexed.
+    """
+    built_at = timezone.now()
+    ids, documents = _load_documents()
+    matrix = build_tfidf(documents)
+    k = _neighbour_count()
+
+    neighbours = {}
+    for start in range(0, len(ids), CHUNK_SIZE):
+        block = (matrix[start:start + CHUNK_SIZE] @ matrix.T).tocsr()
+        neighbours.update(_top_neighbours(block, ids[start:start + CHUNK_SIZE], ids, k))
+
+    _save_neighbours(neighbours, built_at, replace_all=True)
+    return len(ids)
+
+
+def update_related_threads():
+    """
+    Refresh the index for threads that changed since it was last built
+    Changed threads get new neighbour lists, and each is merged into the
+    lists of the threads it is now similar to, so the cost is one changed x
+    all similarity product rather than all x all. Unchanged pairs keep the
+    scores of the build that produced them, and a list that loses a changed
+    thread is not back-filled, so a full build should still run now and
+    then. Returns the number of lists rewritten, or None if there is no
+    index to update yet.
+    """
+    state = RecommendationIndexState.objects.filter(id=1).first()
+    if state is None:
+        return None
+
+    built_at = timezone.now()
+    changed_ids = set(ForumThread.objects.filter(
+        Q(updated_at__gte=state.built_at) | Q(posts__created_at__gte=state.built_at)
+    ).values_list('id', flat=True).distinct())
+    if not changed_ids:
+        RecommendationIndexState.objects.filter(id=1).update(built_at=built_at)
+        return 0
+
+    ids, documents = _load_documents()
+    matrix = build_tfidf(documents)
+    positions = np.flatnonzero(np.isin(ids, list(changed_ids)))
+    k = _neighbour_count()
+
+    neighbours = {}
+    # Unchanged thread -> {changed thread: score} for pairs worth keeping
+    candidates = defaultdict(dict)
+    for start in range(0, len(positions), CHUNK_SIZE):
+        rows = positions[start:start + CHUNK_SIZE]
+        block = (matrix[rows] @ matrix.T).tocsr()
+        neighbours.update(_top_neighbours(block, ids[rows], ids, k))
+
+        pairs = block.tocoo()
+        keep = pairs.data >= MIN_SCORE
+        for row, column, score in zip(pairs.row[keep], pairs.col[keep], pairs.data[keep]):
+            other_id = int(ids[column])
+            if other_id not in changed_ids:
+                candidates[other_id][int(ids[rows[row]])] = float(score)
+
+    affected = set(candidates) | set(
+        RelatedThread.objects.filter(related_id__in=changed_ids).values_list('thread_id', flat=True)
+    )
+    affected -= changed_ids
+    current = defaultdict(dict)
+    for thread_id, related_id, score in RelatedThread.objects.filter(
+        thread_id__in=affected
+    ).values_list('thread_id', 'related_id', 'score'):
+        if related_id not in changed_ids:
+            current[thread_id][related_id] = score
+
+    for thread_id in affected:
+        merged = current[thread_id]
+        merged.update(candidates.get(thread_id, {}))
+        neighbours[thread_id] = sorted(merged.items(), key=lambda item: -item[1])[:k]
+
+    _save_neighbours(neighbours, built_at)
+    return len(neighbours)
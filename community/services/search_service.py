@@ -0,0 +1,144 @@
+from django.db import connection
+from django.utils.html import escape
+
+from ..models import ForumThread, ForumPost
+
+# Both queries return (kind, object_id, score, snippet) rows, best match first.
+# The full-text indexes are created by migration 0006_community_search_index.
+POSTGRES_SEARCH_SQL = """
+WITH q AS (SELECT websearch_to_tsquery('english', %(query)s) AS query),
+hits AS (
+    SELECT 'thread' AS kind, t.id AS object_id, ts_rank(t.search_vector, q.query) AS score
+    FROM community_forumthread t, q
+    WHERE t.search_vector @@ q.query {thread_scope}
+    UNION ALL
+    SELECT 'post' AS kind, p.id AS object_id, ts_rank(p.search_vector, q.query) AS score
+    FROM community_forumpost p JOIN community_forumthread t ON t.id = p.thread_id, q
+    WHERE p.search_vector @@ q.query {thread_scope}
+    ORDER BY score DESC
+    LIMIT %(limit)s
+)
+SELECT h.kind, h.object_id, h.score,
+    ts_headline('english', coalesce(t.title, p.content), q.query,
+                'StartSel=<mark>, StopSel=</mark>, MaxWords=30, MinWords=10')
+FROM hits h CROSS JOIN q
+LEFT JOIN community_forumthread t ON h.kind = 'thread' AND t.id = h.object_id
+LEFT JOIN community_forumpost p ON h.kind = 'post' AND p.id = h.object_id
+ORDER BY h.score DESC
+"""
+
+SQLITE_SEARCH_SQL = """
+SELECT kind, object_id, score, snippet FROM (
+    SELECT 'thread' AS kind, t.id AS object_id,
+        -bm25(community_forumthread_fts) AS score,
+        snippet(community_forumthread_fts, 0, '<mark>', '</mark>', '...', 30) AS snippet
+    FROM community_forumthread_fts JOIN community_forumthread t
+        ON t.id = community_forumthread_fts.rowid
+    WHERE community_forumthread_fts MATCH %(query)s {thread_scope}
+    UNION ALL
+    SELECT 'post' AS kind, p.id AS object_id,
+        -bm25(community_forumpost_fts) AS score,
+        snippet(community_forumpost_fts, 0, '<mark>', '</mark>', '...', 30) AS snippet
+    FROM community_forumpost_fts JOIN community_forumpost p
+        ON p.id = community_forumpost_fts.rowid
+        JOIN community_forumthread t ON t.id = p.thread_id
+    WHERE community_forumpost_fts MATCH %(query)s {thread_scope}
+)
+ORDER BY score DESC
+LIMIT %(limit)s
+"""
+
+
+def _fts5_query(query):
+    """
+    Quote each term so user input is never parsed as FTS5 query syntax
+    """
+    return ' '.join('"{}"'.format(term.replace('"', '""')) for term in query.split())
+
+
+def _run_search(query, group_ids, limit):
+    params = {'limit': limit}
+    thread_scope = ''
+    if group_ids is not None:
+        placeholders = []
+        for index, group_id in enumerate(group_ids):
+            params[f'group_{index}'] = group_id
+            placeholders.append(f'%(group_{index})s')
+        thread_scope = 'AND t.discussion_group_id IN ({})'.format(', '.join(placeholders) or 'NULL')
+
+    if connection.vendor == 'postgresql':
+        sql = POSTGRES_SEARCH_SQL
+        params['query'] = query
+    elif connection.vendor == 'sqlite':
+        sql = SQLITE_SEARCH_SQL
+        params['query'] = _fts5_query(query)
+    else:
+        raise NotImplementedError(f"Community search is not supported on {connection.vendor}")
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(thread_scope=thread_scope), params)
+        return cursor.fetchall()
+
+
+def _safe_snippet(snippet):
+    """
+    Escape user text in a snippet while keeping the highlight tags
+    """
+    return escape(snippet or '').replace('&lt;mark&gt;', '<mark>').replace('&lt;/mark&gt;', '</mark>')
+
+
+def _display_name(is_anonymous, user):
+    if is_anonymous:
+        return "Anonymous"
+    elif user:
+        return user.username
+    return None
+
+
+def search_community(query, group_ids=None, limit=20):
+    """
+    Search thread titles and post content
+    Returns relevance-ranked results with highlighted snippets, limited to
+    threads in group_ids when given. Authors are shown with the same
+    anonymity rules as the thread and post serializers.
+    """
+    rows = _run_search(query, group_ids, limit)
+
+    thread_ids = [object_id for kind, object_id, score, snippet in rows if kind == 'thread']
+    post_ids = [object_id for kind, object_id, score, snippet in rows if kind == 'post']
+    threads = ForumThread.objects.select_related(
+        'created_by', 'discussion_group'
+    ).in_bulk(thread_ids)
+    posts = ForumPost.objects.select_related(
+        'author', 'thread', 'thread__discussion_group'
+    ).in_bulk(post_ids)
+
+    results = []
+    for kind, object_id, score, snippet in rows:
+        if kind == 'thread':
+            thread = threads.get(object_id)
+            if thread is None:
+                continue
+            post = None
+            author_name = _display_name(thread.is_anonymous, thread.created_by)
+            created_at = thread.created_at
+        else:
+            post = posts.get(object_id)
+            if post is None:
+                continue
+            thread = post.thread
+            author_name = _display_name(post.is_anonymous, post.author)
+            created_at = post.created_at
+
+        results.append({
+            'type': kind,
+            'thread': thread.id,
+            'thread_title': thread.title,
+            'post': post.id if post else None,
+            'group': thread.discussion_group.slug,
+            'author_name': author_name,
+            'snippet': _safe_snippet(snippet),
+            'score': float(score),
+            'created_at': created_at,
+        })
+    return results
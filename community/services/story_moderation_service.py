@@ -0,0 +1,111 @@
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from ..models import SuccessStory
+from .moderation_service import get_cached_verdict
+
+PENDING_COUNT_CACHE_KEY = 'community:stories:pending_count'
+LINK_PATTERN = re.compile(r'https?://|www\.', re.IGNORECASE)
+NEW_ACCOUNT_DAYS = 7
+
+
+def _chunk_size():
+    return getattr(settings, 'STORY_REVIEW_CHUNK_SIZE', 500)
+
+
+def pending_stories():
+    """
+    Stories waiting for review, matching the partial pending index
+    """
+    return SuccessStory.objects.filter(is_approved=False, is_rejected=False)
+
+
+def get_pending_count():
+    count = cache.get(PENDING_COUNT_CACHE_KEY)
+    if count is None:
+        count = pending_stories().count()
+        cache.set(PENDING_COUNT_CACHE_KEY, count, getattr(settings, 'STORY_PENDING_COUNT_CACHE_TIMEOUT', 60 * 5))
+    return count
+
+
+def invalidate_pending_count():
+    cache.delete(PENDING_COUNT_CACHE_KEY)
+
+
+def compute_moderation_signals(story_id):
+    """
+    Work out and store the triage signals for one story
+    """
+    story = SuccessStory.objects.select_related('author').filter(pk=story_id).first()
+    if story is None:
+        return None
+
+    history = {'approved': 0, 'rejected': 0}
+    account_age_days = None
+    if story.author is not None:
+        history = SuccessStory.objects.filter(author_id=story.author_id).exclude(pk=story.pk).aggregate(
+            approved=Count('id', filter=Q(is_approved=True)),
+            rejected=Count('id', filter=Q(is_rejected=True)),
+        )
+        account_age_days = (timezone.now() - story.author.date_joined).days
+
+    external_verdict = get_cached_verdict(story.content)
+    link_count = len(LINK_PATTERN.findall(story.content))
+
+    flags = []
+    if external_verdict is False:
+        flags.append('external_rejected')
+    if link_count:
+        flags.append('contains_links')
+    if account_age_days is not None and account_age_days < NEW_ACCOUNT_DAYS:
+        flags.append('new_account')
+    if history['rejected']:
+        flags.append('previously_rejected')
+
+    signals = {
+        'flags': flags,
+        'external_verdict': external_verdict,
+        'word_count': len(story.content.split()),
+        'link_count': link_count,
+        'author_approved_stories': history['approved'],
+        'author_rejected_stories': history['rejected'],
+        'account_age_days': account_age_days,
+        'computed_at': timezone.now().isoformat(),
+    }
+    SuccessStory.objects.filter(pk=story.pk).update(moderation_signals=signals)
+    return signals
+
+
+def story_submitted(story_id):
+    """
+    Background follow-up to a new story: triage signals and queue size
+    """
+    invalidate_pending_count()
+    compute_moderation_signals(story_id)
+
+
+def review_stories(story_ids, approve, reviewer=None):
+    """
+    Approve or reject many pending stories
+    Stories are updated in chunks, each a single UPDATE in its own
+    transaction, so a large backlog never holds locks for long. Stories
+    that are no longer pending are skipped. Returns the number updated.
+    """
+    story_ids = list(story_ids)
+    size = _chunk_size()
+    updated = 0
+    for start in range(0, len(story_ids), size):
+        with transaction.atomic():
+            updated += pending_stories().filter(id__in=story_ids[start:start + size]).update(
+                is_approved=approve,
+                is_rejected=not approve,
+                reviewed_at=timezone.now(),
+                reviewed_by=reviewer
+            )
+    invalidate_pending_count()
+    return updated
@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
+
+from ..models import DiscussionGroupMembership, ForumThread, RelatedThread
+
+PINNED_THREADS_VERSION_KEY = 'community:pinned_threads:version'
+PINNED_THREADS_CACHE_KEY = 'community:pinned_threads:{version}:{group}'
+
+
+def get_cached_pinned_threads(group_slug, build):
+    """
+    Return the pinned threads for a group (or all groups when no slug is
+    given) from cache, calling build() to produce them on a miss
+    """
+    version = cache.get_or_set(PINNED_THREADS_VERSION_KEY, 1, None)
+    key = PINNED_THREADS_CACHE_KEY.format(version=version, group=group_slug or '*')
+    pinned = cache.get(key)
+    if pinned is None:
+        pinned = build()
+        cache.set(key, pinned, getattr(settings, 'PINNED_THREADS_CACHE_TIMEOUT', 60 * 5))
+    return pinned
+
+
+def invalidate_pinned_threads():
+    """
+    Drop every cached pinned-thread list by moving to a new cache version
+    """
+    try:
+        cache.incr(PINNED_THREADS_VERSION_KEY)
+    except ValueError:
+        cache.set(PINNED_THREADS_VERSION_KEY, 1, None)
+
+
+MEMBER_GROUPS_CACHE_KEY = 'community:member_groups:{user_id}'
+
+
+def get_member_group_ids(user):
+    """
+    Return the set of discussion group ids the user belongs to
+    Cached briefly for display (is_member, the joined-groups filter). The
+    cache is per process, so permission checks use is_group_member or
+    get_thread_for_post instead.
+    """
+    key = MEMBER_GROUPS_CACHE_KEY.format(user_id=user.pk)
+    group_ids = cache.get(key)
+    if group_ids is None:
+        group_ids = frozenset(
+            DiscussionGroupMembership.objects.filter(
+                user=user
+            ).values_list('discussion_group_id', flat=True)
+        )
+        cache.set(key, group_ids, getattr(settings, 'MEMBER_GROUPS_CACHE_TIMEOUT', 60))
+    return group_ids
+
+
+def invalidate_member_groups(user_id):
+    cache.delete(MEMBER_GROUPS_CACHE_KEY.format(user_id=user_id))
+
+
+def is_group_member(user, group_id):
+    return DiscussionGroupMembership.objects.filter(user=user, discussion_group_id=group_id).exists()
+
+
+def get_thread_for_post(thread_id, user):
+    """
+    Return {'discussion_group_id', 'is_locked', 'is_member'} for a thread
+    the user is replying to, or None if the thread does not exist
+    Read from the database in one query, so a thread deleted or locked,
+    or a membership changed, in another worker is seen at once.
+    """
+    return ForumThread.objects.filter(id=thread_id).annotate(
+        is_member=Exists(DiscussionGroupMembership.objects.filter(
+            user=user,
+            discussion_group_id=OuterRef('discussion_group_id')
+        ))
+    ).values('discussion_group_id', 'is_locked', 'is_member').first()
+
+
+def get_related_threads(thread_id, limit=5):
+    """
+    Return the precomputed most similar threads to a thread, best first
+    """
+    return list(
+        RelatedThread.objects.filter(thread_id=thread_id).select_related(
+            'related__discussion_group'
+        ).order_by('-score')[:limit]
+    )
@@ -0,0 +1,132 @@
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import ThreadTrendingScore, TrendingClock
+
+# How much each kind of activity adds to a thread's score
+EVENT_WEIGHTS = {
+    'thread': 2.0,
+    'post': 3.0,
+    'encouragement': 1.0,
+    'view': 0.2,
+}
+
+TOP_THREADS_CACHE_KEY = 'community:trending:top:{group}:{limit}'
+# Rebase before exp() gets anywhere near float overflow (about 709)
+MAX_EXPONENT = 300
+# Scores that have decayed below this are dropped on rebase
+MIN_SCORE = 0.01
+
+
+def _decay_rate():
+    half_life_hours = getattr(settings, 'COMMUNITY_TRENDING_HALF_LIFE_HOURS', 24)
+    return math.log(2) / (half_life_hours * 3600)
+
+
+def _get_anchor():
+    """
+    Read the anchor from the database on every use
+    The rebase command runs in its own process, and the cache is per
+    process, so a cached anchor would go stale in every web worker.
+    """
+    anchor = TrendingClock.objects.filter(id=1).values_list('anchor', flat=True).first()
+    if anchor is None:
+        clock, _ = TrendingClock.objects.get_or_create(
+            id=1, defaults={'anchor': timezone.now()}
+        )
+        anchor = clock.anchor
+    return anchor
+
+
+def _exponent(anchor, now):
+    return _decay_rate() * (now - anchor).total_seconds()
+
+
+def _locked_clock():
+    """
+    Return the TrendingClock row locked until the end of the transaction
+    """
+    clock, _ = TrendingClock.objects.select_for_update().get_or_create(
+        id=1, defaults={'anchor': timezone.now()}
+    )
+    return clock
+
+
+def record_activity(thread_id, discussion_group_id, event):
+    """
+    Add one event to a thread's trending score
+    Instead of decaying every stored score as time passes, new activity is
+    scaled up by exp(rate * (now - anchor)). Every score shrinks by the same
+    factor over time, so the order of stored scores is the order of decayed
+    scores and an event is a single atomic increment. The anchor is read
+    under the lock rebase_scores takes, so a rebase cannot land between
+    weighing the event and applying it.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        clock = _locked_clock()
+        exponent = _exponent(clock.anchor, now)
+        if exponent > MAX_EXPONENT:
+            _rebase(clock, now)
+            exponent = 0.0
+
+        weight = EVENT_WEIGHTS[event] * math.exp(exponent)
+        updated = ThreadTrendingScore.objects.filter(thread_id=thread_id).update(
+            score=F('score') + weight
+        )
+        if not updated:
+            try:
+                with transaction.atomic():
+                    ThreadTrendingScore.objects.create(
+                        thread_id=thread_id,
+                        discussion_group_id=discussion_group_id,
+                        score=weight
+                    )
+            except IntegrityError:
+                ThreadTrendingScore.objects.filter(thread_id=thread_id).update(
+                    score=F('score') + weight
+                )
+
+
+def _rebase(clock, now):
+    factor = math.exp(-_exponent(clock.anchor, now))
+    ThreadTrendingScore.objects.update(score=F('score') * factor)
+    removed, _ = ThreadTrendingScore.objects.filter(score__lt=MIN_SCORE).delete()
+    clock.anchor = now
+    clock.save(update_fields=['anchor'])
+    return removed
+
+
+def rebase_scores():
+    """
+    Move the anchor to now, scaling every stored score down to match, and
+    drop threads whose activity has decayed away
+    """
+    with transaction.atomic():
+        return _rebase(_locked_clock(), timezone.now())
+
+
+def get_trending_scores(discussion_group_id=None, limit=10):
+    """
+    Return [(thread_id, decayed score)] for the top threads, best first,
+    globally or within one group
+    Served by the score indexes and cached briefly.
+    """
+    key = TOP_THREADS_CACHE_KEY.format(group=discussion_group_id or '*', limit=limit)
+    top = cache.get(key)
+    if top is None:
+        queryset = ThreadTrendingScore.objects.all()
+        if discussion_group_id is not None:
+            queryset = queryset.filter(discussion_group_id=discussion_group_id)
+        scale = math.exp(-_exponent(_get_anchor(), timezone.now()))
+        top = [
+            (thread_id, score * scale)
+            for thread_id, score in queryset.order_by('-score').values_list('thread_id', 'score')[:limit]
+        ]
+        cache.set(key, top, getattr(settings, 'COMMUNITY_TRENDING_CACHE_TIMEOUT', 60))
+    return top
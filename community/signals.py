@@ -0,0 +1,49 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import (
+    ForumThread, DiscussionGroupMembership, CommunityChallenge, ChallengeParticipation,
+    Notification, NotificationCounter
+)
+from .services.thread_service import invalidate_pinned_threads, invalidate_member_groups
+
+
+@receiver([post_save, post_delete], sender=ForumThread)
+def forum_thread_changed(sender, instance, **kwargs):
+    # A thread may have been pinned, unpinned, locked, renamed or removed
+    invalidate_pinned_threads()
+
+
+@receiver([post_save, post_delete], sender=DiscussionGroupMembership)
+def membership_changed(sender, instance, **kwargs):
+    # Covers the join and leave actions as well as admin edits; bind the id
+    # now, as the instance may have changed by the time the commit happens
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_member_groups(user_id))
+
+
+@receiver(post_save, sender=ChallengeParticipation)
+def participation_created(sender, instance, created, **kwargs):
+    if created:
+        CommunityChallenge.objects.filter(pk=instance.challenge_id).update(
+            participant_count=F('participant_count') + 1
+        )
+
+
+@receiver(post_delete, sender=ChallengeParticipation)
+def participation_deleted(sender, instance, **kwargs):
+    CommunityChallenge.objects.filter(pk=instance.challenge_id).update(
+        participant_count=F('participant_count') - 1
+    )
+
+
+@receiver(post_delete, sender=Notification)
+def notification_deleted(sender, instance, **kwargs):
+    # Notifications go with their thread, post or challenge; keep the
+    # unread counter in step
+    if not instance.is_read:
+        NotificationCounter.objects.filter(user_id=instance.recipient_id).update(
+            unread_count=F('unread_count') - 1
+        )
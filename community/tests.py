@@ -1,3 +1,857 @@
-from django.test import TestCase
+import asyncio
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import (
+    ChallengeParticipation, CommunityChallenge, ContentFingerprint, DiscussionGroup, DiscussionGroupMembership, Encouragement,
+    EncouragementTypeCount, FeedEntry, FeedEntryType, FingerprintKind, ForumPost, ForumThread,
+    Notification, NotificationType, RelatedThread, StoryEncouragement, SuccessStory, ThreadTrendingScore, TrendingClock
+)
+from .services.challenge_service import (
+    AlreadyParticipatingError, ChallengeCheckInError, check_in, current_streak, get_leaderboard,
+    join_challenge, longest_streak, participation_progress
+)
+from .services.encouragement_service import (
+    add_post_encouragement, get_encouraged_post_ids, get_encouraged_story_ids,
+    remove_post_encouragement, toggle_post_encouragement, toggle_story_encouragement
+)
+from .services.feed_service import fan_out_activity, get_feed_queryset
+from .services.fingerprint_service import (
+    BAND_WIDTHS, find_near_duplicate, is_near_duplicate, record_fingerprint, simhash
+)
+from .services.live_updates import CacheBackend, InProcessBackend, PubSubHub
+from .services.moderation_service import (
+    ModerationEngine, check_content, check_many, moderation_engine
+)
+from .services.notification_service import (
+    get_unread_count, mark_read, notify_challenge_join, notify_encouragement, notify_reply
+)
+from .services.recommendation_service import (
+    build_related_threads, build_tfidf, update_related_threads
+)
+from .services.search_service import search_community
+from .services.story_moderation_service import (
+    compute_moderation_signals, get_pending_count, review_stories
+)
+from .services.thread_service import (
+    get_cached_pinned_threads, get_member_group_ids, get_thread_for_post, is_group_member
+)
+from .services.trending_service import get_trending_scores, rebase_scores, record_activity
+
+User = get_user_model()
+
+
+def create_user(username):
+    return User.objects.create_user(username=username, email=f'{username}@example.com', password='pass')
+
+
+def create_group(name='Anxiety support', *members):
+    group = DiscussionGroup.objects.create(name=name, description=name, topic_type='anxiety')
+    for member in members:
+        DiscussionGroupMembership.objects.create(user=member, discussion_group=group)
+    return group
+
+
+class CommunityTestCase(TestCase):
+    """
+    Clears the per-process cache between tests and keeps background tasks
+    (fan-out, notifications, live updates) from running
+    """
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch('api.background._executor')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(cache.clear)
+
+
+class ModerationEngineTests(TestCase):
+    def test_names_the_rule_that_matched(self):
+        self.assertEqual(moderation_engine.first_violation('call me on 555-123-4567'), 'phone_number')
+        self.assertEqual(moderation_engine.first_violation('mail me at sam@example.com'), 'email_address')
+        self.assertEqual(moderation_engine.first_violation('my server is 10.0.0.1'), 'ip_address')
+        self.assertEqual(moderation_engine.first_violation('they hate people like us'), 'hate_speech')
+        self.assertIsNone(moderation_engine.first_violation('I went for a walk and felt calmer'))
+
+    def test_rejects_empty_and_non_text_content(self):
+        self.assertFalse(moderation_engine.check(''))
+        self.assertFalse(moderation_engine.check(None))
+        self.assertFalse(moderation_engine.check(42))
+
+    def test_check_many_keeps_input_order(self):
+        contents = ['Breathing helped today', 'ping me at 555 1234', '', 'Thanks everyone']
+        self.assertEqual(check_many(contents), [True, False, False, True])
+        self.assertEqual(moderation_engine.check_many(contents), [True, False, False, True])
+
+    def test_check_content_without_external_api(self):
+        self.assertTrue(check_content('Small steps still count'))
+        self.assertFalse(check_content('This is explicit'))
+
+    def test_custom_rules(self):
+        engine = ModerationEngine(rules=(('shouting', r'\b[A-Z]{5,}\b'),), flags=0)
+        self.assertEqual(engine.first_violation('STOP THAT NOW, PLEASE'), 'shouting')
+        self.assertTrue(engine.check('stop that now, please'))
+
+    def test_long_input_is_scanned_in_linear_time(self):
+        # Runs that used to backtrack badly on the email and phone patterns
+        self.assertTrue(moderation_engine.check('a' * 50000 + '!'))
+        self.assertTrue(moderation_engine.check('1' * 20000 + 'x'))
+
+
+class EncouragementCounterTests(CommunityTestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = create_user('author')
+        self.reader = create_user('reader')
+        group = create_group('Anxiety support', self.author, self.reader)
+        thread = ForumThread.objects.create(title='Small wins', discussion_group=group, created_by=self.author)
+        self.post = ForumPost.objects.create(thread=thread, author=self.author, content='I made a phone call today')
+
+    def counts(self):
+        self.post.refresh_from_db()
+        return self.post.encouragement_count, dict(
+            EncouragementTypeCount.objects.filter(post=self.post).values_list('encouragement_type', 'count')
+        )
+
+    def test_add_and_remove_keep_counters_in_step(self):
+        add_post_encouragement(self.reader, self.post.id, 'helpful')
+        add_post_encouragement(self.author, self.post.id)
+        self.assertEqual(self.counts(), (2, {'helpful': 1, 'support': 1}))
+
+        self.assertTrue(remove_post_encouragement(self.reader, self.post.id))
+        self.assertFalse(remove_post_encouragement(self.reader, self.post.id))
+        self.assertEqual(self.counts(), (1, {'helpful': 0, 'support': 1}))
+
+    def test_duplicate_encouragement_changes_nothing(self):
+        add_post_encouragement(self.reader, self.post.id)
+        with self.assertRaises(IntegrityError):
+            add_post_encouragement(self.reader, self.post.id)
+        self.assertEqual(self.counts(), (1, {'support': 1}))
+
+    def test_missing_post(self):
+        with self.assertRaises(ForumPost.DoesNotExist):
+            add_post_encouragement(self.reader, self.post.id + 1000)
+
+    def test_toggle(self):
+        self.assertIsNotNone(toggle_post_encouragement(self.reader, self.post.id))
+        self.assertEqual(self.counts()[0], 1)
+        self.assertIsNone(toggle_post_encouragement(self.reader, self.post.id))
+        self.assertEqual(self.counts()[0], 0)
+        self.assertFalse(Encouragement.objects.exists())
+
+    def test_encouraged_set_is_refreshed_on_commit(self):
+        self.assertEqual(get_encouraged_post_ids(self.reader), frozenset())
+        with self.captureOnCommitCallbacks(execute=True):
+            add_post_encouragement(self.reader, self.post.id)
+        self.assertEqual(get_encouraged_post_ids(self.reader), frozenset({self.post.id}))
+        with self.captureOnCommitCallbacks(execute=True):
+            remove_post_encouragement(self.reader, self.post.id)
+        self.assertEqual(get_encouraged_post_ids(self.reader), frozenset())
+
+    def test_story_toggle(self):
+        story = SuccessStory.objects.create(title='Back at work', content='It went well', author=self.author, category='anxiety')
+        with self.captureOnCommitCallbacks(execute=True):
+            toggle_story_encouragement(self.reader, story.id)
+        story.refresh_from_db()
+        self.assertEqual(story.encouragement_count, 1)
+        self.assertEqual(get_encouraged_story_ids(self.reader), frozenset({story.id}))
+        with self.captureOnCommitCallbacks(execute=True):
+            toggle_story_encouragement(self.reader, story.id)
+        story.refresh_from_db()
+        self.assertEqual(story.encouragement_count, 0)
+        self.assertFalse(StoryEncouragement.objects.exists())
+
+    def test_api_create_and_delete_go_through_the_counters(self):
+        client = APIClient()
+        client.force_authenticate(self.reader)
+        response = client.post('/api/community/encouragements/', {'post': self.post.id, 'encouragement_type': 'helpful'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.counts(), (1, {'helpful': 1}))
+
+        duplicate = client.post('/api/community/encouragements/', {'post': self.post.id})
+        self.assertEqual(duplicate.status_code, 400)
+        self.assertEqual(self.counts(), (1, {'helpful': 1}))
+
+        response = client.delete(f"/api/community/encouragements/{response.json()['id']}/")
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.counts(), (0, {'helpful': 0}))
+
+
+class FeedTests(CommunityTestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = create_user('author')
+        self.reader = create_user('reader')
+        self.group = create_group('Anxiety support', self.author, self.reader)
+
+    def start_thread(self, title='First week back'):
+        thread = ForumThread.objects.create(title=title, discussion_group=self.group, created_by=self.author)
+        fan_out_activity(FeedEntryType.THREAD, thread.id)
+        return thread
+
+    def feed(self, user):
+        return [(entry.entry_type, entry.thread_id, entry.post_id) for entry in get_feed_queryset(user)]
+
+    def test_fan_out_on_write_skips_the_actor(self):
+        thread = self.start_thread()
+        post = ForumPost.objects.create(thread=thread, author=self.reader, content='Proud of you')
+        fan_out_activity(FeedEntryType.POST, thread.id, post.id)
+
+        self.assertEqual(self.feed(self.reader), [(FeedEntryType.THREAD, thread.id, None)])
+        self.assertEqual(self.feed(self.author), [(FeedEntryType.POST, thread.id, post.id)])
+
+    @override_settings(COMMUNITY_FEED_FANOUT_LIMIT=1)
+    def test_large_groups_get_a_single_group_entry(self):
+        thread = self.start_thread()
+        self.assertEqual(FeedEntry.objects.filter(user__isnull=True).count(), 1)
+        self.assertEqual(FeedEntry.objects.count(), 1)
+        self.assertEqual(self.feed(self.reader), [(FeedEntryType.THREAD, thread.id, None)])
+        # The group entry is the author's own activity
+        self.assertEqual(self.feed(self.author), [])
+
+    def test_leaving_a_group_drops_its_entries(self):
+        self.start_thread()
+        DiscussionGroupMembership.objects.filter(user=self.reader, discussion_group=self.group).delete()
+        self.assertEqual(self.feed(self.reader), [])
+
+    @override_settings(COMMUNITY_FEED_FANOUT_LIMIT=1)
+    def test_group_entries_only_reach_current_members(self):
+        self.start_thread()
+        outsider = create_user('outsider')
+        self.assertEqual(self.feed(outsider), [])
+
+    def test_newest_first(self):
+        first = self.start_thread('First')
+        second = self.start_thread('Second')
+        self.assertEqual([thread_id for _, thread_id, _ in self.feed(self.reader)], [second.id, first.id])
+
+
+class ThreadListTests(CommunityTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = create_user('reader')
+        self.group = create_group('Anxiety support', self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_threads(self, count, **fields):
+        return [
+            ForumThread.objects.create(title=f'Thread {index}', discussion_group=self.group, created_by=self.user, **fields)
+            for index in range(count)
+        ]
+
+    def list_all(self, page_size):
+        ids = []
+        url = f'/api/community/forum-threads/?page_size={page_size}'
+        while url:
+            data = self.client.get(url).json()
+            ids.extend(thread['id'] for thread in data['results'])
+            url = data['next']
+        return ids
+
+    def test_cursor_walks_every_thread_once_across_ties(self):
+        threads = self.create_threads(5)
+        now = timezone.now()
+        # Two pairs share an updated_at, so the id tie-breaker decides their order
+        for thread, minutes in zip(threads, [5, 5, 3, 3, 1]):
+            ForumThread.objects.filter(pk=thread.pk).update(updated_at=now - timedelta(minutes=minutes))
+
+        ids = self.list_all(page_size=2)
+        self.assertEqual(ids, [threads[4].id, threads[3].id, threads[2].id, threads[1].id, threads[0].id])
+
+    def test_pinned_threads_are_listed_separately(self):
+        regular = self.create_threads(2)
+        pinned = self.create_threads(1, is_pinned=True)
+
+        data = self.client.get('/api/community/forum-threads/').json()
+        self.assertEqual([thread['id'] for thread in data['pinned']], [pinned[0].id])
+        self.assertEqual({thread['id'] for thread in data['results']}, {thread.id for thread in regular})
+
+    def test_pinning_a_thread_refreshes_the_cached_list(self):
+        thread = self.create_threads(1)[0]
+        self.assertEqual(self.client.get('/api/community/forum-threads/pinned/').json(), [])
+
+        thread.is_pinned = True
+        thread.save()
+        self.assertEqual([row['id'] for row in self.client.get('/api/community/forum-threads/pinned/').json()], [thread.id])
+
+    def test_pinned_list_is_built_once_per_version(self):
+        build = mock.Mock(return_value=['cached'])
+        self.assertEqual(get_cached_pinned_threads('anxiety-support', build), ['cached'])
+        self.assertEqual(get_cached_pinned_threads('anxiety-support', build), ['cached'])
+        self.assertEqual(build.call_count, 1)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/community/forum-threads/?cursor=not-a-cursor').status_code, 404)
+
+
+class SearchTests(CommunityTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = create_user('searcher')
+        self.anxiety = create_group('Anxiety support')
+        self.sleep = create_group('Sleep support')
+
+    def create_thread(self, title, group=None, **fields):
+        return ForumThread.objects.create(title=title, discussion_group=group or self.anxiety, created_by=self.user, **fields)
+
+    def test_stronger_matches_rank_first(self):
+        weak = self.create_thread('Walking helped with my mood this week and a little with insomnia')
+        strong = self.create_thread('Insomnia again, insomnia every night')
+        post = ForumPost.objects.create(thread=weak, author=self.user, content='Nothing about sleep here')
+
+        results = search_community('insomnia')
+        self.assertEqual([(result['type'], result['thread']) for result in results], [('thread', strong.id), ('thread', weak.id)])
+        self.assertGreater(results[0]['score'], results[1]['score'])
+        self.assertNotIn(post.id, [result['post'] for result in results])
+
+    def test_posts_are_found_with_their_thread(self):
+        thread = self.create_thread('Evening routine')
+        post = ForumPost.objects.create(thread=thread, author=self.user, content='Chamomile tea before bed', is_anonymous=True)
+
+        [result] = search_community('chamomile')
+        self.assertEqual((result['type'], result['thread'], result['post']), ('post', thread.id, post.id))
+        self.assertEqual(result['author_name'], 'Anonymous')
+        self.assertIn('<mark>Chamomile</mark>', result['snippet'])
+
+    def test_group_scope(self):
+        self.create_thread('Breathing exercises')
+        in_sleep = self.create_thread('Breathing at night', group=self.sleep)
+        self.assertEqual([result['thread'] for result in search_community('breathing', group_ids=[self.sleep.id])], [in_sleep.id])
+        self.assertEqual(search_community('breathing', group_ids=[]), [])
+
+    def test_user_text_is_escaped_and_not_parsed_as_query_syntax(self):
+        self.create_thread('<script>panic</script> attacks or worries')
+        [result] = search_community('panic" OR')
+        self.assertNotIn('<script>', result['snippet'])
+        self.assertIn('<mark>panic</mark>', result['snippet'])
+
+    def test_api_rejects_short_queries(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get('/api/community/search/', {'q': 'a'}).status_code, 400)
+
+
+class LiveUpdateTests(CommunityTestCase):
+    def test_messages_reach_only_their_channel(self):
+        hub = PubSubHub(InProcessBackend())
+
+        async def exchange():
+            here = hub.subscribe('thread:1')
+            elsewhere = hub.subscribe('thread:2')
+            hub.publish('thread:1', 'post_created', {'id': 7})
+            received = await here.get(timeout=1), await elsewhere.get(timeout=0.05)
+            here.close()
+            elsewhere.close()
+            return received
+
+        with override_settings(COMMUNITY_LIVE_UPDATES=True):
+            received = asyncio.run(exchange())
+        self.assertEqual(received, ({'event': 'post_created', 'data': {'id': 7}}, None))
+        self.assertEqual(dict(hub.backend._subscriptions), {})
+
+    def test_nothing_is_published_when_switched_off(self):
+        backend = mock.Mock()
+        hub = PubSubHub(backend)
+        with override_settings(COMMUNITY_LIVE_UPDATES=False), self.captureOnCommitCallbacks() as callbacks:
+            hub.publish('thread:1', 'post_created', {})
+            hub.publish_on_commit('thread:1', 'post_created', {})
+        backend.publish.assert_not_called()
+        self.assertEqual(callbacks, [])
+
+    def test_publish_on_commit_waits_for_the_commit(self):
+        backend = mock.Mock()
+        hub = PubSubHub(backend)
+        with override_settings(COMMUNITY_LIVE_UPDATES=True):
+            with self.captureOnCommitCallbacks(execute=True):
+                hub.publish_on_commit('thread:1', 'post_created', {'id': 7})
+                backend.publish.assert_not_called()
+        backend.publish.assert_called_once_with('thread:1', {'event': 'post_created', 'data': {'id': 7}})
+
+    def test_slow_subscribers_drop_the_oldest_messages(self):
+        backend = InProcessBackend()
+
+        async def overflow():
+            subscription = backend.subscribe('thread:1')
+            subscription.queue = asyncio.Queue(maxsize=2)
+            for number in range(3):
+                backend.publish('thread:1', number)
+            return [await subscription.get(timeout=1), await subscription.get(timeout=1)]
+
+        self.assertEqual(asyncio.run(overflow()), [1, 2])
+
+    def test_cache_backend_relays_messages_published_elsewhere(self):
+        # A long poll interval keeps the poller thread out of the way
+        subscriber_side = CacheBackend(poll_interval=3600)
+        publisher_side = CacheBackend(poll_interval=3600)
+
+        async def relay():
+            subscription = subscriber_side.subscribe('thread:1')
+            publisher_side.publish('thread:1', {'event': 'post_created', 'data': {'id': 7}})
+            subscriber_side._relay('thread:1')
+            return await subscription.get(timeout=1)
+
+        self.assertEqual(asyncio.run(relay()), {'event': 'post_created', 'data': {'id': 7}})
+
+
+class ForumWritePermissionTests(CommunityTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = create_user('member')
+        self.group = create_group('Anxiety support', self.user)
+        self.thread = ForumThread.objects.create(title='Check-in', discussion_group=self.group, created_by=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def reply(self, content='Thinking of you all today', thread=None):
+        return self.client.post('/api/community/forum-posts/', {'thread': thread or self.thread.id, 'content': content})
+
+    def test_thread_metadata_is_read_with_the_membership(self):
+        outsider = create_user('outsider')
+        self.assertEqual(
+            get_thread_for_post(self.thread.id, self.user),
+            {'discussion_group_id': self.group.id, 'is_locked': False, 'is_member': True}
+        )
+        self.assertFalse(get_thread_for_post(self.thread.id, outsider)['is_member'])
+        self.assertIsNone(get_thread_for_post(self.thread.id + 1000, self.user))
+
+    def test_members_can_reply(self):
+        self.assertEqual(self.reply().status_code, 201)
+
+    def test_leaving_takes_effect_despite_the_cached_groups(self):
+        self.assertIn(self.group.id, get_member_group_ids(self.user))
+        DiscussionGroupMembership.objects.filter(user=self.user).delete()
+
+        self.assertFalse(is_group_member(self.user, self.group.id))
+        self.assertEqual(self.reply().status_code, 403)
+        response = self.client.post('/api/community/forum-threads/', {'title': 'New thread', 'discussion_group': self.group.id})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(ForumThread.objects.count(), 1)
+
+    def test_locked_threads_reject_replies(self):
+        ForumThread.objects.filter(pk=self.thread.pk).update(is_locked=True)
+        self.assertEqual(self.reply().status_code, 403)
+        self.assertFalse(ForumPost.objects.exists())
+
+    def test_missing_thread(self):
+        self.assertEqual(self.reply(thread=self.thread.id + 1000).status_code, 400)
+
+
+@override_settings(COMMUNITY_TRENDING_HALF_LIFE_HOURS=24)
+class TrendingTests(CommunityTestCase):
+    def setUp(self):
+        super().setUp()
+        user = create_user('poster')
+        self.group = create_group('Anxiety support')
+        self.other_group = create_group('Sleep support')
+        self.older = ForumThread.objects.create(title='Older', discussion_group=self.group, created_by=user)
+        self.newer = ForumThread.objects.create(title='Newer', discussion_group=self.group, created_by=user)
+        self.elsewhere = ForumThread.objects.create(title='Elsewhere', discussion_group=self.other_group, created_by=user)
+        self.start = timezone.now()
+
+    def at(self, hours):
+        return mock.patch('community.services.trending_service.timezone.now', return_value=self.start + timedelta(hours=hours))
+
+    def record(self, thread, event, hours):
+        with self.at(hours):
+            record_activity(thread.id, thread.discussion_group_id, event)
+
+    def scores(self, hours, group_id=None):
+        cache.clear()
+        with self.at(hours):
+            return [(thread_id, round(score, 6)) for thread_id, score in get_trending_scores(group_id)]
+
+    def test_activity_decays_with_the_half_life(self):
+        self.record(self.older, 'post', 0)
+        self.record(self.older, 'post', 24)
+        self.assertEqual(self.scores(24), [(self.older.id, 4.5)])
+        self.assertEqual(self.scores(48), [(self.older.id, 2.25)])
+
+    def test_recent_activity_overtakes_older_activity(self):
+        self.record(self.older, 'post', 0)
+        self.record(self.newer, 'thread', 24)
+        self.assertEqual(self.scores(24), [(self.newer.id, 2.0), (self.older.id, 1.5)])
+
+    def test_scores_within_a_group(self):
+        self.record(self.older, 'post', 0)
+        self.record(self.elsewhere, 'post', 0)
+        self.assertEqual(self.scores(0, self.other_group.id), [(self.elsewhere.id, 3.0)])
+
+    def test_rebase_keeps_order_and_decayed_scores(self):
+        self.record(self.older, 'post', 0)
+        self.record(self.newer, 'thread', 24)
+        before = self.scores(72)
+
+        with self.at(72):
+            self.assertEqual(rebase_scores(), 0)
+        self.assertEqual(TrendingClock.objects.get().anchor, self.start + timedelta(hours=72))
+        self.assertEqual(self.scores(72), before)
+        stored = dict(ThreadTrendingScore.objects.values_list('thread_id', 'score'))
+        self.assertAlmostEqual(stored[self.newer.id], 0.5)
+
+    def test_rebase_drops_decayed_threads(self):
+        self.record(self.older, 'view', 0)
+        self.record(self.newer, 'post', 0)
+        with self.at(24 * 5):
+            self.assertEqual(rebase_scores(), 1)
+        self.assertEqual(list(ThreadTrendingScore.objects.values_list('thread_id', flat=True)), [self.newer.id])
+
+    @override_settings(COMMUNITY_TRENDING_HALF_LIFE_HOURS=1)
+    def test_activity_rebases_before_weights_overflow(self):
+        self.record(self.older, 'post', 0)
+        # 500 half-lives: exp() of the unrebased weight would be about 1e150
+        self.record(self.newer, 'post', 500)
+        self.assertEqual(TrendingClock.objects.get().anchor, self.start + timedelta(hours=500))
+        self.assertEqual(dict(ThreadTrendingScore.objects.values_list('thread_id', 'score')), {self.newer.id: 3.0})
+
+
+class NearDuplicateTests(CommunityTestCase):
+    TEXT = (
+        'Does anyone have tips for getting through the first week at a new job '
+        'when mornings bring on a wave of anxiety before I even leave home'
+    )
+
+    def setUp(self):
+        super().setUp()
+        self.author = create_user('author')
+        self.other = create_user('other')
+        self.group = create_group('Anxiety support', self.author, self.other)
+        self.thread = ForumThread.objects.create(title='Mornings', discussion_group=self.group, created_by=self.author)
+
+    def record(self, fingerprint, kind=FingerprintKind.THREAD, author=None):
+        return record_fingerprint(kind, self.thread, author or self.author, fingerprint)
+
+    def test_short_texts_are_not_fingerprinted(self):
+        self.assertIsNone(simhash('Feeling better today', FingerprintKind.THREAD))
+        self.assertIsNotNone(simhash('Feeling a bit better today after a walk', FingerprintKind.THREAD))
+        # Replies need more words before they count as copies
+        self.assertIsNone(simhash('Feeling a bit better today after a walk', FingerprintKind.POST))
+
+    def test_case_punctuation_and_word_order_are_ignored(self):
+        reworded = 'ANXIETY... ' + self.TEXT.replace(' anxiety', '').replace('new job', 'job, new')
+        self.assertEqual(simhash(reworded), simhash(self.TEXT))
+
+    def test_matches_within_the_distance_through_any_band(self):
+        fingerprint = (1 << 63) | 0x5A5A_1234_ABCD
+        stored = self.record(fingerprint)
+        # One flipped bit in each of five bands still leaves the sixth intact
+        offset, near = 0, fingerprint
+        for width in BAND_WIDTHS[:-1]:
+            near ^= 1 << offset
+            offset += width
+        self.assertEqual(find_near_duplicate(near), stored)
+        # A sixth flip spoils every band
+        self.assertIsNone(find_near_duplicate(near ^ 1 << offset))
+
+    def test_copies_by_other_members_are_caught(self):
+        self.record(simhash(self.TEXT, FingerprintKind.THREAD))
+        fingerprint, duplicate = is_near_duplicate(self.TEXT.upper(), FingerprintKind.THREAD)
+        self.assertIsNotNone(fingerprint)
+        self.assertEqual(duplicate.author, self.author)
+
+    def test_only_recent_content_counts(self):
+        stored = self.record(simhash(self.TEXT))
+        ContentFingerprint.objects.filter(pk=stored.pk).update(created_at=timezone.now() - timedelta(days=30))
+        self.assertIsNone(find_near_duplicate(simhash(self.TEXT)))
+
+    def test_api(self):
+        author, other = APIClient(), APIClient()
+        author.force_authenticate(self.author)
+        other.force_authenticate(self.other)
+        thread = {'title': self.TEXT, 'discussion_group': self.group.id}
+        self.assertEqual(author.post('/api/community/forum-threads/', thread).status_code, 201)
+        self.assertEqual(other.post('/api/community/forum-threads/', thread).status_code, 403)
+
+        reply = {'thread': self.thread.id, 'content': 'You are not alone, sending hugs'}
+        self.assertEqual(author.post('/api/community/forum-posts/', reply).status_code, 201)
+        self.assertEqual(other.post('/api/community/forum-posts/', reply).status_code, 201)
+
+
+class RelatedThreadTests(CommunityTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = create_user('poster')
+        self.group = create_group('Support')
+        self.insomnia = self.create_thread('Insomnia and racing thoughts', 'Melatonin did not help my insomnia')
+        self.sleep = self.create_thread('Sleep hygiene for insomnia', 'A wind-down routine and no screens')
+        self.running = self.create_thread('Running for mood', 'Started running three mornings a week')
+
+    def create_thread(self, title, content):
+        thread = ForumThread.objects.create(title=title, discussion_group=self.group, created_by=self.user)
+        ForumPost.objects.create(thread=thread, author=self.user, content=content)
+        return thread
+
+    def related(self, thread):
+        return list(RelatedThread.objects.filter(thread=thread).order_by('-score').values_list('related_id', flat=True))
+
+    def test_rows_are_unit_length(self):
+        matrix = build_tfidf([['sleep', 'sleep', 'tea'], ['tea'], []])
+        norms = (matrix.multiply(matrix).sum(axis=1)).A.ravel()
+        self.assertEqual([round(norm, 6) for norm in norms], [1.0, 1.0, 0.0])
+        self.assertAlmostEqual((matrix[1] @ matrix[1].T).toarray()[0, 0], 1.0)
+
+    def test_neighbours_share_terms_and_exclude_the_thread_itself(self):
+        self.assertEqual(build_related_threads(), 3)
+        self.assertEqual(self.related(self.insomnia), [self.sleep.id])
+        self.assertEqual(self.related(self.sleep), [self.insomnia.id])
+        self.assertEqual(self.related(self.running), [])
+
+    @override_settings(COMMUNITY_RELATED_THREADS=1)
+    def test_neighbour_count(self):
+        closer = self.create_thread('Insomnia and racing thoughts again', 'Melatonin and insomnia')
+        build_related_threads()
+        self.assertEqual(self.related(self.insomnia), [closer.id])
+
+    def test_update_needs_a_built_index(self):
+        self.assertIsNone(update_related_threads())
+
+    def test_update_merges_changed_threads_into_existing_lists(self):
+        build_related_threads()
+        self.assertEqual(update_related_threads(), 0)
+
+        new = self.create_thread('Insomnia after night shifts', 'Racing thoughts and no sleep')
+        self.assertGreater(update_related_threads(), 0)
+        self.assertIn(self.insomnia.id, self.related(new))
+        self.assertIn(new.id, self.related(self.insomnia))
+
+        # Retitled away from the topic, it leaves the lists it was in
+        new.title = 'Running playlists'
+        new.save()
+        ForumPost.objects.filter(thread=new).update(content='Songs for running')
+        update_related_threads()
+        self.assertNotIn(new.id, self.related(self.insomnia))
+        self.assertIn(self.running.id, self.related(new))
+
+
+class ChallengeCheckInTests(CommunityTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = create_user('walker')
+        self.today = timezone.localdate()
+        self.challenge = CommunityChallenge.objects.create(
+            title='30 days of walking', description='Walk daily', goal='A walk a day',
+            start_date=self.today - timedelta(days=9), end_date=self.today + timedelta(days=20),
+            created_by=self.user, challenge_type='exercise'
+        )
+
+    def check_in_on(self, *day_indexes, user=None):
+        for index in day_indexes:
+            check_in(user or self.user, self.challenge, self.challenge.start_date + timedelta(days=index))
+
+    def test_streak_helpers(self):
+        days = 0b1110111011
+        self.assertEqual(longest_streak(days), 3)
+        self.assertEqual(longest_streak(0), 0)
+        self.assertEqual(current_streak(days, 9), 3)
+        # No check-in yet on day 6, so the run ending on day 5 still counts
+        self.assertEqual(current_streak(days, 6), 3)
+        self.assertEqual(current_streak(days, 7), 1)
+        self.assertEqual(current_streak(0b1, 5), 0)
+        self.assertEqual(current_streak(days, -1), 0)
+
+    def test_progress_across_many_days(self):
+        join_challenge(self.user, self.challenge)
+        self.check_in_on(0, 1, 2, 4, 5, 8, 9)
+
+        participation = ChallengeParticipation.objects.get(user=self.user)
+        self.assertEqual(len(bytes(participation.checkin_bitmap)), 2)
+        progress = participation_progress(participation, self.challenge, today=self.today)
+        self.assertEqual(progress['checkins'], 7)
+        self.assertTrue(progress['checked_in_today'])
+        self.assertEqual(progress['current_streak'], 2)
+        self.assertEqual(progress['longest_streak'], 3)
+        self.assertEqual(progress['completion_rate'], 0.7)
+        self.assertEqual(progress['days'], [True, True, True, False, True, True, False, False, True, True])
+
+    def test_checking_in_twice_counts_once(self):
+        join_challenge(self.user, self.challenge)
+        self.assertTrue(check_in(self.user, self.challenge)[1])
+        participation, created = check_in(self.user, self.challenge)
+        self.assertFalse(created)
+        self.assertEqual(participation.checkin_count, 1)
+
+    def test_rejected_check_ins(self):
+        with self.assertRaises(ChallengeParticipation.DoesNotExist):
+            check_in(self.user, self.challenge)
+        join_challenge(self.user, self.challenge)
+        with self.assertRaises(ChallengeCheckInError):
+            check_in(self.user, self.challenge, self.today + timedelta(days=1))
+        with self.assertRaises(ChallengeCheckInError):
+            check_in(self.user, self.challenge, self.challenge.start_date - timedelta(days=1))
+        with self.assertRaises(AlreadyParticipatingError):
+            join_challenge(self.user, self.challenge)
+        self.challenge.refresh_from_db()
+        self.assertEqual(self.challenge.participant_count, 1)
+
+    def test_leaderboard(self):
+        runner_up = create_user('runner_up')
+        for user in (self.user, runner_up):
+            join_challenge(user, self.challenge)
+        self.check_in_on(7, 8, 9)
+        self.check_in_on(0, 1, 2, 3, user=runner_up)
+
+        board = get_leaderboard(self.challenge)
+        self.assertEqual(
+            [(entry['rank'], entry['checkins'], entry['current_streak'], entry['longest_streak']) for entry in board],
+            [(1, 4, 0, 4), (2, 3, 3, 3)]
+        )
+        self.assertNotIn(board[0]['name'], ('walker', 'runner_up'))
+
+    def test_api(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = f'/api/community/challenges/{self.challenge.id}/'
+        self.assertEqual(client.post(url + 'join/').status_code, 201)
+        self.assertEqual(client.post(url + 'check-in/').status_code, 201)
+        response = client.post(url + 'check-in/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['checkins'], 1)
+        self.assertEqual(client.post(url + 'check-in/', {'date': 'yesterday'}).status_code, 400)
+
+
+class StoryReviewTests(CommunityTestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = create_user('storyteller')
+        self.moderator = create_user('moderator')
+        self.moderator.is_staff = True
+        self.moderator.save()
+
+    def create_stories(self, count, **fields):
+        return [
+            SuccessStory.objects.create(
+                title=f'Story {index}', content='I finally went back to the gym',
+                author=self.author, category='exercise', **fields
+            )
+            for index in range(count)
+        ]
+
+    @override_settings(STORY_REVIEW_CHUNK_SIZE=2)
+    def test_reviews_in_chunks_and_skips_reviewed_stories(self):
+        stories = self.create_stories(5)
+        [rejected] = self.create_stories(1, is_rejected=True)
+        self.assertEqual(get_pending_count(), 5)
+
+        updated = review_stories([story.id for story in stories] + [rejected.id], True, self.moderator)
+        self.assertEqual(updated, 5)
+        self.assertEqual(get_pending_count(), 0)
+        self.assertEqual(SuccessStory.objects.filter(is_approved=True, reviewed_by=self.moderator).count(), 5)
+        rejected.refresh_from_db()
+        self.assertFalse(rejected.is_approved)
+
+        # A second pass finds nothing left to review
+        self.assertEqual(review_stories([story.id for story in stories], False, self.moderator), 0)
+        self.assertFalse(SuccessStory.objects.filter(is_rejected=True, is_approved=True).exists())
+
+    def test_signals(self):
+        self.create_stories(1, is_rejected=True)
+        [story] = self.create_stories(1)
+        SuccessStory.objects.filter(pk=story.pk).update(content='Read more at https://example.com and www.example.org')
+
+        signals = compute_moderation_signals(story.id)
+        self.assertEqual(signals['flags'], ['contains_links', 'new_account', 'previously_rejected'])
+        self.assertEqual((signals['link_count'], signals['author_rejected_stories']), (2, 1))
+        story.refresh_from_db()
+        self.assertEqual(story.moderation_signals['flags'], signals['flags'])
+        self.assertIsNone(compute_moderation_signals(story.id + 1000))
+
+    def test_api(self):
+        stories = self.create_stories(3)
+        client = APIClient()
+        client.force_authenticate(self.author)
+        self.assertEqual(client.get('/api/community/story-moderation/').status_code, 403)
+
+        client.force_authenticate(self.moderator)
+        queue = client.get('/api/community/story-moderation/').json()
+        self.assertEqual([row['id'] for row in queue['results']], [story.id for story in stories])
+
+        response = client.post('/api/community/story-moderation/reject/', {'ids': [stories[0].id]}, format='json')
+        self.assertEqual(response.json(), {'updated': 1, 'pending': 2})
+        self.assertEqual(client.post('/api/community/story-moderation/approve/', {'ids': []}, format='json').status_code, 400)
+
+
+class NotificationTests(CommunityTestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = create_user('author')
+        self.first = create_user('first')
+        self.second = create_user('second')
+        group = create_group('Anxiety support')
+        self.thread = ForumThread.objects.create(title='Check-in', discussion_group=group, created_by=self.author)
+        self.post = ForumPost.objects.create(thread=self.thread, author=self.author, content='Today was hard')
+
+    def encourage(self, actor):
+        notify_encouragement(self.post.id, self.author.pk, self.thread.id, actor.pk)
+
+    def reply(self, actor, is_anonymous=False):
+        post = ForumPost.objects.create(thread=self.thread, author=actor, content='Hang in there', is_anonymous=is_anonymous)
+        notify_reply(post.id)
+        return post
+
+    def test_events_on_one_post_are_coalesced_by_distinct_actor(self):
+        self.encourage(self.first)
+        self.encourage(self.second)
+        self.encourage(self.first)
+
+        notification = Notification.objects.get(recipient=self.author)
+        self.assertEqual(notification.notification_type, NotificationType.ENCOURAGEMENT)
+        self.assertEqual((notification.actor_count, notification.last_actor), (2, self.first))
+        self.assertEqual(get_unread_count(self.author), 1)
+
+    def test_anonymous_replies_each_count(self):
+        self.reply(self.first, is_anonymous=True)
+        self.reply(self.first, is_anonymous=True)
+        notification = Notification.objects.get(recipient=self.author)
+        self.assertEqual((notification.actor_count, notification.last_actor), (2, None))
+
+    def test_own_activity_is_not_notified(self):
+        self.encourage(self.author)
+        self.reply(self.author)
+        challenge = CommunityChallenge.objects.create(
+            title='Journal daily', description='', goal='', start_date=timezone.localdate(),
+            end_date=timezone.localdate(), created_by=self.author, challenge_type='journaling'
+        )
+        notify_challenge_join(challenge.id, self.author.pk)
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(get_unread_count(self.author), 0)
+
+    def test_reading_starts_a_new_notification(self):
+        self.encourage(self.first)
+        self.assertEqual(mark_read(self.author), 1)
+        self.assertEqual(get_unread_count(self.author), 0)
+
+        self.encourage(self.second)
+        self.assertEqual(Notification.objects.filter(recipient=self.author).count(), 2)
+        self.assertEqual(get_unread_count(self.author), 1)
+        self.assertEqual(mark_read(self.author), 1)
+        self.assertEqual(mark_read(self.author), 0)
+
+    def test_mark_read_by_id_and_deleting_unread(self):
+        self.encourage(self.first)
+        self.reply(self.first)
+        encouragement, reply = Notification.objects.order_by('id')
+        self.assertEqual(get_unread_count(self.author), 2)
+
+        self.assertEqual(mark_read(self.author, [reply.id]), 1)
+        self.assertEqual(get_unread_count(self.author), 1)
+        # Deleting the post takes its unread notification with it
+        self.post.delete()
+        self.assertFalse(Notification.objects.filter(pk=encouragement.pk).exists())
+        self.assertEqual(get_unread_count(self.author), 0)
+
+    def test_api(self):
+        self.encourage(self.first)
+        client = APIClient()
+        client.force_authenticate(self.author)
+        self.assertEqual(client.get('/api/community/notifications/unread-count/').json(), {'unread_count': 1})
+        self.assertEqual(client.post('/api/community/notifications/read/', {'ids': 'all'}, format='json').status_code, 400)
+        response = client.post('/api/community/notifications/read/', {}, format='json')
+        self.assertEqual(response.json(), {'marked_read': 1, 'unread_count': 0})
@@ -5,8 +5,11 @@ from .views import (
     DiscussionGroupViewSet, ForumThreadViewSet, 
     ForumPostViewSet, EncouragementViewSet,
     CommunityChallengeViewSet, SuccessStoryViewSet,
-    StoryEncouragementViewSet
+    StoryEncouragementViewSet, CommunityFeedViewSet,
+    CommunitySearchViewSet, StoryModerationViewSet, NotificationViewSet,
+    thread_events
 )
+from .services.live_updates import live_updates_enabled
 
 router = DefaultRouter()
 router.register(r'discussion-groups', DiscussionGroupViewSet, basename='discussiongroup')
@@ -16,7 +19,16 @@ router.register(r'encouragements', EncouragementViewSet, basename='encouragement
 router.register(r'challenges', CommunityChallengeViewSet, basename='communitychallenge')
 router.register(r'success-stories', SuccessStoryViewSet, basename='successstory')
 router.register(r'story-encouragements', StoryEncouragementViewSet, basename='storyencouragement')
+router.register(r'feed', CommunityFeedViewSet, basename='feed')
+router.register(r'search', CommunitySearchViewSet, basename='search')
+router.register(r'story-moderation', StoryModerationViewSet, basename='storymoderation')
+router.register(r'notifications', NotificationViewSet, basename='notification')
 
 urlpatterns = [
     path('', include(router.urls)),
-]
\ No newline at end of file
+]
+
+if live_updates_enabled():
+    urlpatterns.append(
+        path('forum-threads/<int:thread_id>/events/', thread_events, name='forumthread-events')
+    )
\ No newline at end of file
@@ -1,23 +1,60 @@
 # backend/community/views.py
-from django.db.models import Count
-from rest_framework import viewsets, status, permissions
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from django.db import IntegrityError
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from rest_framework import viewsets, mixins, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, AuthenticationFailed, ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework_simplejwt.authentication import JWTAuthentication
 from .models import (
     DiscussionGroup, ForumThread, ForumPost, Encouragement,
     CommunityChallenge, SuccessStory, StoryEncouragement,
-    DiscussionGroupMembership, ChallengeParticipation
+    DiscussionGroupMembership, ChallengeParticipation, FingerprintKind,
+    Notification
 )
 from .serializers import (
     DiscussionGroupSerializer, ForumThreadListSerializer,
     ForumThreadDetailSerializer, ForumPostSerializer,
     EncouragementSerializer, CommunityChallengeSerializer,
-    SuccessStorySerializer, StoryEncouragementSerializer
+    SuccessStorySerializer, StoryEncouragementSerializer,
+    FeedEntrySerializer, StoryModerationSerializer, StoryReviewSerializer,
+    NotificationSerializer
+)
+from .services.moderation_service import check_content, track_provisional
+from .services.fingerprint_service import is_near_duplicate, record_fingerprint
+from .services.feed_service import (
+    get_feed_queryset, schedule_thread_fan_out, schedule_post_fan_out
+)
+from .services.encouragement_service import (
+    add_post_encouragement, remove_post_encouragement, toggle_post_encouragement,
+    add_story_encouragement, remove_story_encouragement, toggle_story_encouragement
 )
-from .services.moderation_service import check_content
+from .services.thread_service import get_cached_pinned_threads, get_member_group_ids, is_group_member
+from .services.search_service import search_community
+from .services.live_updates import get_hub, thread_channel
+from .services.trending_service import record_activity, get_trending_scores
+from .services.story_moderation_service import (
+    pending_stories, get_pending_count, review_stories, story_submitted
+)
+from .services.notification_service import notify_reply, get_unread_count, mark_read
+from .services.challenge_service import (
+    AlreadyParticipatingError, ChallengeCheckInError, join_challenge, check_in,
+    complete_challenge, participation_progress, get_leaderboard
+)
+from api.background import submit, submit_on_commit
+from api.pagination import KeysetPagination
 from api.permissions import IsOwner
 
+DUPLICATE_CONTENT_MESSAGE = "This is too similar to content posted recently."
+
 
 class DiscussionGroupViewSet(viewsets.ModelViewSet):
     """
@@ -82,12 +119,18 @@ class DiscussionGroupViewSet(viewsets.ModelViewSet):
         )
 
 
+class ForumThreadPagination(KeysetPagination):
+    ordering = ('-is_pinned', '-updated_at', '-id')
+    page_size = 10
+
+
 class ForumThreadViewSet(viewsets.ModelViewSet):
     """
     ViewSet for forum threads
     """
     queryset = ForumThread.objects.all()
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ForumThreadPagination
     
     def get_serializer_class(self):
         if self.action == 'retrieve':
@@ -101,18 +144,94 @@ class ForumThreadViewSet(viewsets.ModelViewSet):
         if group_param:
             queryset = queryset.filter(discussion_group__slug=group_param)
 
-        return queryset.annotate(post_count=Count('posts'))
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related(
+                'posts__author', 'posts__encouragement_type_counts'
+            )
+        elif self.action == 'list':
+            # Pinned threads are served separately from a cached list
+            queryset = queryset.filter(is_pinned=False)
+
+        return self.annotate_activity(queryset)
+    
+    def annotate_activity(self, queryset):
+        # Correlated subqueries only run for the rows on the current page
+        posts = ForumPost.objects.filter(thread=OuterRef('pk')).order_by()
+        return queryset.select_related('created_by').annotate(
+            post_count=Coalesce(
+                Subquery(posts.values('thread').annotate(total=Count('id')).values('total')),
+                Value(0)
+            ),
+            last_post_at=Subquery(posts.order_by('-created_at').values('created_at')[:1])
+        )
+    
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if not request.query_params.get(self.paginator.cursor_query_param):
+            response.data['pinned'] = self.get_pinned_threads()
+        return response
+    
+    @action(detail=False, methods=['get'])
+    def pinned(self, request):
+        return Response(self.get_pinned_threads())
+    
+    def get_pinned_threads(self):
+        group_param = self.request.query_params.get('group', None)
+
+        def build():
+            queryset = ForumThread.objects.filter(is_pinned=True).order_by('-updated_at', '-id')
+            if group_param:
+                queryset = queryset.filter(discussion_group__slug=group_param)
+            return ForumThreadListSerializer(
+                self.annotate_activity(queryset), many=True
+            ).data
+
+        return get_cached_pinned_threads(group_param, build)
+    
+    def retrieve(self, request, *args, **kwargs):
+        thread = self.get_object()
+        serializer = self.get_serializer(thread)
+        submit(record_activity, thread.id, thread.discussion_group_id, 'view')
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        """Threads with the most recent activity, globally or in one group"""
+        group_id = None
+        group_param = request.query_params.get('group', None)
+        if group_param:
+            group_id = DiscussionGroup.objects.filter(
+                slug=group_param
+            ).values_list('id', flat=True).first()
+            if group_id is None:
+                return Response(
+                    {"detail": "Group not found."},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+        
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            limit = 10
+        
+        top = get_trending_scores(group_id, limit)
+        threads = self.annotate_activity(
+            ForumThread.objects.all()
+        ).in_bulk([thread_id for thread_id, score in top])
+        
+        results = []
+        for thread_id, score in top:
+            if thread_id in threads:
+                item = ForumThreadListSerializer(threads[thread_id]).data
+                item['trending_score'] = round(score, 3)
+                results.append(item)
+        return Response(results)
 
     
     def perform_create(self, serializer):
         # Check if user is a member of the discussion group
-        discussion_group_id = self.request.data.get('discussion_group')
-        is_member = DiscussionGroupMembership.objects.filter(
-            user=self.request.user,
-            discussion_group_id=discussion_group_id
-        ).exists()
-        
-        if not is_member:
+        discussion_group = serializer.validated_data['discussion_group']
+        if not is_group_member(self.request.user, discussion_group.id):
             raise PermissionDenied("You must be a member of the group to create a thread.")
         
         # Moderation check
@@ -120,7 +239,15 @@ class ForumThreadViewSet(viewsets.ModelViewSet):
         if not check_content(title):
             raise PermissionDenied("Content failed moderation check.")
         
-        serializer.save(created_by=self.request.user)
+        fingerprint, duplicate = is_near_duplicate(title, FingerprintKind.THREAD)
+        if duplicate:
+            raise PermissionDenied(DUPLICATE_CONTENT_MESSAGE)
+        
+        thread = serializer.save(created_by=self.request.user)
+        track_provisional(thread, title)
+        record_fingerprint(FingerprintKind.THREAD, thread, self.request.user, fingerprint)
+        schedule_thread_fan_out(thread)
+        submit_on_commit(record_activity, thread.id, thread.discussion_group_id, 'thread')
 
 
 class ForumPostViewSet(viewsets.ModelViewSet):
@@ -132,23 +259,20 @@ class ForumPostViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        queryset = ForumPost.objects.all()
+        queryset = ForumPost.objects.select_related('author').prefetch_related(
+            'encouragement_type_counts'
+        )
         thread_id = self.request.query_params.get('thread', None)
         if thread_id:
             queryset = queryset.filter(thread_id=thread_id)
         return queryset
     
     def perform_create(self, serializer):
-        # Check if user is a member of the discussion group
-        thread_id = self.request.data.get('thread')
-        thread = ForumThread.objects.get(id=thread_id)
-        
-        is_member = DiscussionGroupMembership.objects.filter(
-            user=self.request.user,
-            discussion_group=thread.discussion_group
-        ).exists()
+        # Check if user is a member of the discussion group; the thread and
+        # the membership were read together while validating
+        thread = serializer.validated_data['thread']
         
-        if not is_member:
+        if not thread.is_member:
             raise PermissionDenied("You must be a member of the group to post.")
         
         if thread.is_locked:
@@ -159,7 +283,23 @@ class ForumPostViewSet(viewsets.ModelViewSet):
         if not check_content(content):
             raise PermissionDenied("Content failed moderation check.")
         
-        serializer.save(author=self.request.user)
+        fingerprint, duplicate = is_near_duplicate(content, FingerprintKind.POST)
+        if duplicate:
+            raise PermissionDenied(DUPLICATE_CONTENT_MESSAGE)
+        
+        post = serializer.save(author=self.request.user)
+        track_provisional(post, content)
+        record_fingerprint(FingerprintKind.POST, post, self.request.user, fingerprint)
+        schedule_post_fan_out(post)
+        submit_on_commit(record_activity, thread.id, thread.discussion_group_id, 'post')
+        submit_on_commit(notify_reply, post.id)
+        get_hub().publish_on_commit(thread_channel(post.thread_id), 'post_created', {
+            'id': post.id,
+            'thread': post.thread_id,
+            'author_name': "Anonymous" if post.is_anonymous else self.request.user.username,
+            'content': post.content,
+            'created_at': post.created_at.isoformat(),
+        })
 
 
 class EncouragementViewSet(viewsets.ModelViewSet):
@@ -174,32 +314,49 @@ class EncouragementViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return Encouragement.objects.filter(user=self.request.user)
     
+    def perform_create(self, serializer):
+        # Through the service, so the counters, caches, live update and
+        # notification all follow
+        try:
+            serializer.instance = add_post_encouragement(
+                self.request.user,
+                serializer.validated_data['post'].id,
+                serializer.validated_data.get('encouragement_type', 'support')
+            )
+        except IntegrityError:
+            raise ValidationError({"detail": "Encouragement already given."})
+    
+    def perform_destroy(self, instance):
+        remove_post_encouragement(self.request.user, instance.post_id)
+    
     @action(detail=False, methods=['post'])
     def toggle(self, request):
         post_id = request.data.get('post')
         encouragement_type = request.data.get('encouragement_type', 'support')
         
-        # Check if encouragement already exists
         try:
-            encouragement = Encouragement.objects.get(
-                post_id=post_id,
-                user=request.user
+            encouragement = toggle_post_encouragement(
+                request.user, post_id, encouragement_type
+            )
+        except ForumPost.DoesNotExist:
+            return Response(
+                {"detail": "Post not found."},
+                status=status.HTTP_404_NOT_FOUND
             )
-            # If exists, remove it (toggle off)
-            encouragement.delete()
+        except IntegrityError:
+            # A concurrent toggle by the same user won the race
+            return Response(
+                {"detail": "Encouragement already given."},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        if encouragement is None:
             return Response(
                 {"detail": "Encouragement removed."},
                 status=status.HTTP_200_OK
             )
-        except Encouragement.DoesNotExist:
-            # If doesn't exist, create it (toggle on)
-            encouragement = Encouragement.objects.create(
-                post_id=post_id,
-                user=request.user,
-                encouragement_type=encouragement_type
-            )
-            serializer = self.get_serializer(encouragement)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        serializer = self.get_serializer(encouragement)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
 class CommunityChallengeViewSet(viewsets.ModelViewSet):
@@ -221,20 +378,14 @@ class CommunityChallengeViewSet(viewsets.ModelViewSet):
     def join(self, request, pk=None):
         challenge = self.get_object()
         
-        if ChallengeParticipation.objects.filter(
-            user=request.user,
-            challenge=challenge
-        ).exists():
+        try:
+            join_challenge(request.user, challenge)
+        except AlreadyParticipatingError:
             return Response(
                 {"detail": "Already participating in this challenge."},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        ChallengeParticipation.objects.create(
-            user=request.user,
-            challenge=challenge
-        )
-        
         return Response(
             {"detail": "Successfully joined the challenge."},
             status=status.HTTP_201_CREATED
@@ -255,13 +406,73 @@ class CommunityChallengeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        participation.completed = True
-        participation.save()
+        complete_challenge(participation)
         
         return Response(
             {"detail": "Challenge marked as completed."},
             status=status.HTTP_200_OK
         )
+    
+    @action(detail=True, methods=['post'], url_path='check-in')
+    def check_in(self, request, pk=None):
+        """Check in for today, or for an earlier day given as ?date=YYYY-MM-DD"""
+        challenge = self.get_object()
+        
+        day = None
+        date_param = request.data.get('date') or request.query_params.get('date')
+        if date_param:
+            try:
+                day = parse_date(str(date_param))
+            except ValueError:
+                day = None
+            if day is None:
+                return Response(
+                    {"detail": "Invalid date format. Use YYYY-MM-DD."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        try:
+            participation, created = check_in(request.user, challenge, day)
+        except ChallengeParticipation.DoesNotExist:
+            return Response(
+                {"detail": "Not participating in this challenge."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except ChallengeCheckInError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(
+            participation_progress(participation, challenge),
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+    
+    @action(detail=True, methods=['get'])
+    def progress(self, request, pk=None):
+        challenge = self.get_object()
+        
+        try:
+            participation = ChallengeParticipation.objects.get(
+                user=request.user,
+                challenge=challenge
+            )
+        except ChallengeParticipation.DoesNotExist:
+            return Response(
+                {"detail": "Not participating in this challenge."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response(participation_progress(participation, challenge))
+    
+    @action(detail=True, methods=['get'])
+    def leaderboard(self, request, pk=None):
+        challenge = self.get_object()
+        
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            limit = 10
+        
+        return Response(get_leaderboard(challenge, limit))
 
 
 class SuccessStoryViewSet(viewsets.ModelViewSet):
@@ -285,10 +496,58 @@ class SuccessStoryViewSet(viewsets.ModelViewSet):
         if not check_content(content):
             raise PermissionDenied("Content failed moderation check.")
         
-        serializer.save(
+        fingerprint, duplicate = is_near_duplicate(content, FingerprintKind.STORY)
+        if duplicate:
+            raise PermissionDenied(DUPLICATE_CONTENT_MESSAGE)
+        
+        story = serializer.save(
             author=self.request.user,
             is_approved=False  # All stories require approval
         )
+        track_provisional(story, content)
+        record_fingerprint(FingerprintKind.STORY, story, self.request.user, fingerprint)
+        submit_on_commit(story_submitted, story.id)
+
+
+class StoryModerationPagination(KeysetPagination):
+    # Oldest first, so the backlog is worked through in order
+    ordering = ('created_at', 'id')
+    page_size = 50
+    max_page_size = 500
+
+
+class StoryModerationViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Moderation queue of success stories waiting for review
+    """
+    serializer_class = StoryModerationSerializer
+    permission_classes = [permissions.IsAdminUser]
+    pagination_class = StoryModerationPagination
+    
+    def get_queryset(self):
+        queryset = pending_stories().select_related('author')
+        category = self.request.query_params.get('category', None)
+        if category:
+            queryset = queryset.filter(category=category)
+        return queryset
+    
+    @action(detail=False, methods=['get'])
+    def count(self, request):
+        return Response({"pending": get_pending_count()})
+    
+    @action(detail=False, methods=['post'])
+    def approve(self, request):
+        return self._review(request, approve=True)
+    
+    @action(detail=False, methods=['post'])
+    def reject(self, request):
+        return self._review(request, approve=False)
+    
+    def _review(self, request, approve):
+        serializer = StoryReviewSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updated = review_stories(serializer.validated_data['ids'], approve, request.user)
+        return Response({"updated": updated, "pending": get_pending_count()})
 
 
 class StoryEncouragementViewSet(viewsets.ModelViewSet):
@@ -300,27 +559,181 @@ class StoryEncouragementViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     http_method_names = ['get', 'post', 'delete']
     
+    def get_queryset(self):
+        return StoryEncouragement.objects.filter(user=self.request.user)
+    
+    def perform_create(self, serializer):
+        try:
+            serializer.instance = add_story_encouragement(
+                self.request.user,
+                serializer.validated_data['story'].id
+            )
+        except IntegrityError:
+            raise ValidationError({"detail": "Encouragement already given."})
+    
+    def perform_destroy(self, instance):
+        remove_story_encouragement(self.request.user, instance.story_id)
+    
     @action(detail=False, methods=['post'])
     def toggle(self, request):
         story_id = request.data.get('story')
         
-        # Check if encouragement already exists
         try:
-            encouragement = StoryEncouragement.objects.get(
-                story_id=story_id,
-                user=request.user
+            encouragement = toggle_story_encouragement(request.user, story_id)
+        except SuccessStory.DoesNotExist:
+            return Response(
+                {"detail": "Story not found."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        except IntegrityError:
+            return Response(
+                {"detail": "Encouragement already given."},
+                status=status.HTTP_409_CONFLICT
             )
-            # If exists, remove it (toggle off)
-            encouragement.delete()
+        
+        if encouragement is None:
             return Response(
                 {"detail": "Encouragement removed."},
                 status=status.HTTP_200_OK
             )
-        except StoryEncouragement.DoesNotExist:
-            # If doesn't exist, create it (toggle on)
-            encouragement = StoryEncouragement.objects.create(
-                story_id=story_id,
-                user=request.user
+        serializer = self.get_serializer(encouragement)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class FeedPagination(CursorPagination):
+    ordering = ('-created_at', '-id')
+    page_size = 20
+
+
+class CommunityFeedViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Personalized feed of new threads and replies across the user's groups
+    """
+    serializer_class = FeedEntrySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = FeedPagination
+    
+    def get_queryset(self):
+        return get_feed_queryset(self.request.user)
+
+
+class NotificationPagination(KeysetPagination):
+    ordering = ('-updated_at', '-id')
+
+
+class NotificationViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    The user's notification inbox, most recently active first
+    """
+    serializer_class = NotificationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotificationPagination
+    
+    def get_queryset(self):
+        queryset = Notification.objects.filter(
+            recipient=self.request.user
+        )
+        if self.request.query_params.get('unread') == 'true':
+            queryset = queryset.filter(is_read=False)
+        return queryset
+    
+    @action(detail=False, methods=['get'], url_path='unread-count')
+    def unread_count(self, request):
+        return Response({"unread_count": get_unread_count(request.user)})
+    
+    @action(detail=False, methods=['post'])
+    def read(self, request):
+        """Mark the notifications in `ids` read, or all of them when no ids are sent"""
+        ids = request.data.get('ids')
+        if ids is not None:
+            if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+                return Response(
+                    {"detail": "ids must be a list of notification ids."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        marked = mark_read(request.user, ids)
+        return Response({"marked_read": marked, "unread_count": get_unread_count(request.user)})
+
+
+class CommunitySearchViewSet(viewsets.ViewSet):
+    """
+    Ranked full-text search over thread titles and post content
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def list(self, request):
+        query = request.query_params.get('q', '').strip()
+        if len(query) < 2:
+            return Response(
+                {"detail": "Search query must be at least 2 characters."},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            serializer = self.get_serializer(encouragement)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
\ No newline at end of file
+        
+        # Every group is open to signed-in users; results can be narrowed
+        # to one group or to the groups the user has joined
+        group_ids = None
+        group_param = request.query_params.get('group', None)
+        if group_param:
+            group_ids = list(DiscussionGroup.objects.filter(
+                slug=group_param
+            ).values_list('id', flat=True))
+        elif request.query_params.get('joined') == 'true':
+            group_ids = list(get_member_group_ids(request.user))
+        
+        try:
+            limit = min(int(request.query_params.get('limit', 20)), 50)
+        except ValueError:
+            limit = 20
+        
+        return Response(search_community(query, group_ids=group_ids, limit=max(limit, 1)))
+
+
+SSE_KEEPALIVE_SECONDS = 15
+# Streams end after this long and the client reconnects; Django does not
+# always notice a disconnected client, so this bounds abandoned streams
+SSE_MAX_STREAM_SECONDS = 300
+
+
+def _authenticate_stream_request(request):
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+async def thread_events(request, thread_id):
+    """
+    Server-sent event stream of new posts and encouragement changes in a
+    thread. Needs an ASGI server: each open stream is a waiting coroutine,
+    not a worker thread. Only routed when COMMUNITY_LIVE_UPDATES is on.
+    """
+    user = await sync_to_async(_authenticate_stream_request)(request)
+    if user is None:
+        return JsonResponse(
+            {"detail": "Authentication credentials were not provided."},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+    if not await ForumThread.objects.filter(id=thread_id).aexists():
+        raise Http404("Thread not found.")
+
+    subscription = get_hub().subscribe(thread_channel(thread_id))
+
+    async def stream():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + SSE_MAX_STREAM_SECONDS
+        try:
+            yield 'retry: 3000\n\n'
+            while loop.time() < deadline:
+                message = await subscription.get(timeout=SSE_KEEPALIVE_SECONDS)
+                if message is None:
+                    yield ': keep-alive\n\n'
+                else:
+                    yield f"event: {message['event']}\ndata: {json.dumps(message['data'])}\n\n"
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -7,8 +7,11 @@ from .models import (
     UserAchievement,
     Reward,
     UserReward,
-    UserPoints
+    UserPoints,
+    PointsLedgerEntry,
+    RedemptionCode
 )
+from .services.reward_service import set_reward_stock
 
 @admin.register(Quest)
 class QuestAdmin(admin.ModelAdmin):
@@ -34,8 +37,8 @@ class UserQuestAdmin(admin.ModelAdmin):
 
 @admin.register(Achievement)
 class AchievementAdmin(admin.ModelAdmin):
-    list_display = ('title', 'category', 'required_count', 'points', 'badge_preview')
-    list_filter = ('category', 'is_active')
+    list_display = ('title', 'criteria_type', 'category', 'required_count', 'points', 'badge_preview')
+    list_filter = ('criteria_type', 'category', 'is_active')
     search_fields = ('title', 'description')
     readonly_fields = ['badge_preview']
     
@@ -58,7 +61,7 @@ class UserAchievementAdmin(admin.ModelAdmin):
 
 @admin.register(Reward)
 class RewardAdmin(admin.ModelAdmin):
-    list_display = ('title', 'points_required', 'is_active', 'reward_image_preview')
+    list_display = ('title', 'points_required', 'stock_total', 'per_user_limit', 'generate_codes', 'is_active', 'reward_image_preview')
     list_filter = ('is_active',)
     search_fields = ('title', 'description')
     readonly_fields = ['reward_image_preview']
@@ -69,6 +72,16 @@ class RewardAdmin(admin.ModelAdmin):
             return format_html('<img src="{}" width="50" height="50" style="object-fit: contain;" />', obj.image.url)
         return 'No Image'
     reward_image_preview.short_description = 'Image Preview'
+    
+    def save_model(self, request, obj, form, change):
+        restock = not change or 'stock_total' in form.changed_data
+        units = obj.stock_total
+        if restock:
+            # set_reward_stock applies the change from the stored total
+            obj.stock_total = form.initial.get('stock_total') if change else None
+        super().save_model(request, obj, form, change)
+        if restock:
+            set_reward_stock(obj, units)
 
 @admin.register(UserReward)
 class UserRewardAdmin(admin.ModelAdmin):
@@ -81,4 +94,27 @@ class UserPointsAdmin(admin.ModelAdmin):
     list_display = ('user', 'total_points', 'current_points', 'last_updated')
     search_fields = ('user__username',)
     raw_id_fields = ('user',)
-    readonly_fields = ('last_updated',)
\ No newline at end of file
+    # Balances change only through the points ledger
+    readonly_fields = ('total_points', 'current_points', 'last_updated')
+
+@admin.register(PointsLedgerEntry)
+class PointsLedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'kind', 'points', 'lifetime_points', 'reason', 'created_at')
+    list_filter = ('kind',)
+    search_fields = ('user__username', 'reason')
+    raw_id_fields = ('user',)
+    date_hierarchy = 'created_at'
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(RedemptionCode)
+class RedemptionCodeAdmin(admin.ModelAdmin):
+    list_display = ('reward', 'code', 'is_imported', 'claimed_by', 'claimed_at')
+    list_filter = ('is_imported', 'reward')
+    search_fields = ('code', 'claimed_by__username')
+    raw_id_fields = ('reward', 'claimed_by')
+    readonly_fields = ('created_at', 'claimed_by', 'claimed_at')
@@ -0,0 +1,101 @@
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from gamification.models import Reward, UserReward
+from gamification.services.points_service import add_points
+from gamification.services.reward_service import (
+    RedemptionError, get_stock_remaining, redeem_reward, set_reward_stock
+)
+
+USERNAME_PREFIX = 'redemption-benchmark-'
+
+
+class Command(BaseCommand):
+    help = 'Measure limited-reward redemption throughput against the number of concurrent clients'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clients',
+            default='1,2,4,8,16',
+            help='Comma-separated numbers of concurrent clients to try'
+        )
+        parser.add_argument('--stock', type=int, default=300, help='Units of the reward per run')
+        parser.add_argument('--users', type=int, default=600, help='Users competing for the stock')
+
+    def handle(self, *args, **options):
+        client_counts = [int(count) for count in options['clients'].split(',')]
+        User = get_user_model()
+        users = []
+        for index in range(options['users']):
+            user, _ = User.objects.get_or_create(
+                username=f'{USERNAME_PREFIX}{index}',
+                defaults={'email': f'{USERNAME_PREFIX}{index}@example.invalid'}
+            )
+            users.append(user)
+        reward = Reward.objects.create(
+            title='Redemption benchmark',
+            description='Temporary reward for benchmark_redemptions',
+            points_required=1,
+            is_active=False
+        )
+
+        try:
+            self.stdout.write('clients  redeemed  rejected  errors  seconds  redemptions/s')
+            for clients in client_counts:
+                UserReward.objects.filter(reward=reward).delete()
+                # Through unlimited, so the stock starts full again
+                set_reward_stock(reward, None)
+                set_reward_stock(reward, options['stock'])
+                for user in users:
+                    add_points(user.pk, 1, reason='Redemption benchmark')
+                redeemed, rejected, errors, elapsed = self._burst(reward, users, clients)
+
+                if get_stock_remaining(reward) != options['stock'] - redeemed or redeemed > options['stock']:
+                    self.stderr.write(self.style.ERROR('Stock does not match the redemptions made'))
+                self.stdout.write(
+                    f'{clients:>7}  {redeemed:>8}  {rejected:>8}  {errors:>6}  '
+                    f'{elapsed:>7.2f}  {redeemed / elapsed if elapsed else 0:>13.1f}'
+                )
+        finally:
+            reward.delete()
+            User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+
+    def _burst(self, reward, users, clients):
+        """
+        Have `clients` threads redeem the reward for every user as fast as
+        they can; returns (redeemed, rejected, errors, seconds)
+        """
+        queue = list(users)
+        lock = threading.Lock()
+        counts = {'redeemed': 0, 'rejected': 0, 'errors': 0}
+
+        def client():
+            try:
+                while True:
+                    with lock:
+                        if not queue:
+                            return
+                        user = queue.pop()
+                    try:
+                        redeem_reward(user, reward)
+                        outcome = 'redeemed'
+                    except RedemptionError:
+                        outcome = 'rejected'
+                    except Exception:
+                        outcome = 'errors'
+                    with lock:
+                        counts[outcome] += 1
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=client) for _ in range(clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return counts['redeemed'], counts['rejected'], counts['errors'], time.perf_counter() - start
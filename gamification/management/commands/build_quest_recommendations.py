@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from gamification.services.recommendation_service import build_quest_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Precompute quest recommendations from what similar users completed'
+
+    def handle(self, *args, **options):
+        users = build_quest_recommendations()
+        self.stdout.write(self.style.SUCCESS(f'Built quest recommendations for {users} users'))
@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from gamification.services.points_service import compact_ledger
+
+
+class Command(BaseCommand):
+    help = 'Fold old points ledger entries into one carried-forward entry per user'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Keep entries from this many days (default: POINTS_LEDGER_RETENTION_DAYS)'
+        )
+
+    def handle(self, *args, **options):
+        before = None
+        if options['days'] is not None:
+            before = timezone.now() - timedelta(days=options['days'])
+        removed = compact_ledger(before)
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} ledger entries'))
@@ -0,0 +1,34 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gamification.models import Reward
+from gamification.services.reward_service import add_codes, generate_codes
+
+
+class Command(BaseCommand):
+    help = "Load partner-supplied codes (one per line) or generate codes into a reward's pool"
+
+    def add_arguments(self, parser):
+        parser.add_argument('reward_id', type=int)
+        parser.add_argument('file', nargs='?', help="File of codes, one per line ('-' for stdin)")
+        parser.add_argument('--generate', type=int, help='Generate this many codes instead')
+
+    def handle(self, *args, **options):
+        reward = Reward.objects.filter(pk=options['reward_id']).first()
+        if reward is None:
+            raise CommandError(f"Reward {options['reward_id']} does not exist")
+
+        if options['generate']:
+            added = generate_codes(reward, options['generate'])
+        elif options['file']:
+            if options['file'] == '-':
+                lines = sys.stdin.read().splitlines()
+            else:
+                with open(options['file']) as codes_file:
+                    lines = codes_file.read().splitlines()
+            added = add_codes(reward, [line.strip() for line in lines], is_imported=True)
+        else:
+            raise CommandError('Give a file of codes or --generate')
+
+        self.stdout.write(self.style.SUCCESS(f'Added {added} codes to {reward.title}'))
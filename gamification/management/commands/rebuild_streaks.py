@@ -0,0 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from api.timezones import parse_timezone
+from gamification.services.streak_service import rebuild_streak
+
+
+class Command(BaseCommand):
+    help = 'Recompute quest streaks from completed quests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only rebuild this user id')
+        parser.add_argument(
+            '--timezone',
+            help="Timezone to draw day boundaries in (default: each user's stored timezone)"
+        )
+
+    def handle(self, *args, **options):
+        tz = None
+        if options['timezone']:
+            tz = parse_timezone(options['timezone'])
+            if tz is None:
+                self.stderr.write(self.style.ERROR(f"Unknown timezone {options['timezone']}"))
+                return
+
+        user_ids = get_user_model().objects.order_by('pk').values_list('pk', flat=True)
+        if options['user']:
+            user_ids = user_ids.filter(pk=options['user'])
+
+        rebuilt = 0
+        for user_id in user_ids.iterator():
+            rebuild_streak(user_id, tz)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt streaks for {rebuilt} users'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from gamification.services.points_service import reconcile_balances
+
+
+class Command(BaseCommand):
+    help = 'Verify points balances against the points ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Reset mismatched balances to the ledger sums'
+        )
+
+    def handle(self, *args, **options):
+        mismatches = reconcile_balances(fix=options['fix'])
+        for user_id, balances, ledger in mismatches:
+            self.stdout.write(
+                f'User {user_id}: balance total/current {balances[0]}/{balances[1]}, '
+                f'ledger {ledger[0]}/{ledger[1]}'
+            )
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('All balances match the ledger'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Fixed {len(mismatches)} balances'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{len(mismatches)} balances differ from the ledger'))
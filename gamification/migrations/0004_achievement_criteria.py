@@ -0,0 +1,72 @@
+# Generated by Django 4.2.7 on 2026-10-19 13:01
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def assign_criteria_and_backfill_counts(apps, schema_editor):
+    Achievement = apps.get_model('gamification', 'Achievement')
+    UserQuest = apps.get_model('gamification', 'UserQuest')
+    UserCategoryCount = apps.get_model('gamification', 'UserCategoryCount')
+
+    # Streak achievements used to be recognised by their title, and ones
+    # without a category can only mean quests completed overall
+    Achievement.objects.filter(title__icontains='streak').update(criteria_type='streak_length')
+    Achievement.objects.filter(category__isnull=True).exclude(
+        title__icontains='streak'
+    ).update(criteria_type='total_quests')
+
+    counts = UserQuest.objects.filter(is_completed=True).values(
+        'user_id', 'quest__category'
+    ).annotate(total=Count('id'))
+    UserCategoryCount.objects.bulk_create(
+        [
+            UserCategoryCount(
+                user_id=row['user_id'],
+                category=row['quest__category'],
+                completed_count=row['total']
+            )
+            for row in counts
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('gamification', '0003_user_streak'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCategoryCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('cbt', 'Cognitive Behavioral Therapy'), ('mindfulness', 'Mindfulness'), ('activity', 'Physical Activity'), ('social', 'Social Connection'), ('gratitude', 'Gratitude Practice')], max_length=20)),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='achievement',
+            name='criteria_type',
+            field=models.CharField(choices=[('category_count', 'Quests completed in a category'), ('total_quests', 'Quests completed overall'), ('streak_length', 'Days in a row with a completed quest'), ('total_points', 'Points earned overall')], default='category_count', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='achievement',
+            index=models.Index(fields=['criteria_type', 'category', 'required_count'], name='achievement_criteria_idx'),
+        ),
+        migrations.AddField(
+            model_name='usercategorycount',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quest_category_counts', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='usercategorycount',
+            unique_together={('user', 'category')},
+        ),
+        migrations.RunPython(assign_criteria_and_backfill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-19 13:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('gamification', '0004_achievement_criteria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('built_at', models.DateTimeField()),
+                ('quest', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='gamification.quest')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quest_recommendations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'rank'], name='questrec_user_rank_idx')],
+                'unique_together': {('user', 'quest')},
+            },
+        ),
+    ]
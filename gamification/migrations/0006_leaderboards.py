@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-19 13:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('gamification', '0005_quest_recommendation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PeriodPoints',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateField()),
+                ('points', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Period points',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='userpoints',
+            index=models.Index(fields=['-total_points', 'user'], name='userpoints_total_idx'),
+        ),
+        migrations.AddField(
+            model_name='periodpoints',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='period_points', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='periodpoints',
+            index=models.Index(fields=['period_start', '-points', 'user'], name='periodpoints_board_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='periodpoints',
+            unique_together={('user', 'period_start')},
+        ),
+    ]
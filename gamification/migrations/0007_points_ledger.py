@@ -0,0 +1,58 @@
+# Generated by Django 4.2.7 on 2026-10-19 13:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def record_opening_balances(apps, schema_editor):
+    UserPoints = apps.get_model('gamification', 'UserPoints')
+    PointsLedgerEntry = apps.get_model('gamification', 'PointsLedgerEntry')
+
+    # Existing balances become each user's first ledger entry
+    now = django.utils.timezone.now()
+    PointsLedgerEntry.objects.bulk_create(
+        (
+            PointsLedgerEntry(
+                user_id=user_id,
+                kind='carry_forward',
+                points=current_points,
+                lifetime_points=total_points,
+                reason='Opening balance',
+                created_at=now
+            )
+            for user_id, total_points, current_points in UserPoints.objects.exclude(
+                total_points=0, current_points=0
+            ).values_list('user_id', 'total_points', 'current_points').iterator()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('gamification', '0006_leaderboards'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PointsLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('earn', 'Earned'), ('spend', 'Spent'), ('adjust', 'Adjusted'), ('carry_forward', 'Carried forward')], max_length=20)),
+                ('points', models.IntegerField()),
+                ('lifetime_points', models.IntegerField(default=0)),
+                ('reason', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='points_ledger', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Points ledger entries',
+                'indexes': [models.Index(fields=['user', 'created_at'], name='pointsledger_user_idx'), models.Index(fields=['created_at'], name='pointsledger_created_idx')],
+            },
+        ),
+        migrations.RunPython(record_opening_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-19 13:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('gamification', '0007_points_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reward',
+            name='code_pool_low_water',
+            field=models.PositiveIntegerField(default=20),
+        ),
+        migrations.AddField(
+            model_name='reward',
+            name='code_pool_refill_size',
+            field=models.PositiveIntegerField(default=100),
+        ),
+        migrations.AddField(
+            model_name='reward',
+            name='generate_codes',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.CreateModel(
+            name='RedemptionCode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=255)),
+                ('is_imported', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('claimed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('reward', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='codes', to='gamification.reward')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('claimed_at__isnull', True)), fields=['reward', 'id'], name='redemptioncode_available_idx')],
+                'unique_together': {('reward', 'code')},
+            },
+        ),
+    ]
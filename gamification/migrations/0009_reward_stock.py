@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-19 13:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamification', '0008_redemption_code_pool'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RewardStockShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('remaining', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='reward',
+            name='per_user_limit',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='reward',
+            name='stock_total',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='userreward',
+            index=models.Index(fields=['user', 'reward'], name='userreward_user_reward_idx'),
+        ),
+        migrations.AddField(
+            model_name='rewardstockshard',
+            name='reward',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_shards', to='gamification.reward'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='rewardstockshard',
+            unique_together={('reward', 'shard')},
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-19 13:20
+
+from django.db import migrations, models
+
+
+def drop_unpooled_codes(apps, schema_editor):
+    Reward = apps.get_model('gamification', 'Reward')
+    RedemptionCode = apps.get_model('gamification', 'RedemptionCode')
+
+    # Templates without a random part are now rendered per redemption; the
+    # one code each had in its pool would otherwise be handed out first
+    for reward_id, template in Reward.objects.exclude(code_template__isnull=True).exclude(
+        code_template=''
+    ).values_list('id', 'code_template'):
+        if not any(f'{{RANDOM{length}}}' in template for length in (4, 6, 8)):
+            RedemptionCode.objects.filter(
+                reward_id=reward_id,
+                is_imported=False,
+                claimed_at__isnull=True
+            ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamification', '0010_catalog_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reward',
+            name='code_template',
+            field=models.CharField(blank=True, help_text='Placeholders: {USERNAME}, {USERID}, {DATE}, {RANDOM4}, {RANDOM6}, {RANDOM8}. Templates without a {RANDOMn} part give every user the same (or a per-user) code.', max_length=255, null=True),
+        ),
+        migrations.RunPython(drop_unpooled_codes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-19 13:27
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_points_earned(apps, schema_editor):
+    Quest = apps.get_model('gamification', 'Quest')
+    UserQuest = apps.get_model('gamification', 'UserQuest')
+
+    # What was credited was never stored; the quest's current value is the
+    # best record there is
+    UserQuest.objects.filter(is_completed=True).update(
+        points_earned=Subquery(Quest.objects.filter(pk=OuterRef('quest_id')).values('points')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamification', '0011_reward_unpooled_templates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userquest',
+            name='points_earned',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_points_earned, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,7 @@
-from django.db import models
+import re
+
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
 from django.utils import timezone
 from django.conf import settings
 from datetime import date, timedelta
@@ -30,6 +33,10 @@ class Quest(models.Model):
     def __str__(self):
         return f"{self.title} ({self.get_category_display()})"
 
+class QuestAlreadyCompletedError(Exception):
+    """Exception raised when completing a quest that is already completed"""
+    pass
+
 class UserQuest(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     quest = models.ForeignKey(Quest, on_delete=models.CASCADE)
@@ -39,93 +46,49 @@ class UserQuest(models.Model):
     reflection = models.TextField(null=True, blank=True)
     mood_before = models.IntegerField(null=True, blank=True)  # 1-5 scale
     mood_after = models.IntegerField(null=True, blank=True)  # 1-5 scale
+    # Points credited at completion; the quest's value may change later
+    points_earned = models.PositiveIntegerField(null=True, blank=True)
     
-    def complete(self, reflection="", mood_after=None):
-        self.completed_at = timezone.now()
-        self.is_completed = True
-        self.reflection = reflection
-        self.mood_after = mood_after
-        self.save()
-        
-        # Create achievement progress
-        self._update_achievements()
+    def complete(self, reflection="", mood_after=None, tz=None):
+        """
+        Mark the quest completed, credit its points and award any
+        achievements this completion unlocks
+        The row is only updated while it is still uncompleted, so of two
+        concurrent completions exactly one credits anything; the other
+        raises QuestAlreadyCompletedError. Returns the points earned.
+        """
+        from .services.achievement_service import record_quest_completion
         
-        return self.quest.points
-    
-    def _update_achievements(self):
-        """Update user's progress toward achievements based on completed quest"""
-        # Count completed quests in this category
-        category_count = UserQuest.objects.filter(
-            user=self.user,
-            quest__category=self.quest.category,
-            is_completed=True
-        ).count()
-        
-        # Check for streak achievements
-        # Get all completed quests for this user, ordered by completion date
-        completed_quests = UserQuest.objects.filter(
-            user=self.user,
-            is_completed=True
-        ).order_by('-completed_at')
-
-        if completed_quests.exists():
-            # Get unique completion dates
-            completion_dates = set()
-            for quest in completed_quests:
-                completion_dates.add(quest.completed_at.date())
-            
-            # Sort dates in descending order (most recent first)
-            sorted_dates = sorted(completion_dates, reverse=True)
+        completed_at = timezone.now()
+        points_earned = self.quest.points
+        with transaction.atomic():
+            if not UserQuest.objects.filter(pk=self.pk, is_completed=False).update(
+                is_completed=True,
+                completed_at=completed_at,
+                reflection=reflection,
+                mood_after=mood_after,
+                points_earned=points_earned
+            ):
+                raise QuestAlreadyCompletedError
+            self.completed_at = completed_at
+            self.is_completed = True
+            self.reflection = reflection
+            self.mood_after = mood_after
+            self.points_earned = points_earned
             
-            # Calculate current streak
-            current_streak = 0
-            today = date.today()
-            
-            # Check if user completed a quest today or yesterday (to account for timezone differences)
-            if sorted_dates[0] >= today - timedelta(days=1):
-                current_streak = 1
-                
-                # Count consecutive days backwards from the most recent completion
-                for i in range(1, len(sorted_dates)):
-                    expected_date = sorted_dates[i-1] - timedelta(days=1)
-                    if sorted_dates[i] == expected_date:
-                        current_streak += 1
-                    else:
-                        break
-            
-            # Check for streak-based achievements
-            streak_achievements = Achievement.objects.filter(
-                title__icontains='streak',  # Assumes streak achievements have 'streak' in title
-                required_count__lte=current_streak,
-                is_active=True
-            )
-            
-            for achievement in streak_achievements:
-                if not UserAchievement.objects.filter(user=self.user, achievement=achievement).exists():
-                    UserAchievement.objects.create(
-                        user=self.user,
-                        achievement=achievement
-                    )
-        
-        # Find achievements that this completion might trigger
-        potential_achievements = Achievement.objects.filter(
-            category=self.quest.category,
-            required_count__lte=category_count,
-            is_active=True
-        )
+            record_quest_completion(self, tz)
         
-        for achievement in potential_achievements:
-            # Check if user already has this achievement
-            if not UserAchievement.objects.filter(user=self.user, achievement=achievement).exists():
-                # Create new user achievement
-                UserAchievement.objects.create(
-                    user=self.user,
-                    achievement=achievement
-                )
+        return self.points_earned
     
     class Meta:
         unique_together = ('user', 'quest', 'started_at')
 
+class AchievementCriteria(models.TextChoices):
+    CATEGORY_COUNT = 'category_count', 'Quests completed in a category'
+    TOTAL_QUESTS = 'total_quests', 'Quests completed overall'
+    STREAK_LENGTH = 'streak_length', 'Days in a row with a completed quest'
+    TOTAL_POINTS = 'total_points', 'Points earned overall'
+
 class Achievement(models.Model):
     title = models.CharField(max_length=100)
     description = models.TextField()
@@ -136,10 +99,21 @@ class Achievement(models.Model):
     )
     # Change CharField to ImageField
     badge_image = models.ImageField(upload_to='achievement_badges/', null=True, blank=True)
+    # What required_count is compared against; category_count uses `category`
+    criteria_type = models.CharField(
+        max_length=20,
+        choices=AchievementCriteria.choices,
+        default=AchievementCriteria.CATEGORY_COUNT
+    )
     required_count = models.IntegerField(default=1)  # How many quests/actions needed
     points = models.IntegerField(default=50)
     is_active = models.BooleanField(default=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['criteria_type', 'category', 'required_count'], name='achievement_criteria_idx'),
+        ]
+    
     def __str__(self):
         return self.title
 
@@ -151,26 +125,106 @@ class UserAchievement(models.Model):
     class Meta:
         unique_together = ('user', 'achievement')
 
+CODE_TEMPLATE_PLACEHOLDERS = frozenset({
+    '{USERNAME}', '{USERID}', '{DATE}', '{RANDOM4}', '{RANDOM6}', '{RANDOM8}'
+})
+
 class Reward(models.Model):
     title = models.CharField(max_length=100)
     description = models.TextField()
     points_required = models.IntegerField()
     partner_name = models.CharField(max_length=100, null=True, blank=True)
-    code_template = models.CharField(max_length=255, null=True, blank=True)
+    code_template = models.CharField(
+        max_length=255, null=True, blank=True,
+        help_text="Placeholders: {USERNAME}, {USERID}, {DATE}, {RANDOM4}, {RANDOM6}, {RANDOM8}. "
+                  "Templates without a {RANDOMn} part give every user the same (or a per-user) code."
+    )
     # Change CharField to ImageField
     image = models.ImageField(upload_to='reward_images/', null=True, blank=True)
     expiry_date = models.DateTimeField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
+    # Code pool: refilled in the background when no more than
+    # code_pool_low_water unclaimed codes remain. Rewards whose codes come
+    # only from partner imports are never refilled automatically.
+    generate_codes = models.BooleanField(default=True)
+    code_pool_low_water = models.PositiveIntegerField(default=20)
+    code_pool_refill_size = models.PositiveIntegerField(default=100)
+    # Units launched in total, redeemed ones included, or None for
+    # unlimited; what is left is held in RewardStockShard rows (see
+    # services.reward_service.set_reward_stock)
+    stock_total = models.PositiveIntegerField(null=True, blank=True)
+    # Redemptions allowed per user, 0 for no limit
+    per_user_limit = models.PositiveIntegerField(default=1)
+    
+    def clean(self):
+        super().clean()
+        if self.code_template:
+            unknown = set(re.findall(r'\{[^{}]*\}', self.code_template)) - CODE_TEMPLATE_PLACEHOLDERS
+            if unknown:
+                raise ValidationError({
+                    'code_template': f"Unknown placeholders: {', '.join(sorted(unknown))}"
+                })
     
     def __str__(self):
         return self.title
 
+class RewardStockShard(models.Model):
+    """
+    One slice of a limited reward's remaining stock
+    Redemptions decrement a random shard, so a burst of them is spread
+    over several rows instead of queueing on one.
+    """
+    reward = models.ForeignKey(Reward, on_delete=models.CASCADE, related_name='stock_shards')
+    shard = models.PositiveSmallIntegerField()
+    remaining = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ('reward', 'shard')
+    
+    def __str__(self):
+        return f"{self.reward_id}#{self.shard}: {self.remaining}"
+
+class RedemptionCode(models.Model):
+    """
+    A pre-generated or partner-supplied code waiting in a reward's pool,
+    handed out to exactly one redemption
+    """
+    reward = models.ForeignKey(Reward, on_delete=models.CASCADE, related_name='codes')
+    code = models.CharField(max_length=255)
+    is_imported = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='+'
+    )
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        unique_together = ('reward', 'code')
+        indexes = [
+            models.Index(
+                fields=['reward', 'id'],
+                name='redemptioncode_available_idx',
+                condition=models.Q(claimed_at__isnull=True)
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.reward_id}: {self.code}"
+
 class UserReward(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     reward = models.ForeignKey(Reward, on_delete=models.CASCADE)
     redeemed_at = models.DateTimeField(auto_now_add=True)
     redemption_code = models.CharField(max_length=255, null=True, blank=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'reward'], name='userreward_user_reward_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.user.username} - {self.reward.title}"
 
@@ -182,15 +236,160 @@ class UserPoints(models.Model):
     
     class Meta:
         verbose_name_plural = "User points"
+        indexes = [
+            models.Index(fields=['-total_points', 'user'], name='userpoints_total_idx'),
+        ]
     
     def add_points(self, points):
-        self.total_points += points
-        self.current_points += points
-        self.save()
+        from .services.points_service import add_points
+        
+        self.total_points = add_points(self.user_id, points)
+        self.refresh_from_db(fields=['current_points', 'last_updated'])
         
     def spend_points(self, points):
-        if self.current_points >= points:
-            self.current_points -= points
-            self.save()
-            return True
-        return False
\ No newline at end of file
+        from .services.points_service import InsufficientPointsError, spend_points
+        
+        try:
+            self.current_points = spend_points(self.user_id, points)
+        except InsufficientPointsError:
+            return False
+        return True
+
+class UserCategoryCount(models.Model):
+    """
+    Number of quests a user has completed in a category
+    Maintained on completion so achievement rules never count history.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='quest_category_counts'
+    )
+    category = models.CharField(max_length=20, choices=QuestCategory.choices)
+    completed_count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ('user', 'category')
+    
+    def __str__(self):
+        return f"{self.user_id}: {self.completed_count} {self.category}"
+
+
+class UserStreak(models.Model):
+    """
+    Running quest-completion streak of a user
+    Updated on each completion (see services.streak_service) so reading a
+    streak never has to scan the user's quest history.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='quest_streak'
+    )
+    current_streak = models.PositiveIntegerField(default=0)
+    longest_streak = models.PositiveIntegerField(default=0)
+    # Local date of the latest completion, in `timezone`
+    last_completion_date = models.DateField(null=True, blank=True)
+    timezone = models.CharField(max_length=64, default='UTC')
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.user_id}: {self.current_streak} days"
+
+
+class QuestRecommendation(models.Model):
+    """
+    A quest recommended to a user, precomputed offline from what similar
+    users completed (see services.recommendation_service)
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='quest_recommendations'
+    )
+    quest = models.ForeignKey(Quest, on_delete=models.CASCADE, related_name='recommendations')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+    built_at = models.DateTimeField()
+    
+    class Meta:
+        unique_together = ('user', 'quest')
+        indexes = [
+            models.Index(fields=['user', 'rank'], name='questrec_user_rank_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id}: #{self.rank} {self.quest_id}"
+
+
+class PeriodPoints(models.Model):
+    """
+    Points a user earned in one leaderboard period (a week starting on
+    Monday), credited as points are earned
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='period_points'
+    )
+    period_start = models.DateField()
+    points = models.IntegerField(default=0)
+    
+    class Meta:
+        verbose_name_plural = "Period points"
+        unique_together = ('user', 'period_start')
+        indexes = [
+            models.Index(fields=['period_start', '-points', 'user'], name='periodpoints_board_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id}: {self.points} in week of {self.period_start}"
+
+
+class PointsEntryKind(models.TextChoices):
+    EARN = 'earn', 'Earned'
+    SPEND = 'spend', 'Spent'
+    ADJUST = 'adjust', 'Adjusted'
+    CARRY_FORWARD = 'carry_forward', 'Carried forward'
+
+
+class PointsLedgerEntry(models.Model):
+    """
+    One change to a user's points, appended as it is applied to UserPoints
+    The sums of a user's entries always equal their balances; old entries
+    are periodically folded into a single carried-forward entry.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='points_ledger'
+    )
+    kind = models.CharField(max_length=20, choices=PointsEntryKind.choices)
+    # Change to current_points (spendable) and total_points (lifetime)
+    points = models.IntegerField()
+    lifetime_points = models.IntegerField(default=0)
+    reason = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name_plural = "Points ledger entries"
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='pointsledger_user_idx'),
+            models.Index(fields=['created_at'], name='pointsledger_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id}: {self.points:+d} ({self.kind})"
+
+
+class CatalogVersion(models.Model):
+    """
+    Counter bumped whenever a quest, achievement or reward changes, so
+    every process can tell when its cached catalog snapshots are stale
+    """
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Catalog version {self.version}"
@@ -1,5 +1,8 @@
 from rest_framework import serializers
+
 from .models import Quest, UserQuest, Achievement, UserAchievement, Reward, UserReward, UserPoints
+from .services.quest_service import get_quest_progress_map, quest_progress
+from .services.reward_service import get_stock_remaining
 
 class QuestSerializer(serializers.ModelSerializer):
     # Fix: Properly declare these as SerializerMethodField
@@ -23,25 +26,27 @@ class QuestSerializer(serializers.ModelSerializer):
             return obj.image.url
         return None
 
+    def _get_progress_map(self):
+        """
+        The caller's quest progress, keyed by quest id
+        Loaded with one query per request and kept in the context, which
+        every serializer in the tree shares (including this one nested in
+        UserQuestSerializer).
+        """
+        if 'quest_progress' not in self.context:
+            request = self.context.get('request')
+            if request and request.user.is_authenticated:
+                self.context['quest_progress'] = get_quest_progress_map(request.user)
+            else:
+                self.context['quest_progress'] = {}
+        return self.context['quest_progress']
+
     def get_is_completed(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return UserQuest.objects.filter(
-                user=request.user,
-                quest=obj,
-                is_completed=True
-            ).exists()
-        return False
+        completed, active_since = self._get_progress_map().get(obj.id, (False, None))
+        return completed
 
     def get_progress(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            quest = UserQuest.objects.filter(
-                user=request.user,
-                quest=obj
-            ).first()
-            return  0.0
-        return 0.0
+        return quest_progress(self._get_progress_map().get(obj.id, (False, None)), obj.duration_minutes)
 
 # Rest of your serializers remain the same
 class UserQuestSerializer(serializers.ModelSerializer):
@@ -51,8 +56,9 @@ class UserQuestSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserQuest
         fields = ['id', 'quest', 'quest_id', 'started_at', 'completed_at',
-                 'is_completed', 'reflection', 'mood_before', 'mood_after']
-        read_only_fields = ['started_at', 'completed_at', 'is_completed']
+                 'is_completed', 'reflection', 'mood_before', 'mood_after',
+                 'points_earned']
+        read_only_fields = ['started_at', 'completed_at', 'is_completed', 'points_earned']
 
 class CompleteQuestSerializer(serializers.Serializer):
     reflection = serializers.CharField(required=False, allow_blank=True)
@@ -63,7 +69,10 @@ class AchievementSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Achievement
-        fields = ['id', 'title', 'description', 'category', 'badge_image', 'points']
+        fields = [
+            'id', 'title', 'description', 'category', 'criteria_type',
+            'required_count', 'badge_image', 'points'
+        ]
     
     def get_badge_image(self, obj):
         if obj.badge_image:
@@ -82,11 +91,13 @@ class UserAchievementSerializer(serializers.ModelSerializer):
         
 class RewardSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    stock_remaining = serializers.SerializerMethodField()
 
     class Meta:
         model = Reward
         fields = ['id', 'title', 'description', 'points_required',
-                 'partner_name', 'image', 'image_url', 'expiry_date']
+                 'partner_name', 'image', 'image_url', 'expiry_date',
+                 'stock_total', 'stock_remaining', 'per_user_limit']
 
     def get_image_url(self, obj):
         """Get the full URL for the image"""
@@ -97,6 +108,19 @@ class RewardSerializer(serializers.ModelSerializer):
             return obj.image.url
         return None
 
+    def get_stock_remaining(self, obj):
+        """Units left, None for unlimited rewards"""
+        if obj.stock_total is None:
+            return None
+        if hasattr(obj, 'stock_remaining'):
+            return obj.stock_remaining or 0
+        # Not annotated (e.g. nested in UserRewardSerializer): look each
+        # reward up once per response
+        remaining = self.context.setdefault('stock_remaining', {})
+        if obj.id not in remaining:
+            remaining[obj.id] = get_stock_remaining(obj)
+        return remaining[obj.id]
+
 class UserRewardSerializer(serializers.ModelSerializer):
     reward = RewardSerializer(read_only=True)
 
@@ -0,0 +1,79 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+
+from ..models import Achievement, AchievementCriteria, UserAchievement, UserCategoryCount
+from .points_service import add_points
+from .streak_service import record_completion
+
+
+def _increment_category_count(user_id, category):
+    updated = UserCategoryCount.objects.filter(user_id=user_id, category=category).update(
+        completed_count=F('completed_count') + 1
+    )
+    if not updated:
+        try:
+            with transaction.atomic():
+                UserCategoryCount.objects.create(user_id=user_id, category=category, completed_count=1)
+        except IntegrityError:
+            # Created concurrently by another completion
+            UserCategoryCount.objects.filter(user_id=user_id, category=category).update(
+                completed_count=F('completed_count') + 1
+            )
+
+
+def evaluate_achievements(user_id, category=None, category_count=0, total_quests=0,
+                          streak_length=0, total_points=0):
+    """
+    Award every active achievement whose criteria the counters now meet
+    The candidates are found with one query over the criteria index and
+    inserted with one bulk_create, however many achievements exist.
+    Returns the newly earned achievements.
+    """
+    met = (
+        Q(criteria_type=AchievementCriteria.TOTAL_QUESTS, required_count__lte=total_quests) |
+        Q(criteria_type=AchievementCriteria.STREAK_LENGTH, required_count__lte=streak_length) |
+        Q(criteria_type=AchievementCriteria.TOTAL_POINTS, required_count__lte=total_points)
+    )
+    if category:
+        met |= Q(
+            criteria_type=AchievementCriteria.CATEGORY_COUNT,
+            category=category,
+            required_count__lte=category_count
+        )
+
+    earned = list(
+        Achievement.objects.filter(met, is_active=True).exclude(
+            id__in=UserAchievement.objects.filter(user_id=user_id).values('achievement_id')
+        )
+    )
+    UserAchievement.objects.bulk_create(
+        [UserAchievement(user_id=user_id, achievement=achievement) for achievement in earned],
+        ignore_conflicts=True
+    )
+    return earned
+
+
+def record_quest_completion(user_quest, tz=None):
+    """
+    Update the user's counters, streak and points for a completed quest,
+    then award the achievements they unlock
+    Returns the newly earned achievements.
+    """
+    user_id = user_quest.user_id
+    category = user_quest.quest.category
+
+    _increment_category_count(user_id, category)
+    counts = dict(
+        UserCategoryCount.objects.filter(user_id=user_id).values_list('category', 'completed_count')
+    )
+    streak = record_completion(user_id, user_quest.completed_at, tz)
+    total_points = add_points(user_id, user_quest.points_earned, reason=f"Completed {user_quest.quest.title}")
+
+    return evaluate_achievements(
+        user_id,
+        category=category,
+        category_count=counts.get(category, 0),
+        total_quests=sum(counts.values()),
+        streak_length=streak.current_streak,
+        total_points=total_points
+    )
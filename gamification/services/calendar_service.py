@@ -0,0 +1,143 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from api.timezones import parse_timezone
+from ..models import UserQuest, UserStreak
+
+
+class CalendarRangeError(Exception):
+    """Exception raised for an invalid calendar date range"""
+    pass
+
+
+def _max_days():
+    return getattr(settings, 'QUEST_CALENDAR_MAX_DAYS', 366)
+
+
+def _cache_timeout():
+    return getattr(settings, 'QUEST_CALENDAR_CACHE_TIMEOUT', 60 * 60 * 24 * 30)
+
+
+def user_timezone(user, tz=None):
+    """
+    The timezone to draw a user's day boundaries in: the one the client
+    sent, else the one their streak was last kept in, else the default
+    """
+    if tz is not None:
+        return tz
+    stored = UserStreak.objects.filter(user=user).values_list('timezone', flat=True).first()
+    return parse_timezone(stored) or timezone.get_default_timezone()
+
+
+def _month_start(day):
+    return day.replace(day=1)
+
+
+def _next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _cache_key(user_id, tz, month):
+    return f"gamification:calendar:{user_id}:{getattr(tz, 'key', tz)}:{month:%Y-%m}"
+
+
+def _completed_by_day(user, tz, start, end):
+    """
+    Return {date: (count, points)} for quests completed from `start` to
+    `end` inclusive, local to `tz`, grouped in the database
+    """
+    rows = UserQuest.objects.filter(
+        user=user,
+        is_completed=True,
+        completed_at__gte=datetime.combine(start, time.min, tzinfo=tz),
+        completed_at__lt=datetime.combine(end + timedelta(days=1), time.min, tzinfo=tz)
+    ).annotate(
+        day=TruncDate('completed_at', tzinfo=tz)
+    ).values('day').annotate(
+        count=Count('id'),
+        points=Sum('points_earned')
+    ).order_by('day')
+    return {row['day']: (row['count'], row['points'] or 0) for row in rows}
+
+
+def get_completion_calendar(user, start, end, tz=None):
+    """
+    Return the user's quest completions per local day from `start` to `end`
+    Only days with completions are listed. Months that have ended can no
+    longer change, so each is cached whole once read; the rest of the range
+    is fetched in one grouped query. Raises CalendarRangeError for an
+    inverted or overlong range.
+    """
+    if start > end:
+        raise CalendarRangeError("start must not be after end.")
+    if (end - start).days + 1 > _max_days():
+        raise CalendarRangeError(f"The range may cover at most {_max_days()} days.")
+
+    tz = user_timezone(user, tz)
+    current_month = _month_start(timezone.localtime(timezone.now(), tz).date())
+
+    months = []
+    month = _month_start(start)
+    while month <= end:
+        months.append(month)
+        month = _next_month(month)
+
+    closed = [month for month in months if month < current_month]
+    cached = cache.get_many([_cache_key(user.pk, tz, month) for month in closed])
+    days = {}
+    missing = []
+    for month in closed:
+        entries = cached.get(_cache_key(user.pk, tz, month))
+        if entries is None:
+            missing.append(month)
+        else:
+            days.update(entries)
+    if months[-1] >= current_month:
+        # The current month (and any after it) is always read fresh
+        missing.append(max(current_month, months[0]))
+
+    if missing:
+        # Whole months, so everything fetched for a closed month can be cached
+        fetched = _completed_by_day(user, tz, min(missing), _next_month(max(missing)) - timedelta(days=1))
+        days.update(fetched)
+        cache.set_many({
+            _cache_key(user.pk, tz, month): {
+                day: totals for day, totals in fetched.items() if _month_start(day) == month
+            }
+            for month in missing if month < current_month
+        }, _cache_timeout())
+
+    entries = [
+        {'date': day.isoformat(), 'count': count, 'points': points}
+        for day, (count, points) in sorted(days.items())
+        if start <= day <= end
+    ]
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'timezone': getattr(tz, 'key', str(tz)),
+        'days': entries,
+        'total_count': sum(entry['count'] for entry in entries),
+        'total_points': sum(entry['points'] for entry in entries),
+    }
+
+
+def get_completed_dates(user, tz=None, start=None, end=None):
+    """
+    Return the distinct local dates the user completed quests on, newest
+    first, deduplicated in the database
+    """
+    tz = user_timezone(user, tz)
+    queryset = UserQuest.objects.filter(user=user, is_completed=True, completed_at__isnull=False)
+    if start is not None:
+        queryset = queryset.filter(completed_at__gte=datetime.combine(start, time.min, tzinfo=tz))
+    if end is not None:
+        queryset = queryset.filter(completed_at__lt=datetime.combine(end + timedelta(days=1), time.min, tzinfo=tz))
+    return list(queryset.annotate(
+        day=TruncDate('completed_at', tzinfo=tz)
+    ).values_list('day', flat=True).distinct().order_by('-day'))
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import threading
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from ..models import (
+    Achievement, CatalogVersion, Quest, Reward, RewardStockShard, UserAchievement, UserPoints
+)
+from .quest_service import get_quest_progress_map, quest_progress
+
+QUESTS = 'quests'
+ACHIEVEMENTS = 'achievements'
+REWARDS = 'rewards'
+
+# Overlay fields computed from the clock; they are left out of the ETag,
+# which hashes the stored state they come from instead
+TIME_DEPENDENT_FIELDS = frozenset({'progress'})
+
+# Catalog name -> (version, serialized items), kept for the life of the process
+_snapshots = {}
+_lock = threading.Lock()
+
+
+def get_catalog_version():
+    return CatalogVersion.objects.filter(id=1).values_list('version', flat=True).first() or 0
+
+
+def bump_catalog_version():
+    """
+    Mark every process's catalog snapshots stale
+    """
+    if CatalogVersion.objects.filter(id=1).update(version=F('version') + 1, updated_at=timezone.now()):
+        return
+    try:
+        with transaction.atomic():
+            CatalogVersion.objects.create(id=1, version=1)
+    except IntegrityError:
+        # Created concurrently
+        CatalogVersion.objects.filter(id=1).update(version=F('version') + 1, updated_at=timezone.now())
+
+
+def _build(name):
+    # Serializers import the services, so import them here
+    from ..serializers import AchievementSerializer, QuestSerializer, RewardSerializer
+
+    if name == QUESTS:
+        return QuestSerializer(Quest.objects.filter(is_active=True).order_by('id'), many=True).data
+    if name == ACHIEVEMENTS:
+        return AchievementSerializer(Achievement.objects.filter(is_active=True).order_by('id'), many=True).data
+    return RewardSerializer(
+        Reward.objects.filter(is_active=True).order_by('points_required', 'id').annotate(
+            stock_remaining=Sum('stock_shards__remaining')
+        ),
+        many=True
+    ).data
+
+
+def get_catalog(name):
+    """
+    Return (version, items) for a catalog
+    Items are serialized without a request (relative image URLs, no
+    per-user state) and shared by every request in the process until
+    the catalog version moves on, so they must not be modified.
+    """
+    version = get_catalog_version()
+    with _lock:
+        snapshot = _snapshots.get(name)
+    if snapshot is not None and snapshot[0] == version:
+        return snapshot
+    snapshot = (version, [dict(item) for item in _build(name)])
+    with _lock:
+        _snapshots[name] = snapshot
+    return snapshot
+
+
+def quest_overlay(user, items):
+    """
+    Return {quest id: user fields} for the quests in a catalog snapshot
+    active_since is included so a client holding a copy revalidated by
+    ETag can bring progress up to date itself.
+    """
+    progress = get_quest_progress_map(user)
+    overlay = {}
+    for item in items:
+        entry = progress.get(item['id'], (False, None))
+        overlay[item['id']] = {
+            'is_completed': entry[0],
+            'active_since': entry[1],
+            'progress': quest_progress(entry, item['duration_minutes']),
+        }
+    return overlay
+
+
+def achievement_overlay(user, items):
+    earned = set(UserAchievement.objects.filter(user=user).values_list('achievement_id', flat=True))
+    return {item['id']: {'is_earned': item['id'] in earned} for item in items}
+
+
+def reward_overlay(user, items):
+    """
+    Affordability for the user, and the stock left, which changes with
+    every redemption and so is never part of the snapshot
+    """
+    current_points = UserPoints.objects.filter(user=user).values_list('current_points', flat=True).first() or 0
+    stock = dict(RewardStockShard.objects.filter(
+        reward_id__in=[item['id'] for item in items if item['stock_total'] is not None]
+    ).values('reward_id').annotate(
+        remaining=Sum('remaining')
+    ).order_by().values_list('reward_id', 'remaining'))
+    return {
+        item['id']: {
+            'can_afford': current_points >= item['points_required'],
+            'stock_remaining': None if item['stock_total'] is None else stock.get(item['id'], 0),
+        }
+        for item in items
+    }
+
+
+OVERLAYS = {
+    QUESTS: quest_overlay,
+    ACHIEVEMENTS: achievement_overlay,
+    REWARDS: reward_overlay,
+}
+
+
+def catalog_etag(version, overlay):
+    """
+    ETag covering both the catalog version and the user's overlay
+    Time-dependent fields are skipped, so the tag only changes when the
+    stored state does.
+    """
+    state = {
+        item_id: {field: value for field, value in fields.items() if field not in TIME_DEPENDENT_FIELDS}
+        for item_id, fields in overlay.items()
+    }
+    digest = hashlib.sha1(json.dumps(state, sort_keys=True, default=str).encode())
+    return f'"{version}-{digest.hexdigest()[:20]}"'
+
+
+def merge_overlay(items, overlay, build_uri=None, url_fields=()):
+    """
+    Return copies of the snapshot items with the user's fields merged in
+    and, given build_uri, the relative media URLs in url_fields made
+    absolute
+    """
+    merged = []
+    for item in items:
+        item = {**item, **overlay.get(item['id'], {})}
+        if build_uri is not None:
+            for field in url_fields:
+                if item.get(field):
+                    item[field] = build_uri(item[field])
+        merged.append(item)
+    return merged
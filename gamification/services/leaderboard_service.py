@@ -0,0 +1,124 @@
+from array import array
+from bisect import bisect_left, bisect_right
+
+from django.conf import settings
+from django.core.cache import cache
+
+from community.services.anonymizer_service import get_pseudonyms
+from ..models import PeriodPoints, UserPoints
+from .points_service import week_start
+
+GLOBAL = 'global'
+WEEKLY = 'weekly'
+BOARDS = (GLOBAL, WEEKLY)
+
+
+def _cache_timeout():
+    return getattr(settings, 'LEADERBOARD_CACHE_TIMEOUT', 60)
+
+
+def _top_size():
+    return getattr(settings, 'LEADERBOARD_TOP_SIZE', 50)
+
+
+def _board_queryset(board, group_id=None):
+    """
+    Return a (user_id, points) values queryset for a board
+    """
+    if board == WEEKLY:
+        queryset = PeriodPoints.objects.filter(period_start=week_start()).values_list('user_id', 'points')
+    else:
+        queryset = UserPoints.objects.values_list('user_id', 'total_points')
+    if group_id is not None:
+        queryset = queryset.filter(user__joined_groups=group_id)
+    return queryset
+
+
+def _cache_key(kind, board, group_id):
+    suffix = week_start().isoformat() if board == WEEKLY else 'all'
+    return f"gamification:leaderboard:{kind}:{board}:{group_id or 'all'}:{suffix}"
+
+
+def _sorted_scores(board, group_id=None):
+    """
+    Return every score on the board in ascending order
+    Built with one indexed scan and cached as a compact array, so ranking
+    any number of users until it expires costs a binary search each.
+    """
+    key = _cache_key('scores', board, group_id)
+    scores = cache.get(key)
+    if scores is None:
+        points_field = 'points' if board == WEEKLY else 'total_points'
+        scores = array('q', _board_queryset(board, group_id).order_by(points_field).values_list(
+            points_field, flat=True
+        ).iterator(chunk_size=10000))
+        cache.set(key, scores, _cache_timeout())
+    return scores
+
+
+def rank_for(points, scores):
+    """
+    Return (rank, percentile) for a score among ascending `scores`
+    Tied users share a rank; the percentile is the share of the board
+    with fewer points.
+    """
+    if not scores:
+        return 1, 100.0
+    rank = len(scores) - bisect_right(scores, points) + 1
+    percentile = round(100 * bisect_left(scores, points) / len(scores), 1)
+    return rank, percentile
+
+
+def get_top(board, group_id=None):
+    """
+    Return the cached top of the board as entries with rank, pseudonym
+    and points
+    """
+    key = _cache_key('top', board, group_id)
+    entries = cache.get(key)
+    if entries is None:
+        points_field = 'points' if board == WEEKLY else 'total_points'
+        rows = list(_board_queryset(board, group_id).filter(**{f'{points_field}__gt': 0}).order_by(
+            f'-{points_field}', 'user_id'
+        )[:_top_size()])
+        pseudonyms = get_pseudonyms([user_id for user_id, _ in rows])
+        entries = []
+        for position, (user_id, points) in enumerate(rows, start=1):
+            # Competition ranking: ties share the rank of the first of them
+            rank = entries[-1]['rank'] if entries and entries[-1]['points'] == points else position
+            entries.append({'rank': rank, 'name': pseudonyms.get(user_id), 'points': points})
+        cache.set(key, entries, _cache_timeout())
+    return entries
+
+
+def get_user_standing(user, board, group_id=None):
+    """
+    Return the user's points, rank and percentile on a board
+    """
+    if board == WEEKLY:
+        points = PeriodPoints.objects.filter(user=user, period_start=week_start()).values_list(
+            'points', flat=True
+        ).first() or 0
+    else:
+        points = UserPoints.objects.filter(user=user).values_list('total_points', flat=True).first() or 0
+    scores = _sorted_scores(board, group_id)
+    rank, percentile = rank_for(points, scores)
+    return {
+        'points': points,
+        'rank': rank,
+        'percentile': percentile,
+        'total_users': len(scores),
+    }
+
+
+def get_leaderboard(user, board=GLOBAL, group_id=None):
+    """
+    Return the top of a board together with the user's own standing
+    """
+    return {
+        'board': board,
+        'group': group_id,
+        'period_start': week_start().isoformat() if board == WEEKLY else None,
+        'entries': get_top(board, group_id),
+        'me': get_user_standing(user, board, group_id),
+    }
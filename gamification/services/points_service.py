@@ -0,0 +1,200 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from ..models import PeriodPoints, PointsEntryKind, PointsLedgerEntry, UserPoints
+
+
+class InsufficientPointsError(Exception):
+    """Exception raised when spending more points than a user has"""
+    pass
+
+
+def week_start(day=None):
+    """
+    Return the Monday starting the leaderboard week containing `day`
+    """
+    day = day or timezone.localdate()
+    return day - timedelta(days=day.weekday())
+
+
+def _add_period_points(user_id, points):
+    period_start = week_start()
+    updated = PeriodPoints.objects.filter(user_id=user_id, period_start=period_start).update(
+        points=F('points') + points
+    )
+    if not updated:
+        try:
+            with transaction.atomic():
+                PeriodPoints.objects.create(user_id=user_id, period_start=period_start, points=points)
+        except IntegrityError:
+            # Created concurrently
+            PeriodPoints.objects.filter(user_id=user_id, period_start=period_start).update(
+                points=F('points') + points
+            )
+
+
+def _apply(user_id, kind, points, lifetime_points, reason):
+    """
+    Apply a change to UserPoints in one UPDATE and record it in the ledger
+    Spendable points may not go below zero; returns the new
+    (total_points, current_points).
+    """
+    with transaction.atomic():
+        balances = UserPoints.objects.filter(user_id=user_id)
+        if points < 0:
+            balances = balances.filter(current_points__gte=-points)
+        updated = balances.update(
+            total_points=F('total_points') + lifetime_points,
+            current_points=F('current_points') + points,
+            last_updated=timezone.now()
+        )
+        if not updated:
+            if points < 0:
+                raise InsufficientPointsError
+            try:
+                with transaction.atomic():
+                    UserPoints.objects.create(
+                        user_id=user_id,
+                        total_points=lifetime_points,
+                        current_points=points
+                    )
+            except IntegrityError:
+                # Created concurrently
+                UserPoints.objects.filter(user_id=user_id).update(
+                    total_points=F('total_points') + lifetime_points,
+                    current_points=F('current_points') + points,
+                    last_updated=timezone.now()
+                )
+        PointsLedgerEntry.objects.create(
+            user_id=user_id,
+            kind=kind,
+            points=points,
+            lifetime_points=lifetime_points,
+            reason=reason
+        )
+        return UserPoints.objects.filter(user_id=user_id).values_list(
+            'total_points', 'current_points'
+        ).get()
+
+
+def add_points(user_id, points, reason=''):
+    """
+    Credit earned points to a user's balance
+    The points also count towards this week's leaderboard. Returns the
+    user's new total_points.
+    """
+    with transaction.atomic():
+        _add_period_points(user_id, points)
+        total_points, _ = _apply(user_id, PointsEntryKind.EARN, points, points, reason)
+    return total_points
+
+
+def spend_points(user_id, points, reason=''):
+    """
+    Debit spendable points, checking the balance in the same UPDATE
+    Raises InsufficientPointsError, changing nothing, if the user cannot
+    afford it. Returns the user's new current_points.
+    """
+    _, current_points = _apply(user_id, PointsEntryKind.SPEND, -points, 0, reason)
+    return current_points
+
+
+def adjust_points(user_id, points, reason=''):
+    """
+    Correct a user's balances by `points` (which may be negative)
+    Returns the new (total_points, current_points).
+    """
+    return _apply(user_id, PointsEntryKind.ADJUST, points, points, reason)
+
+
+def _retention_days():
+    return getattr(settings, 'POINTS_LEDGER_RETENTION_DAYS', 365)
+
+
+def compact_ledger(before=None, batch_size=1000):
+    """
+    Fold each user's ledger entries older than `before` into one
+    carried-forward entry dated `before`
+    Balances are unchanged and newer entries are untouched. Users are
+    compacted in batches, each in its own transaction. Returns the
+    number of entries removed.
+    """
+    before = before or timezone.now() - timedelta(days=_retention_days())
+    old_entries = PointsLedgerEntry.objects.filter(created_at__lt=before)
+    # Only users with something to fold: more than one old entry
+    user_ids = list(old_entries.values('user_id').annotate(
+        entries=Count('id')
+    ).filter(entries__gt=1).order_by('user_id').values_list('user_id', flat=True))
+
+    removed = 0
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        with transaction.atomic():
+            entries = old_entries.filter(user_id__in=batch)
+            totals = list(entries.values('user_id').annotate(
+                total=Sum('points'),
+                lifetime_total=Sum('lifetime_points')
+            ).order_by())
+            removed += entries.delete()[0]
+            PointsLedgerEntry.objects.bulk_create([
+                PointsLedgerEntry(
+                    user_id=row['user_id'],
+                    kind=PointsEntryKind.CARRY_FORWARD,
+                    points=row['total'],
+                    lifetime_points=row['lifetime_total'],
+                    reason='Compacted ledger',
+                    created_at=before
+                )
+                for row in totals
+            ])
+            removed -= len(totals)
+    return removed
+
+
+def _ledger_sum(field):
+    return Coalesce(Subquery(
+        PointsLedgerEntry.objects.filter(user_id=OuterRef('user_id')).values('user_id').annotate(
+            total=Sum(field)
+        ).values('total')
+    ), 0)
+
+
+def ledger_mismatches():
+    """
+    Return UserPoints rows whose balances differ from their ledger sums,
+    annotated with ledger_points and ledger_lifetime_points
+    Evaluated as one query.
+    """
+    return UserPoints.objects.annotate(
+        ledger_points=_ledger_sum('points'),
+        ledger_lifetime_points=_ledger_sum('lifetime_points')
+    ).exclude(
+        current_points=F('ledger_points'),
+        total_points=F('ledger_lifetime_points')
+    )
+
+
+def reconcile_balances(fix=False):
+    """
+    Check every balance against the ledger
+    With fix, mismatched balances are reset to the ledger sums. Returns
+    a list of (user_id, (total_points, current_points), (ledger total,
+    ledger current)).
+    """
+    mismatches = [
+        (row.user_id, (row.total_points, row.current_points), (row.ledger_lifetime_points, row.ledger_points))
+        for row in ledger_mismatches().order_by('user_id')
+    ]
+    if fix and mismatches:
+        # Summed in the UPDATE itself so changes made since are kept
+        UserPoints.objects.filter(user_id__in=[user_id for user_id, _, _ in mismatches]).update(
+            current_points=_ledger_sum('points'),
+            total_points=_ledger_sum('lifetime_points'),
+            last_updated=timezone.now()
+        )
+    return mismatches
@@ -1,61 +1,59 @@
-from django.db.models import Count, Q
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
 from ..models import Quest, UserQuest
 
+def get_quest_progress_map(user):
+    """
+    Return {quest id: (completed, active_since)} for the user's quests in
+    one query; active_since is when the latest unfinished attempt started
+    """
+    rows = UserQuest.objects.filter(user=user).values('quest_id').annotate(
+        completed_count=Count('id', filter=Q(is_completed=True)),
+        active_since=Max('started_at', filter=Q(is_completed=False))
+    )
+    return {row['quest_id']: (row['completed_count'] > 0, row['active_since']) for row in rows}
+
+def quest_progress(entry, duration_minutes):
+    """
+    Progress for a (completed, active_since) entry: 1.0 once completed;
+    for a quest in progress, the share of its duration that has passed,
+    held below 1.0 until it is completed
+    """
+    completed, active_since = entry
+    if completed:
+        return 1.0
+    if active_since is None:
+        return 0.0
+    duration = max(duration_minutes, 1) * 60
+    elapsed = (timezone.now() - active_since).total_seconds()
+    return round(min(max(elapsed / duration, 0.0), 0.99), 2)
+
 def get_recommended_quests(user, limit=5):
     """
-    Get personalized quest recommendations for a user.
-    Always returns a Django QuerySet for compatibility with view operations.
-    NOTE: This function no longer applies slicing to allow for ordering in the view.
+    Get personalized quest recommendations for a user, best first.
+    Serves the list precomputed by build_quest_recommendations, skipping
+    quests completed or retired since it was built. Users without one
+    (new users, or before the first build) get easy quests they have not
+    completed. Returns a list of at most `limit` quests.
     """
-    completed_quests = UserQuest.objects.filter(
+    completed_quest_ids = UserQuest.objects.filter(
         user=user, is_completed=True
-    )
-    completed_quest_ids = completed_quests.values_list('quest_id', flat=True)
-    
-    # If user hasn't completed any quests, return easy quests
-    if not completed_quests.exists():
-        return Quest.objects.filter(
-            is_active=True, 
-            difficulty__lte=2
-        ).exclude(
-            id__in=completed_quest_ids
-        )
+    ).values('quest_id')
     
-    # Get category preferences based on completed quests
-    category_counts = completed_quests.values('quest__category').annotate(
-        count=Count('quest__category')
-    ).order_by('-count')
+    recommended = Quest.objects.filter(
+        recommendations__user=user,
+        is_active=True
+    ).exclude(
+        id__in=completed_quest_ids
+    ).order_by('recommendations__rank')[:limit]
+    recommended = list(recommended)
+    if recommended:
+        return recommended
     
-    if category_counts:
-        preferred_category = category_counts[0]['quest__category']
-        # Get IDs first without slicing
-        recommended_ids = list(Quest.objects.filter(
-            category=preferred_category, is_active=True
-        ).exclude(
-            id__in=completed_quest_ids
-        ).values_list('id', flat=True))[:3]
-        
-        if len(recommended_ids) < limit:
-            # Get additional IDs without slicing the queryset
-            additional_ids = list(Quest.objects.filter(
-                is_active=True
-            ).exclude(
-                id__in=completed_quest_ids
-            ).exclude(
-                id__in=recommended_ids
-            ).values_list('id', flat=True))[:limit - len(recommended_ids)]
-            
-            final_ids = recommended_ids + additional_ids
-        else:
-            final_ids = recommended_ids
-        
-        # Return a queryset filtered by IDs without slicing
-        return Quest.objects.filter(id__in=final_ids)
-    else:
-        # Fallback if no category counts available
-        # Return a queryset without slicing
-        return Quest.objects.filter(
-            is_active=True
-        ).exclude(
-            id__in=completed_quest_ids
-        )
\ No newline at end of file
+    return list(Quest.objects.filter(
+        is_active=True,
+        difficulty__lte=2
+    ).exclude(
+        id__in=completed_quest_ids
+    ).order_by('difficulty', 'id')[:limit])
@@ -0,0 +1,131 @@
+import numpy as np
+from scipy import sparse
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Quest, QuestRecommendation, UserQuest
+
+# Extra interaction weight per point of mood improvement (1-5 scale)
+MOOD_UPLIFT_WEIGHT = 0.25
+# A completion that left the user feeling worse still counts this much
+MIN_COMPLETION_WEIGHT = 0.25
+# Weight of a quest that was started but never completed
+STARTED_WEIGHT = 0.2
+# Rows of the user x quest score product computed at a time
+CHUNK_SIZE = 1000
+
+
+def _recommendation_count():
+    return getattr(settings, 'QUEST_RECOMMENDATIONS_PER_USER', 10)
+
+
+def _interaction_weight(is_completed, mood_before, mood_after):
+    if not is_completed:
+        return STARTED_WEIGHT
+    weight = 1.0
+    if mood_before is not None and mood_after is not None:
+        weight += MOOD_UPLIFT_WEIGHT * (mood_after - mood_before)
+    return max(weight, MIN_COMPLETION_WEIGHT)
+
+
+def build_interactions():
+    """
+    Return (user ids, quest ids, interactions, completed) where
+    interactions is a user x quest CSR matrix of damped interaction weights
+    and completed marks the quests each user has finished
+    """
+    user_index = {}
+    quest_index = {}
+    rows = []
+    columns = []
+    weights = []
+    done = []
+    for user_id, quest_id, is_completed, mood_before, mood_after in UserQuest.objects.values_list(
+        'user_id', 'quest_id', 'is_completed', 'mood_before', 'mood_after'
+    ).iterator(chunk_size=5000):
+        rows.append(user_index.setdefault(user_id, len(user_index)))
+        columns.append(quest_index.setdefault(quest_id, len(quest_index)))
+        weights.append(_interaction_weight(is_completed, mood_before, mood_after))
+        done.append(1.0 if is_completed else 0.0)
+
+    shape = (len(user_index), len(quest_index))
+    rows = np.array(rows, dtype=np.int64)
+    columns = np.array(columns, dtype=np.int64)
+    # Duplicate (user, quest) entries are summed; repeats count, with
+    # diminishing returns
+    interactions = sparse.csr_matrix((np.array(weights), (rows, columns)), shape=shape)
+    interactions.data = np.log1p(interactions.data)
+    completed = sparse.csr_matrix((np.array(done), (rows, columns)), shape=shape)
+    completed.eliminate_zeros()
+    return (
+        np.array(list(user_index), dtype=np.int64),
+        np.array(list(quest_index), dtype=np.int64),
+        interactions,
+        completed
+    )
+
+
+def item_similarities(interactions):
+    """
+    Return the quest x quest cosine similarity of interaction columns,
+    with the diagonal cleared
+    """
+    norms = np.sqrt(np.asarray(interactions.multiply(interactions).sum(axis=0)).ravel())
+    norms[norms == 0] = 1
+    normalised = (interactions @ sparse.diags(1 / norms)).tocsc()
+    similarities = (normalised.T @ normalised).tolil()
+    similarities.setdiag(0)
+    return similarities.tocsr()
+
+
+def _top_quests(scores, k):
+    """
+    Return (columns, scores) of the k best positive entries, best first
+    """
+    columns = np.flatnonzero(scores > 0)
+    if len(columns) > k:
+        columns = columns[np.argpartition(-scores[columns], k)[:k]]
+    columns = columns[np.argsort(-scores[columns], kind='stable')]
+    return columns, scores[columns]
+
+
+def build_quest_recommendations():
+    """
+    Rebuild every user's stored quest recommendations
+    A user's score for a quest is the sum of its similarity to each quest
+    they interacted with, weighted by that interaction. Completed and
+    inactive quests are never recommended. Users with nothing in common
+    with anyone get no rows and fall back to the cold-start list. Returns
+    the number of users with recommendations.
+    """
+    built_at = timezone.now()
+    user_ids, quest_ids, interactions, completed = build_interactions()
+    k = _recommendation_count()
+
+    active = set(Quest.objects.filter(is_active=True).values_list('id', flat=True))
+    inactive = np.array([quest_id not in active for quest_id in quest_ids])
+    similarities = item_similarities(interactions)
+
+    rows = []
+    for start in range(0, len(user_ids), CHUNK_SIZE):
+        block = (interactions[start:start + CHUNK_SIZE] @ similarities).toarray()
+        block[completed[start:start + CHUNK_SIZE].toarray() > 0] = 0
+        block[:, inactive] = 0
+        for offset, scores in enumerate(block):
+            columns, top = _top_quests(scores, k)
+            rows.extend(
+                QuestRecommendation(
+                    user_id=int(user_ids[start + offset]),
+                    quest_id=int(quest_ids[column]),
+                    score=float(score),
+                    rank=rank,
+                    built_at=built_at
+                )
+                for rank, (column, score) in enumerate(zip(columns, top), start=1)
+            )
+
+    with transaction.atomic():
+        QuestRecommendation.objects.all().delete()
+        QuestRecommendation.objects.bulk_create(rows, batch_size=1000)
+    return len({row.user_id for row in rows})
@@ -1,42 +1,328 @@
 import random
-import string
-import hashlib
+import secrets
 from datetime import datetime
 
-def generate_redemption_code(reward, user):
-    """
-    Generate a unique redemption code for a reward
-    Uses a template if available, otherwise creates a random code
-    """
-    if reward.code_template:
-        # Use the template and replace placeholders
-        code = reward.code_template
-        replacements = {
-            '{USERNAME}': user.username,
-            '{USERID}': str(user.id),
-            '{DATE}': datetime.now().strftime('%Y%m%d'),
-            '{RANDOM4}': ''.join(random.choices(string.ascii_uppercase + string.digits, k=4)),
-            '{RANDOM6}': ''.join(random.choices(string.ascii_uppercase + string.digits, k=6)),
-            '{RANDOM8}': ''.join(random.choices(string.ascii_uppercase + string.digits, k=8)),
-        }
-        
-        for placeholder, value in replacements.items():
-            code = code.replace(placeholder, value)
-            
-        return code
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from api.background import submit_on_commit
+from ..models import RedemptionCode, Reward, RewardStockShard, UserReward
+from .points_service import InsufficientPointsError, spend_points
+
+# No 0/O or 1/I, so codes survive being read aloud or retyped
+CODE_ALPHABET = 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+REFILL_LOCK_TIMEOUT = 60 * 5
+# Attempts at claiming a code before giving up under extreme contention
+CLAIM_ATTEMPTS = 5
+# Attempts at generating codes that are not already in the pool
+GENERATE_ATTEMPTS = 5
+OUT_OF_STOCK_MESSAGE = "This reward is out of stock."
+# Lengths of the {RANDOMn} template placeholders
+RANDOM_LENGTHS = (4, 6, 8)
+
+
+class RedemptionError(Exception):
+    """Exception raised when a reward cannot be redeemed"""
+    pass
+
+
+class CodePoolEmptyError(RedemptionError):
+    """Exception raised when a reward has no codes left to hand out"""
+    pass
+
+
+def _random_part(length):
+    return ''.join(secrets.choice(CODE_ALPHABET) for _ in range(length))
+
+
+def is_pooled(reward):
+    """
+    Whether a reward's generated codes are unique and so can be pooled
+    A template without a random part gives the same code every time (a
+    fixed partner code, or one made personal with {USERNAME}/{USERID}),
+    so such codes are issued directly instead.
+    """
+    template = reward.code_template
+    return not template or any(f'{{RANDOM{length}}}' in template for length in RANDOM_LENGTHS)
+
+
+def generate_code(reward):
+    """
+    Create a new random code for a reward's pool
+    Uses the reward's template if it has one, otherwise a code like
+    ABC23-DEF45-GHJ67. User placeholders are filled in when it is claimed.
+    """
+    if not reward.code_template:
+        return '-'.join(_random_part(5) for _ in range(3))
+    code = reward.code_template.replace('{DATE}', datetime.now().strftime('%Y%m%d'))
+    for length in RANDOM_LENGTHS:
+        code = code.replace(f'{{RANDOM{length}}}', _random_part(length))
+    return code
+
+
+def _personalise(code, user):
+    return code.replace('{USERNAME}', user.username).replace('{USERID}', str(user.id))
+
+
+def add_codes(reward, codes, is_imported=False):
+    """
+    Add codes to a reward's pool, skipping any it already has
+    Returns the number added.
+    """
+    existing = set(RedemptionCode.objects.filter(reward=reward, code__in=codes).values_list('code', flat=True))
+    new_codes = [code for code in dict.fromkeys(codes) if code and code not in existing]
+    RedemptionCode.objects.bulk_create(
+        [RedemptionCode(reward=reward, code=code, is_imported=is_imported) for code in new_codes],
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+    return len(new_codes)
+
+
+def generate_codes(reward, count):
+    """
+    Add `count` freshly generated codes to a reward's pool
+    Rewards whose codes are not pooled get none.
+    """
+    if not is_pooled(reward):
+        return 0
+    added = 0
+    # Retry the rare collisions with codes already in the pool
+    for _ in range(GENERATE_ATTEMPTS):
+        if added >= count:
+            break
+        added += add_codes(reward, [generate_code(reward) for _ in range(count - added)])
+    return added
+
+
+def _available_codes(reward_id):
+    return RedemptionCode.objects.filter(reward_id=reward_id, claimed_at__isnull=True)
+
+
+def refill_code_pool(reward_id):
+    """
+    Top up a reward's pool with a batch of generated codes
+    Returns the number added.
+    """
+    try:
+        reward = Reward.objects.filter(pk=reward_id, generate_codes=True).first()
+        if reward is None:
+            return 0
+        return generate_codes(reward, reward.code_pool_refill_size)
+    finally:
+        cache.delete(f'gamification:reward:{reward_id}:refill')
+
+
+def _schedule_refill(reward):
+    """
+    Queue a refill if the pool is at or below its low water mark
+    Only counts as far as the mark, and at most one refill per reward
+    is queued at a time.
+    """
+    if not reward.generate_codes or not is_pooled(reward):
+        return
+    low_water = reward.code_pool_low_water
+    if _available_codes(reward.id).order_by('id')[low_water:low_water + 1].exists():
+        return
+    if cache.add(f'gamification:reward:{reward.id}:refill', True, REFILL_LOCK_TIMEOUT):
+        submit_on_commit(refill_code_pool, reward.id)
+
+
+def claim_code(reward, user):
+    """
+    Take the next unclaimed code from a reward's pool for the user
+    Concurrent claims skip rows other transactions have locked instead of
+    queueing behind them. An empty pool that generates its own codes gets
+    one generated on the spot, and rewards whose codes are not pooled get
+    theirs rendered directly; otherwise CodePoolEmptyError is raised.
+    Call inside a transaction so the claim rolls back with the redemption.
+    Returns the code, with any user placeholders filled in.
+    """
+    now = timezone.now()
+    for _ in range(CLAIM_ATTEMPTS):
+        code = _available_codes(reward.id).select_for_update(skip_locked=True).order_by('id').first()
+        if code is None:
+            break
+        # Conditional, so databases without row locks cannot hand it out twice
+        if RedemptionCode.objects.filter(pk=code.pk, claimed_at__isnull=True).update(
+            claimed_by=user, claimed_at=now
+        ):
+            _schedule_refill(reward)
+            return _personalise(code.code, user)
     else:
-        # Generate a random code
-        # Create a unique basis using reward ID, user ID and timestamp
-        unique_basis = f"{reward.id}-{user.id}-{datetime.now().timestamp()}"
-        
-        # Create a hash and use it as basis for the code
-        hash_obj = hashlib.md5(unique_basis.encode())
-        hash_hex = hash_obj.hexdigest()
-        
-        # Format into a readable code (e.g., ABC12-DEF34-GHI56)
-        code_parts = [
-            hash_hex[0:5].upper(),
-            hash_hex[5:10].upper(),
-            hash_hex[10:15].upper()
-        ]
-        return '-'.join(code_parts)
+        raise CodePoolEmptyError(OUT_OF_STOCK_MESSAGE)
+
+    if not reward.generate_codes:
+        raise CodePoolEmptyError(OUT_OF_STOCK_MESSAGE)
+    if not is_pooled(reward):
+        return _personalise(generate_code(reward), user)
+    for _ in range(GENERATE_ATTEMPTS):
+        code = generate_code(reward)
+        try:
+            with transaction.atomic():
+                RedemptionCode.objects.create(reward=reward, code=code, claimed_by=user, claimed_at=now)
+        except IntegrityError:
+            continue
+        _schedule_refill(reward)
+        return _personalise(code, user)
+    raise CodePoolEmptyError(OUT_OF_STOCK_MESSAGE)
+
+
+def _shard_count():
+    return getattr(settings, 'REWARD_STOCK_SHARDS', 8)
+
+
+def _add_stock(reward, units):
+    """
+    Spread `units` more over the reward's shards, creating any missing
+    """
+    shards = max(min(_shard_count(), reward.stock_total), 1)
+    RewardStockShard.objects.bulk_create(
+        [RewardStockShard(reward=reward, shard=shard, remaining=0) for shard in range(shards)],
+        ignore_conflicts=True
+    )
+    share, extra = divmod(units, shards)
+    for shard in range(shards):
+        if share + (shard < extra):
+            RewardStockShard.objects.filter(reward=reward, shard=shard).update(
+                remaining=F('remaining') + share + (shard < extra)
+            )
+
+
+def _remove_stock(reward, units):
+    """
+    Take up to `units` out of the reward's shards, fullest first
+    Each take is conditional on the shard still holding it, so concurrent
+    redemptions are never pushed below zero. Returns the units that were
+    no longer there to take.
+    """
+    while units > 0:
+        shards = list(RewardStockShard.objects.filter(
+            reward=reward, remaining__gt=0
+        ).order_by('-remaining').values_list('shard', 'remaining'))
+        if not shards:
+            return units
+        for shard, remaining in shards:
+            take = min(units, remaining)
+            if RewardStockShard.objects.filter(
+                reward=reward, shard=shard, remaining__gte=take
+            ).update(remaining=F('remaining') - take):
+                units -= take
+                if not units:
+                    return 0
+    return 0
+
+
+def set_reward_stock(reward, units):
+    """
+    Change a reward's total stock to `units`, or None for unlimited
+    The total counts every unit launched, redeemed or not, so only the
+    difference from the previous total is added to or taken from what is
+    left. A reward that was unlimited starts from `units` less the
+    redemptions already made, and a total below what has already gone out
+    is raised to match it. What is left is split over up to
+    REWARD_STOCK_SHARDS shard rows.
+    """
+    with transaction.atomic():
+        # Serialises stock changes to the reward; redemptions carry on
+        previous = Reward.objects.select_for_update().filter(
+            pk=reward.pk
+        ).values_list('stock_total', flat=True).get()
+        reward.stock_total = units
+        reward.save(update_fields=['stock_total'])
+        if units is None or previous is None:
+            RewardStockShard.objects.filter(reward=reward).delete()
+        if units is None:
+            return
+        if previous is None:
+            redeemed = UserReward.objects.filter(reward=reward).count()
+            _add_stock(reward, max(units - redeemed, 0))
+        elif units > previous:
+            _add_stock(reward, units - previous)
+        elif units < previous:
+            shortfall = _remove_stock(reward, previous - units)
+            if shortfall:
+                reward.stock_total = units + shortfall
+                reward.save(update_fields=['stock_total'])
+
+
+def in_stock(reward):
+    """
+    Return whether a reward has any units left
+    Read from the shard rows, so a restock is seen by every process at once.
+    """
+    if reward.stock_total is None:
+        return True
+    return RewardStockShard.objects.filter(reward=reward, remaining__gt=0).exists()
+
+
+def get_stock_remaining(reward):
+    """
+    Return the units of a reward left, or None if it is unlimited
+    """
+    if reward.stock_total is None:
+        return None
+    return RewardStockShard.objects.filter(reward=reward).aggregate(
+        remaining=Sum('remaining')
+    )['remaining'] or 0
+
+
+def _take_from_shard(reward, shard):
+    return RewardStockShard.objects.filter(reward=reward, shard=shard, remaining__gt=0).update(
+        remaining=F('remaining') - 1
+    )
+
+
+def take_stock(reward):
+    """
+    Take one unit of a limited reward, returning False if it is sold out
+    A random shard is tried first, which is a single conditional UPDATE
+    in the common case; only when it is empty are the shards that still
+    have stock looked up and tried in turn.
+    """
+    if reward.stock_total is None:
+        return True
+    if _take_from_shard(reward, random.randrange(max(min(_shard_count(), reward.stock_total), 1))):
+        return True
+    shards = list(RewardStockShard.objects.filter(reward=reward, remaining__gt=0).values_list('shard', flat=True))
+    random.shuffle(shards)
+    for shard in shards:
+        if _take_from_shard(reward, shard):
+            return True
+    return False
+
+
+def redeem_reward(user, reward):
+    """
+    Redeem a reward for the user: spend the points, check the per-user
+    limit, take a unit of stock and claim a code, all in one transaction
+    Raises RedemptionError, changing nothing, if any step fails. Returns
+    the new UserReward.
+    """
+    # Sold-out rewards are turned away before the points are touched
+    if not in_stock(reward):
+        raise RedemptionError(OUT_OF_STOCK_MESSAGE)
+
+    try:
+        with transaction.atomic():
+            # Spending first also locks the user's balance row until commit,
+            # so the same user's redemptions pass the limit check one at a time
+            spend_points(user.pk, reward.points_required, reason=f"Redeemed {reward.title}")
+            if reward.per_user_limit and UserReward.objects.filter(
+                user=user, reward=reward
+            ).count() >= reward.per_user_limit:
+                if reward.per_user_limit == 1:
+                    raise RedemptionError("You have already redeemed this reward.")
+                raise RedemptionError(f"You can redeem this reward at most {reward.per_user_limit} times.")
+            if not take_stock(reward):
+                raise RedemptionError(OUT_OF_STOCK_MESSAGE)
+            return UserReward.objects.create(
+                user=user,
+                reward=reward,
+                redemption_code=claim_code(reward, user)
+            )
+    except InsufficientPointsError:
+        raise RedemptionError("Not enough points to redeem this reward.")
@@ -0,0 +1,119 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from api.timezones import parse_timezone
+from ..models import UserQuest, UserStreak
+
+# (streak length, level name) in increasing order
+STREAK_LEVELS = (
+    (7, 'Week Warrior'),
+    (30, 'Month Master'),
+    (100, 'Century Champion'),
+)
+
+
+def _tz_name(tz):
+    return getattr(tz, 'key', None) or str(tz)
+
+
+def record_completion(user_id, completed_at, tz=None):
+    """
+    Advance the user's streak for a quest completed at `completed_at`
+    Only the stored state is read and written, so this is O(1) however
+    long the user's history is. The quest must already be saved as
+    completed. Returns the updated UserStreak.
+    """
+    with transaction.atomic():
+        streak = UserStreak.objects.select_for_update().filter(user_id=user_id).first()
+        if streak is None:
+            # No state yet: build it from history, which includes this completion
+            return rebuild_streak(user_id, tz)
+        tz = tz or parse_timezone(streak.timezone) or timezone.get_default_timezone()
+        day = timezone.localtime(completed_at, tz).date()
+        last = streak.last_completion_date
+
+        if last is not None and day <= last:
+            # Same day, or an earlier one after a timezone change
+            pass
+        else:
+            if last is not None and day == last + timedelta(days=1):
+                streak.current_streak += 1
+            else:
+                streak.current_streak = 1
+            streak.longest_streak = max(streak.longest_streak, streak.current_streak)
+            streak.last_completion_date = day
+
+        streak.timezone = _tz_name(tz)
+        streak.save()
+    return streak
+
+
+def rebuild_streak(user_id, tz=None):
+    """
+    Recompute a user's streak state from their completed quests
+    """
+    with transaction.atomic():
+        streak, _ = UserStreak.objects.select_for_update().get_or_create(user_id=user_id)
+        tz = tz or parse_timezone(streak.timezone) or timezone.get_default_timezone()
+        days = UserQuest.objects.filter(
+            user_id=user_id,
+            is_completed=True,
+            completed_at__isnull=False
+        ).annotate(
+            day=TruncDate('completed_at', tzinfo=tz)
+        ).values_list('day', flat=True).distinct().order_by('day')
+
+        current = longest = 0
+        last = None
+        for day in days:
+            if last is not None and day == last + timedelta(days=1):
+                current += 1
+            else:
+                current = 1
+            longest = max(longest, current)
+            last = day
+
+        streak.current_streak = current
+        streak.longest_streak = longest
+        streak.last_completion_date = last
+        streak.timezone = _tz_name(tz)
+        streak.save()
+    return streak
+
+
+def get_streak(user, tz=None):
+    """
+    Return the user's streak as seen on today's date in `tz`
+    A streak survives until the end of the day after its last completion.
+    Users without stored state have it built once from their history.
+    """
+    streak = UserStreak.objects.filter(user=user).first()
+    if streak is None:
+        streak = rebuild_streak(user.pk, tz)
+    tz = tz or parse_timezone(streak.timezone) or timezone.get_default_timezone()
+    today = timezone.localtime(timezone.now(), tz).date()
+    last = streak.last_completion_date
+
+    current = streak.current_streak
+    if last is None or last < today - timedelta(days=1):
+        current = 0
+
+    days_until_next_level = 0
+    next_level_name = "Streak Master"
+    for length, name in STREAK_LEVELS:
+        if current < length:
+            days_until_next_level = length - current
+            next_level_name = name
+            break
+
+    return {
+        'current_streak': current,
+        'longest_streak': streak.longest_streak,
+        'last_completion_date': last.isoformat() if last else None,
+        'completed_today': last == today,
+        'days_until_next_level': days_until_next_level,
+        'next_level_name': next_level_name,
+    }
@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Quest, Achievement, Reward
+from .services.catalog_service import bump_catalog_version
+
+
+@receiver([post_save, post_delete], sender=Quest)
+@receiver([post_save, post_delete], sender=Achievement)
+@receiver([post_save, post_delete], sender=Reward)
+def catalog_changed(sender, instance, **kwargs):
+    # Bumped after commit so no process rebuilds a snapshot from rows
+    # that are then rolled back
+    transaction.on_commit(bump_catalog_version)
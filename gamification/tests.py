@@ -1,3 +1,711 @@
-from django.test import TestCase
+import math
+import re
+import threading
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
+from zoneinfo import ZoneInfo
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from community.models import DiscussionGroup, DiscussionGroupMembership
+
+from .models import (
+    Achievement, AchievementCriteria, PeriodPoints, PointsEntryKind, PointsLedgerEntry, Quest,
+    QuestAlreadyCompletedError, QuestRecommendation, RedemptionCode, Reward, UserAchievement,
+    UserCategoryCount, UserPoints, UserQuest, UserReward, UserStreak
+)
+from .services import catalog_service
+from .services.achievement_service import evaluate_achievements
+from .services.calendar_service import CalendarRangeError, get_completion_calendar
+from .services.catalog_service import (
+    QUESTS, bump_catalog_version, catalog_etag, get_catalog, get_catalog_version
+)
+from .services.leaderboard_service import GLOBAL, WEEKLY, get_leaderboard, rank_for
+from .services.points_service import (
+    InsufficientPointsError, add_points, adjust_points, compact_ledger,
+    ledger_mismatches, reconcile_balances, spend_points, week_start
+)
+from .services.quest_service import get_quest_progress_map, get_recommended_quests, quest_progress
+from .services.recommendation_service import (
+    build_interactions, build_quest_recommendations, item_similarities
+)
+from .services.reward_service import (
+    CODE_ALPHABET, CodePoolEmptyError, RedemptionError, add_codes, claim_code, generate_codes,
+    get_stock_remaining, is_pooled, redeem_reward, refill_code_pool, set_reward_stock
+)
+from .services.streak_service import get_streak, rebuild_streak, record_completion
+
+User = get_user_model()
+
+
+def create_user(username):
+    return User.objects.create_user(username=username, email=f'{username}@example.com', password='pass')
+
+
+def create_quest(**fields):
+    fields.setdefault('title', 'Breathe')
+    fields.setdefault('description', 'Slow breathing')
+    fields.setdefault('category', 'mindfulness')
+    fields.setdefault('points', 15)
+    fields.setdefault('instructions', 'Breathe in for four, out for six')
+    return Quest.objects.create(**fields)
+
+
+def create_reward(**fields):
+    fields.setdefault('title', 'Calm kit')
+    fields.setdefault('description', 'A reward')
+    fields.setdefault('points_required', 10)
+    # Per-user codes are issued directly, with no pool to refill
+    fields.setdefault('code_template', 'CALM-{USERID}')
+    return Reward.objects.create(**fields)
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+class PointsLedgerTests(TestCase):
+    def setUp(self):
+        self.user = create_user('ledger')
+
+    def balances(self):
+        return UserPoints.objects.filter(user=self.user).values_list('total_points', 'current_points').get()
+
+    def test_spending_below_zero_is_rejected(self):
+        add_points(self.user.pk, 10)
+        with self.assertRaises(InsufficientPointsError):
+            spend_points(self.user.pk, 11)
+        self.assertEqual(self.balances(), (10, 10))
+        self.assertEqual(PointsLedgerEntry.objects.filter(user=self.user).count(), 1)
+
+    def test_spending_without_a_balance_is_rejected(self):
+        with self.assertRaises(InsufficientPointsError):
+            spend_points(self.user.pk, 1)
+        self.assertFalse(UserPoints.objects.filter(user=self.user).exists())
+        self.assertFalse(PointsLedgerEntry.objects.filter(user=self.user).exists())
+
+    def test_ledger_matches_balances(self):
+        add_points(self.user.pk, 30)
+        spend_points(self.user.pk, 12)
+        adjust_points(self.user.pk, -5)
+        self.assertEqual(self.balances(), (25, 13))
+        self.assertFalse(ledger_mismatches().exists())
+        self.assertEqual(reconcile_balances(), [])
+
+    def test_reconcile_resets_drifted_balances(self):
+        add_points(self.user.pk, 20)
+        spend_points(self.user.pk, 5)
+        UserPoints.objects.filter(user=self.user).update(current_points=999)
+
+        self.assertEqual(reconcile_balances(), [(self.user.pk, (20, 999), (20, 15))])
+        self.assertEqual(self.balances(), (20, 999))
+        reconcile_balances(fix=True)
+        self.assertEqual(self.balances(), (20, 15))
+        self.assertFalse(ledger_mismatches().exists())
+
+    def test_compaction_keeps_sums(self):
+        add_points(self.user.pk, 40)
+        spend_points(self.user.pk, 15)
+        adjust_points(self.user.pk, 3)
+        cutoff = timezone.now()
+        PointsLedgerEntry.objects.filter(user=self.user).update(created_at=cutoff - timedelta(days=1))
+        add_points(self.user.pk, 7)
+
+        self.assertEqual(compact_ledger(before=cutoff), 2)
+        entries = PointsLedgerEntry.objects.filter(user=self.user).order_by('created_at')
+        self.assertEqual(
+            [(entry.kind, entry.points, entry.lifetime_points) for entry in entries],
+            [(PointsEntryKind.CARRY_FORWARD, 28, 43), (PointsEntryKind.EARN, 7, 7)]
+        )
+        self.assertEqual(self.balances(), (50, 35))
+        self.assertFalse(ledger_mismatches().exists())
+
+
+class QuestCompletionTests(TestCase):
+    def test_completing_twice_credits_once(self):
+        user = create_user('completer')
+        user_quest = UserQuest.objects.create(user=user, quest=create_quest())
+        # Both requests loaded the quest before either completed it
+        stale = UserQuest.objects.get(pk=user_quest.pk)
+
+        self.assertEqual(user_quest.complete(), 15)
+        with self.assertRaises(QuestAlreadyCompletedError):
+            stale.complete()
+        self.assertEqual(UserPoints.objects.get(user=user).total_points, 15)
+        self.assertEqual(PointsLedgerEntry.objects.filter(user=user).count(), 1)
+
+
+class AchievementTests(TestCase):
+    def setUp(self):
+        self.user = create_user('achiever')
+        self.mindfulness = create_quest(points=10)
+        self.activity = create_quest(title='Walk', category='activity', points=10)
+
+    def create_achievement(self, title, criteria_type, required_count, **fields):
+        return Achievement.objects.create(
+            title=title, description=title, criteria_type=criteria_type, required_count=required_count, **fields
+        )
+
+    def complete(self, quest):
+        return UserQuest.objects.create(user=self.user, quest=quest).complete()
+
+    def earned(self):
+        return set(UserAchievement.objects.filter(user=self.user).values_list('achievement__title', flat=True))
+
+    def test_each_criteria_type_is_awarded_once_met(self):
+        self.create_achievement('Two calm quests', AchievementCriteria.CATEGORY_COUNT, 2, category='mindfulness')
+        self.create_achievement('Two walks', AchievementCriteria.CATEGORY_COUNT, 2, category='activity')
+        self.create_achievement('Three quests', AchievementCriteria.TOTAL_QUESTS, 3)
+        self.create_achievement('Thirty points', AchievementCriteria.TOTAL_POINTS, 30)
+        self.create_achievement('Retired', AchievementCriteria.TOTAL_QUESTS, 1, is_active=False)
+
+        self.complete(self.mindfulness)
+        self.assertEqual(self.earned(), set())
+        self.complete(self.mindfulness)
+        self.assertEqual(self.earned(), {'Two calm quests'})
+        self.complete(self.activity)
+        self.assertEqual(self.earned(), {'Two calm quests', 'Three quests', 'Thirty points'})
+        self.assertEqual(
+            dict(UserCategoryCount.objects.filter(user=self.user).values_list('category', 'completed_count')),
+            {'mindfulness': 2, 'activity': 1}
+        )
+
+    def test_streak_achievements(self):
+        self.create_achievement('Two days running', AchievementCriteria.STREAK_LENGTH, 2)
+        self.assertEqual(evaluate_achievements(self.user.pk, streak_length=1), [])
+        [earned] = evaluate_achievements(self.user.pk, streak_length=2)
+        self.assertEqual(earned.title, 'Two days running')
+
+    def test_achievements_are_not_awarded_twice(self):
+        self.create_achievement('First quest', AchievementCriteria.TOTAL_QUESTS, 1)
+        self.assertEqual(len(evaluate_achievements(self.user.pk, total_quests=1)), 1)
+        self.assertEqual(evaluate_achievements(self.user.pk, total_quests=5), [])
+        self.assertEqual(UserAchievement.objects.filter(user=self.user).count(), 1)
+
+    def test_category_achievements_need_their_category(self):
+        self.create_achievement('Two walks', AchievementCriteria.CATEGORY_COUNT, 2, category='activity')
+        self.assertEqual(evaluate_achievements(self.user.pk, category='mindfulness', category_count=5), [])
+
+
+class QuestProgressTests(TestCase):
+    def setUp(self):
+        self.user = create_user('progress')
+
+    def test_progress_map(self):
+        done, active, untouched = create_quest(title='Done'), create_quest(title='Active'), create_quest(title='Untouched')
+        UserQuest.objects.create(user=self.user, quest=done).complete()
+        UserQuest.objects.create(user=self.user, quest=done)
+        attempt = UserQuest.objects.create(user=self.user, quest=active)
+        UserQuest.objects.create(user=create_user('other'), quest=untouched)
+
+        with self.assertNumQueries(1):
+            progress = get_quest_progress_map(self.user)
+        self.assertEqual(set(progress), {done.id, active.id})
+        self.assertTrue(progress[done.id][0])
+        self.assertEqual(progress[active.id], (False, attempt.started_at))
+
+    def test_progress_from_elapsed_time(self):
+        now = timezone.now()
+        self.assertEqual(quest_progress((True, None), 10), 1.0)
+        self.assertEqual(quest_progress((False, None), 10), 0.0)
+        self.assertEqual(quest_progress((False, now - timedelta(minutes=5)), 10), 0.5)
+        # Held below done until the quest is completed
+        self.assertEqual(quest_progress((False, now - timedelta(hours=1)), 10), 0.99)
+
+    def test_listing_does_not_query_per_quest(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        def list_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get('/api/gamification/user-quests/')
+            self.assertEqual(response.status_code, 200)
+            return len(queries)
+
+        UserQuest.objects.create(user=self.user, quest=create_quest(title='First'))
+        one = list_queries()
+        for index in range(3):
+            UserQuest.objects.create(user=self.user, quest=create_quest(title=f'Quest {index}'))
+        self.assertEqual(list_queries(), one)
+
+
+class QuestRecommendationTests(TestCase):
+    def setUp(self):
+        self.breathe, self.journal, self.walk, self.call, self.retired = [
+            create_quest(title=title, difficulty=difficulty)
+            for title, difficulty in [('Breathe', 1), ('Journal', 2), ('Walk', 3), ('Call a friend', 4), ('Retired', 1)]
+        ]
+        self.retired.is_active = False
+        self.retired.save()
+
+    def complete(self, user, *quests, mood_before=None, mood_after=None):
+        for quest in quests:
+            UserQuest.objects.create(
+                user=user, quest=quest, is_completed=True, completed_at=timezone.now(),
+                mood_before=mood_before, mood_after=mood_after
+            )
+
+    def test_interaction_weights(self):
+        user = create_user('weights')
+        self.complete(user, self.breathe, mood_before=1, mood_after=5)
+        self.complete(user, self.journal, mood_before=5, mood_after=1)
+        UserQuest.objects.create(user=user, quest=self.walk)
+
+        user_ids, quest_ids, interactions, completed = build_interactions()
+        weights = dict(zip(quest_ids.tolist(), interactions.toarray()[0].round(6).tolist()))
+        self.assertEqual(weights, {
+            self.breathe.id: round(math.log1p(2.0), 6),
+            self.journal.id: round(math.log1p(0.25), 6),
+            self.walk.id: round(math.log1p(0.2), 6),
+        })
+        self.assertEqual(completed.nnz, 2)
+
+        similarities = item_similarities(interactions)
+        self.assertEqual(similarities.diagonal().tolist(), [0.0, 0.0, 0.0])
+        self.assertEqual((similarities != similarities.T).nnz, 0)
+
+    def test_quests_done_by_similar_users_are_recommended(self):
+        first, second, newcomer, loner = (create_user(name) for name in ('first', 'second', 'newcomer', 'loner'))
+        self.complete(first, self.breathe, self.journal, self.retired)
+        self.complete(second, self.breathe, self.journal, self.retired)
+        self.complete(newcomer, self.breathe)
+        self.complete(loner, self.call)
+
+        self.assertEqual(build_quest_recommendations(), 1)
+        self.assertEqual(
+            list(QuestRecommendation.objects.filter(user=newcomer).order_by('rank').values_list('quest_id', flat=True)),
+            [self.journal.id]
+        )
+        self.assertEqual(get_recommended_quests(newcomer), [self.journal])
+
+        # Completed since the build: served lists skip it and fall back
+        self.complete(newcomer, self.journal)
+        self.assertEqual(get_recommended_quests(newcomer), [])
+
+    def test_cold_start_offers_easy_quests_not_yet_done(self):
+        user = create_user('cold')
+        self.complete(user, self.breathe)
+        self.assertEqual(get_recommended_quests(user), [self.journal])
+
+    def test_command(self):
+        self.complete(create_user('first'), self.breathe, self.journal)
+        self.complete(create_user('second'), self.breathe)
+        out = StringIO()
+        call_command('build_quest_recommendations', stdout=out)
+        self.assertIn('Built quest recommendations for 1 users', out.getvalue())
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.users = {}
+        for name, points in [('ana', 30), ('ben', 20), ('cai', 20), ('dee', 10), ('eli', 0)]:
+            self.users[name] = create_user(name)
+            if points:
+                add_points(self.users[name].pk, points)
+
+    def board(self, name, board=GLOBAL, group_id=None):
+        return get_leaderboard(self.users[name], board, group_id)
+
+    def test_rank_and_percentile(self):
+        scores = [5, 10, 10, 20]
+        self.assertEqual(rank_for(20, scores), (1, 75.0))
+        self.assertEqual(rank_for(10, scores), (2, 25.0))
+        self.assertEqual(rank_for(5, scores), (4, 0.0))
+        self.assertEqual(rank_for(7, []), (1, 100.0))
+
+    def test_ties_share_a_rank(self):
+        board = self.board('cai')
+        self.assertEqual([(entry['rank'], entry['points']) for entry in board['entries']], [(1, 30), (2, 20), (2, 20), (4, 10)])
+        self.assertNotIn(board['entries'][0]['name'], self.users)
+        self.assertEqual(board['me'], {'points': 20, 'rank': 2, 'percentile': 25.0, 'total_users': 4})
+        self.assertEqual(self.board('eli')['me']['points'], 0)
+
+    def test_weekly_board_counts_only_this_week(self):
+        PeriodPoints.objects.filter(user=self.users['ana']).update(period_start=week_start() - timedelta(days=7))
+        board = self.board('ana', WEEKLY)
+        self.assertEqual(board['period_start'], week_start().isoformat())
+        self.assertEqual([entry['points'] for entry in board['entries']], [20, 20, 10])
+        self.assertEqual(board['me'], {'points': 0, 'rank': 4, 'percentile': 0.0, 'total_users': 3})
+
+    def test_group_board_and_api(self):
+        group = DiscussionGroup.objects.create(name='Walkers', description='Walkers', topic_type='activity')
+        for name in ('ben', 'dee'):
+            DiscussionGroupMembership.objects.create(user=self.users[name], discussion_group=group)
+        board = self.board('dee', group_id=group.id)
+        self.assertEqual([entry['points'] for entry in board['entries']], [20, 10])
+        self.assertEqual(board['me']['rank'], 2)
+
+        client = APIClient()
+        client.force_authenticate(self.users['ana'])
+        url = '/api/gamification/points/leaderboard/'
+        self.assertEqual(client.get(url, {'group': group.id}).status_code, 403)
+        self.assertEqual(client.get(url, {'board': 'monthly'}).status_code, 400)
+        self.assertEqual(client.get(url, {'board': WEEKLY}).json()['me']['rank'], 1)
+
+
+class StreakTests(TestCase):
+    def setUp(self):
+        self.user = create_user('streaker')
+        self.quest = create_quest()
+
+    def complete_at(self, completed_at, tz=dt_timezone.utc):
+        UserQuest.objects.create(user=self.user, quest=self.quest, is_completed=True, completed_at=completed_at)
+        return record_completion(self.user.pk, completed_at, tz)
+
+    def streak_on(self, now, tz=dt_timezone.utc):
+        with mock.patch('django.utils.timezone.now', return_value=now):
+            return get_streak(self.user, tz)
+
+    def test_consecutive_days_gaps_and_repeats(self):
+        self.complete_at(utc(2024, 3, 1, 9))
+        self.complete_at(utc(2024, 3, 2, 9))
+        self.complete_at(utc(2024, 3, 2, 18))
+        streak = self.complete_at(utc(2024, 3, 3, 9))
+        self.assertEqual((streak.current_streak, streak.longest_streak), (3, 3))
+
+        streak = self.complete_at(utc(2024, 3, 5, 9))
+        self.assertEqual((streak.current_streak, streak.longest_streak), (1, 3))
+        self.assertEqual(streak.last_completion_date, utc(2024, 3, 5).date())
+
+    def test_days_are_drawn_in_the_users_timezone(self):
+        # Late evening and early morning UTC: two days in UTC, one in Los Angeles
+        self.complete_at(utc(2024, 3, 1, 23, 30))
+        self.assertEqual(self.complete_at(utc(2024, 3, 2, 0, 30)).current_streak, 2)
+
+        los_angeles = ZoneInfo('America/Los_Angeles')
+        streak = rebuild_streak(self.user.pk, los_angeles)
+        self.assertEqual((streak.current_streak, streak.last_completion_date), (1, utc(2024, 3, 1).date()))
+        self.assertEqual(streak.timezone, 'America/Los_Angeles')
+
+    def test_completion_before_the_last_day_after_a_timezone_change(self):
+        self.complete_at(utc(2024, 3, 2, 1), ZoneInfo('Asia/Tokyo'))
+        # Still March 1 in Los Angeles, a day Tokyo already counted
+        streak = self.complete_at(utc(2024, 3, 2, 2), ZoneInfo('America/Los_Angeles'))
+        self.assertEqual((streak.current_streak, streak.last_completion_date), (1, utc(2024, 3, 2).date()))
+
+    def test_incremental_state_matches_a_rebuild(self):
+        for day in (1, 2, 4, 5, 6, 8):
+            self.complete_at(utc(2024, 3, day, 12))
+        streak = UserStreak.objects.get(user=self.user)
+        incremental = (streak.current_streak, streak.longest_streak, streak.last_completion_date)
+        rebuilt = rebuild_streak(self.user.pk)
+        self.assertEqual((rebuilt.current_streak, rebuilt.longest_streak, rebuilt.last_completion_date), incremental)
+        self.assertEqual(incremental[:2], (1, 3))
+
+    def test_streak_lasts_until_the_end_of_the_next_day(self):
+        self.complete_at(utc(2024, 3, 1, 12))
+        self.complete_at(utc(2024, 3, 2, 12))
+
+        today = self.streak_on(utc(2024, 3, 2, 20))
+        self.assertEqual((today['current_streak'], today['completed_today']), (2, True))
+        self.assertEqual((today['days_until_next_level'], today['next_level_name']), (5, 'Week Warrior'))
+        self.assertEqual(self.streak_on(utc(2024, 3, 3, 23))['current_streak'], 2)
+        lapsed = self.streak_on(utc(2024, 3, 4, 1))
+        self.assertEqual((lapsed['current_streak'], lapsed['longest_streak']), (0, 2))
+        # Still March 3 in Los Angeles
+        self.assertEqual(self.streak_on(utc(2024, 3, 4, 1), ZoneInfo('America/Los_Angeles'))['current_streak'], 2)
+
+    def test_streak_is_built_from_history_on_first_read(self):
+        for day in (1, 2):
+            UserQuest.objects.create(user=self.user, quest=self.quest, is_completed=True, completed_at=utc(2024, 3, day, 12))
+        self.assertEqual(self.streak_on(utc(2024, 3, 2, 13))['current_streak'], 2)
+        self.assertTrue(UserStreak.objects.filter(user=self.user).exists())
+
+
+class CompletionCalendarTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = create_user('calendar')
+        self.quest = create_quest(points=15)
+
+    def today(self):
+        return mock.patch('django.utils.timezone.now', return_value=utc(2024, 4, 10, 12))
+
+    def complete_at(self, completed_at, points_earned):
+        UserQuest.objects.create(
+            user=self.user, quest=self.quest, is_completed=True,
+            completed_at=completed_at, points_earned=points_earned
+        )
+
+    def calendar(self, start, end, tz=dt_timezone.utc):
+        with self.today():
+            return get_completion_calendar(self.user, start, end, tz)
+
+    def test_totals_come_from_points_earned(self):
+        self.complete_at(utc(2024, 3, 1, 9), 10)
+        self.complete_at(utc(2024, 3, 1, 18), 15)
+        self.complete_at(utc(2024, 3, 3, 9), 5)
+        UserQuest.objects.create(user=self.user, quest=self.quest)
+
+        calendar = self.calendar(date(2024, 3, 1), date(2024, 3, 31))
+        self.assertEqual(calendar['days'], [
+            {'date': '2024-03-01', 'count': 2, 'points': 25},
+            {'date': '2024-03-03', 'count': 1, 'points': 5},
+        ])
+        self.assertEqual((calendar['total_count'], calendar['total_points']), (3, 30))
+        self.assertEqual(self.calendar(date(2024, 3, 2), date(2024, 3, 31))['total_points'], 5)
+
+    def test_days_are_local_to_the_timezone(self):
+        self.complete_at(utc(2024, 3, 2, 2), 10)
+        calendar = self.calendar(date(2024, 3, 1), date(2024, 3, 2), ZoneInfo('America/Los_Angeles'))
+        self.assertEqual(calendar['timezone'], 'America/Los_Angeles')
+        self.assertEqual([day['date'] for day in calendar['days']], ['2024-03-01'])
+
+    def test_closed_months_are_cached_and_the_current_month_is_not(self):
+        self.complete_at(utc(2024, 3, 5, 9), 10)
+        self.complete_at(utc(2024, 4, 5, 9), 10)
+        self.assertEqual(self.calendar(date(2024, 3, 1), date(2024, 4, 30))['total_count'], 2)
+
+        self.complete_at(utc(2024, 3, 6, 9), 10)
+        self.complete_at(utc(2024, 4, 6, 9), 10)
+        with self.assertNumQueries(1):
+            calendar = self.calendar(date(2024, 3, 1), date(2024, 4, 30))
+        self.assertEqual([day['date'] for day in calendar['days']], ['2024-03-05', '2024-04-05', '2024-04-06'])
+
+    def test_invalid_ranges(self):
+        with self.assertRaises(CalendarRangeError):
+            self.calendar(date(2024, 3, 2), date(2024, 3, 1))
+        with self.assertRaises(CalendarRangeError):
+            self.calendar(date(2022, 1, 1), date(2024, 3, 1))
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get('/api/gamification/calendar/', {'start': 'March'}).status_code, 400)
+        with self.today():
+            response = client.get('/api/gamification/calendar/', {'tz': 'Europe/Berlin'})
+        self.assertEqual((response.json()['start'], response.json()['end']), ('2023-04-12', '2024-04-10'))
+
+
+class RedemptionTests(TestCase):
+    def setUp(self):
+        self.user = create_user('redeemer')
+        add_points(self.user.pk, 100)
+
+    def test_per_user_limit(self):
+        reward = create_reward(per_user_limit=2)
+        redeem_reward(self.user, reward)
+        redeem_reward(self.user, reward)
+        with self.assertRaises(RedemptionError):
+            redeem_reward(self.user, reward)
+        self.assertEqual(UserReward.objects.filter(user=self.user, reward=reward).count(), 2)
+        self.assertEqual(UserPoints.objects.get(user=self.user).current_points, 80)
+
+    def test_sold_out_reward_is_rejected_without_spending(self):
+        reward = create_reward(per_user_limit=0)
+        set_reward_stock(reward, 1)
+        redeem_reward(self.user, reward)
+        with self.assertRaises(RedemptionError):
+            redeem_reward(self.user, reward)
+        self.assertEqual(get_stock_remaining(reward), 0)
+        self.assertEqual(UserPoints.objects.get(user=self.user).current_points, 90)
+
+    def test_restock_adds_only_the_change_in_total(self):
+        reward = create_reward(per_user_limit=0)
+        set_reward_stock(reward, 5)
+        for _ in range(3):
+            redeem_reward(self.user, reward)
+        set_reward_stock(reward, 8)
+        self.assertEqual(get_stock_remaining(reward), 5)
+        set_reward_stock(reward, 4)
+        self.assertEqual(get_stock_remaining(reward), 1)
+
+
+class CodePoolTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = create_user('claimer')
+        patcher = mock.patch('gamification.services.reward_service.submit_on_commit')
+        self.submit = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def unclaimed(self, reward):
+        return RedemptionCode.objects.filter(reward=reward, claimed_at__isnull=True).count()
+
+    def test_claims_take_pooled_codes_in_order(self):
+        reward = create_reward(code_template='CALM-{RANDOM6}-{USERID}', generate_codes=False)
+        self.assertEqual(add_codes(reward, ['CALM-A-{USERID}', 'CALM-A-{USERID}', 'CALM-B-{USERID}']), 2)
+        self.assertEqual(add_codes(reward, ['CALM-B-{USERID}', 'CALM-C-{USERID}'], is_imported=True), 1)
+
+        self.assertEqual(claim_code(reward, self.user), f'CALM-A-{self.user.pk}')
+        self.assertEqual(claim_code(reward, self.user), f'CALM-B-{self.user.pk}')
+        self.assertEqual(RedemptionCode.objects.filter(claimed_by=self.user).count(), 2)
+        claim_code(reward, self.user)
+        # Imported-only pools are never topped up
+        with self.assertRaises(CodePoolEmptyError):
+            claim_code(reward, self.user)
+        self.submit.assert_not_called()
+
+    def test_low_pool_is_refilled_once(self):
+        reward = create_reward(code_template='CALM-{RANDOM8}', code_pool_low_water=2, code_pool_refill_size=5)
+        self.assertEqual(generate_codes(reward, 4), 4)
+
+        claim_code(reward, self.user)
+        self.submit.assert_not_called()
+        claim_code(reward, self.user)
+        claim_code(reward, self.user)
+        self.submit.assert_called_once_with(refill_code_pool, reward.id)
+
+        self.assertEqual(refill_code_pool(reward.id), 5)
+        self.assertEqual(self.unclaimed(reward), 6)
+        # The refill released its lock, so the next low pool queues another
+        for _ in range(4):
+            claim_code(reward, self.user)
+        self.assertEqual(self.submit.call_count, 2)
+
+    def test_empty_generating_pool_issues_a_code_on_the_spot(self):
+        reward = create_reward(code_template=None)
+        code = claim_code(reward, self.user)
+        self.assertRegex(code, f'^[{CODE_ALPHABET}]{{5}}(-[{CODE_ALPHABET}]{{5}}){{2}}$')
+        self.assertEqual(RedemptionCode.objects.get(reward=reward).claimed_by, self.user)
+
+    def test_unpooled_codes_are_issued_directly(self):
+        reward = create_reward(code_template='CALM-{USERID}')
+        self.assertFalse(is_pooled(reward))
+        self.assertEqual(generate_codes(reward, 10), 0)
+        self.assertEqual(refill_code_pool(reward.id), 0)
+        self.assertEqual(claim_code(reward, self.user), f'CALM-{self.user.pk}')
+        second = create_user('second')
+        self.assertEqual(claim_code(reward, second), f'CALM-{second.pk}')
+        self.assertFalse(RedemptionCode.objects.exists())
+        self.submit.assert_not_called()
+
+    def test_generated_codes_follow_the_template(self):
+        reward = create_reward(code_template='{DATE}-{RANDOM4}', generate_codes=False)
+        generate_codes(reward, 3)
+        pattern = re.compile(rf'^\d{{8}}-[{CODE_ALPHABET}]{{4}}$')
+        self.assertTrue(all(pattern.match(code) for code in RedemptionCode.objects.values_list('code', flat=True)))
+        # Rewards that do not generate their own codes are not refilled
+        self.assertEqual(refill_code_pool(reward.id), 0)
+
+
+class CatalogTests(TestCase):
+    def setUp(self):
+        # Snapshots live for the process; start each test without them
+        catalog_service._snapshots.clear()
+        self.addCleanup(catalog_service._snapshots.clear)
+        self.user = create_user('browser')
+        self.quest = create_quest()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(url, **headers)
+
+    def test_snapshot_is_reused_until_the_version_moves(self):
+        snapshot = get_catalog(QUESTS)
+        self.assertIs(get_catalog(QUESTS), snapshot)
+
+        create_quest(title='Journal')
+        self.assertIs(get_catalog(QUESTS), snapshot)
+        bump_catalog_version()
+        version, items = get_catalog(QUESTS)
+        self.assertEqual(version, snapshot[0] + 1)
+        self.assertEqual([item['title'] for item in items], ['Breathe', 'Journal'])
+
+    def test_catalog_changes_bump_the_version_on_commit(self):
+        before = get_catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            create_reward()
+        self.assertEqual(get_catalog_version(), before + 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.quest.delete()
+        self.assertEqual(get_catalog_version(), before + 2)
+
+    def test_unchanged_catalog_is_not_modified(self):
+        first = self.get('/api/gamification/quests/')
+        self.assertEqual(first.status_code, 200)
+        etag = first['ETag']
+        self.assertEqual(first.json()[0]['is_completed'], False)
+
+        self.assertEqual(self.get('/api/gamification/quests/', etag).status_code, 304)
+        self.assertEqual(self.get('/api/gamification/quests/', f'"stale", W/{etag}').status_code, 304)
+        self.assertEqual(self.get('/api/gamification/quests/', '*').status_code, 304)
+
+    def test_etag_follows_the_catalog_and_the_users_state(self):
+        etag = self.get('/api/gamification/quests/')['ETag']
+        self.client.post(f'/api/gamification/quests/{self.quest.id}/start/')
+        started = self.get('/api/gamification/quests/', etag)
+        self.assertEqual(started.status_code, 200)
+        self.assertIsNotNone(started.json()[0]['active_since'])
+
+        bump_catalog_version()
+        self.assertEqual(self.get('/api/gamification/quests/', started['ETag']).status_code, 200)
+
+    def test_progress_alone_does_not_change_the_etag(self):
+        overlay = {self.quest.id: {'is_completed': False, 'active_since': None, 'progress': 0.2}}
+        later = {self.quest.id: {**overlay[self.quest.id], 'progress': 0.7}}
+        self.assertEqual(catalog_etag(3, overlay), catalog_etag(3, later))
+        self.assertNotEqual(catalog_etag(3, overlay), catalog_etag(4, overlay))
+
+    def test_reward_stock_is_not_served_from_the_snapshot(self):
+        reward = create_reward(per_user_limit=0)
+        bump_catalog_version()
+        set_reward_stock(reward, 2)
+        response = self.get('/api/gamification/rewards/')
+        self.assertEqual(response.json()[0]['stock_remaining'], 2)
+
+        add_points(self.user.pk, 100)
+        redeem_reward(self.user, reward)
+        refreshed = self.get('/api/gamification/rewards/', response['ETag'])
+        self.assertEqual(refreshed.status_code, 200)
+        self.assertEqual((refreshed.json()[0]['stock_remaining'], refreshed.json()[0]['can_afford']), (1, True))
+
+
+class ConcurrentRedemptionTests(TransactionTestCase):
+    STOCK = 5
+    CLIENTS = 12
+
+    def setUp(self):
+        # Shared-cache in-memory SQLite locks whole tables and does not wait
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("Needs a database that lets concurrent writers wait")
+
+    def test_stock_is_never_oversold(self):
+        reward = create_reward(per_user_limit=0)
+        set_reward_stock(reward, self.STOCK)
+        users = [create_user(f'buyer{index}') for index in range(self.CLIENTS)]
+        for user in users:
+            add_points(user.pk, 10)
+
+        barrier = threading.Barrier(self.CLIENTS)
+        redeemed = []
+        rejected = []
+
+        def redeem(user):
+            try:
+                barrier.wait()
+                redeem_reward(user, reward)
+                redeemed.append(user.pk)
+            except RedemptionError:
+                rejected.append(user.pk)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=redeem, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(redeemed), self.STOCK)
+        self.assertEqual(len(rejected), self.CLIENTS - self.STOCK)
+        self.assertEqual(get_stock_remaining(reward), 0)
+        self.assertEqual(UserReward.objects.filter(reward=reward).count(), self.STOCK)
+        self.assertEqual(
+            set(UserPoints.objects.filter(current_points=0).values_list('user_id', flat=True)),
+            set(redeemed)
+        )
+        self.assertFalse(ledger_mismatches().exists())
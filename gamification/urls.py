@@ -14,5 +14,6 @@ urlpatterns = [
     path('', include(router.urls)),    
     path('streak/', views.get_user_streak, name='get_user_streak'),
     path('completed-dates/', views.get_completed_quest_dates, name='get_completed_quest_dates'),
+    path('calendar/', views.get_quest_calendar, name='get_quest_calendar'),
     
 ]
@@ -2,8 +2,9 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
+from django.db.models import Q, Sum
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from datetime import timedelta
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
@@ -12,7 +13,7 @@ from datetime import date, timedelta
 
 from .models import (
     Quest, UserQuest, Achievement, UserAchievement,
-    Reward, UserReward, UserPoints
+    Reward, UserReward, UserPoints, QuestAlreadyCompletedError
 )
 from .serializers import (
     QuestSerializer, UserQuestSerializer, CompleteQuestSerializer,
@@ -20,8 +21,34 @@ from .serializers import (
     RewardSerializer, UserRewardSerializer, UserPointsSerializer,
     RedeemRewardSerializer
 )
+from .services.catalog_service import (
+    ACHIEVEMENTS, OVERLAYS, QUESTS, REWARDS, catalog_etag, get_catalog, merge_overlay
+)
+from .services.calendar_service import (
+    CalendarRangeError, get_completed_dates, get_completion_calendar, user_timezone
+)
+from .services.leaderboard_service import BOARDS, GLOBAL, get_leaderboard
 from .services.quest_service import get_recommended_quests
-from .services.reward_service import generate_redemption_code
+from .services.reward_service import RedemptionError, redeem_reward
+from .services.streak_service import get_streak
+from api.timezones import get_client_timezone
+
+def _catalog_response(request, name, url_fields):
+    """
+    Serve a catalog from the process snapshot with the user's fields merged
+    in, or a 304 if the client's copy (by ETag) is still current
+    """
+    version, items = get_catalog(name)
+    overlay = OVERLAYS[name](request.user, items)
+    etag = catalog_etag(version, overlay)
+    client_tags = [tag.strip().removeprefix('W/') for tag in request.META.get('HTTP_IF_NONE_MATCH', '').split(',')]
+    if etag in client_tags or '*' in client_tags:
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(merge_overlay(items, overlay, request.build_absolute_uri, url_fields))
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
 class QuestViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -38,12 +65,15 @@ class QuestViewSet(viewsets.ReadOnlyModelViewSet):
         context.update({'request': self.request})
         return context  # Fixed: was returning only {'request': self.request}
 
+    def list(self, request, *args, **kwargs):
+        """Serve the catalog snapshot with the user's own state merged in"""
+        return _catalog_response(request, QUESTS, ('image', 'image_url'))
+
     @action(detail=False, methods=['get'])
     def recommended(self, request):
         """Get quests recommended for the current user"""
         try:
-            recommended_queryset = get_recommended_quests(request.user)
-            recommended = recommended_queryset.order_by('id')[:5]
+            recommended = get_recommended_quests(request.user)
             serializer = self.get_serializer(recommended, many=True)
             return Response(serializer.data)
         except Exception as e:
@@ -99,7 +129,7 @@ class UserQuestViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """Only return quests for the current user"""
-        return UserQuest.objects.filter(user=self.request.user).order_by('-started_at')  # Added ordering
+        return UserQuest.objects.filter(user=self.request.user).select_related('quest').order_by('-started_at')  # Added ordering
 
     def get_serializer_context(self):
         """Add request to serializer context for image URL generation"""
@@ -122,14 +152,21 @@ class UserQuestViewSet(viewsets.ModelViewSet):
         # Process the completion
         serializer = CompleteQuestSerializer(data=request.data)
         if serializer.is_valid():
-            points_earned = user_quest.complete(
-                reflection=serializer.validated_data.get('reflection', ''),
-                mood_after=serializer.validated_data.get('mood_after')
-            )
+            try:
+                points_earned = user_quest.complete(
+                    reflection=serializer.validated_data.get('reflection', ''),
+                    mood_after=serializer.validated_data.get('mood_after'),
+                    tz=get_client_timezone(request)
+                )
+            except QuestAlreadyCompletedError:
+                # Completed by a concurrent request since it was loaded
+                return Response(
+                    {"detail": "Quest already completed."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             
-            # Update user points
-            user_points, created = UserPoints.objects.get_or_create(user=request.user)
-            user_points.add_points(points_earned)
+            # complete() has already credited the points
+            user_points = UserPoints.objects.get(user=request.user)
             
             # Return the updated quest with points info
             result = UserQuestSerializer(user_quest, context={'request': request}).data
@@ -228,6 +265,10 @@ class AchievementViewSet(viewsets.ReadOnlyModelViewSet):
         context.update({'request': self.request})
         return context
 
+    def list(self, request, *args, **kwargs):
+        """Serve the catalog snapshot with the user's own state merged in"""
+        return _catalog_response(request, ACHIEVEMENTS, ('badge_image',))
+
     @action(detail=False, methods=['get'])
     def user_achievements(self, request):
         """Get achievements earned by the current user"""
@@ -255,12 +296,20 @@ class RewardViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = None
 
+    def get_queryset(self):
+        """Annotate the stock left of limited rewards"""
+        return super().get_queryset().annotate(stock_remaining=Sum('stock_shards__remaining'))
+
     def get_serializer_context(self):
         """Add request to serializer context for image URL generation"""
         context = super().get_serializer_context()
         context.update({'request': self.request})
         return context
 
+    def list(self, request, *args, **kwargs):
+        """Serve the catalog snapshot with the user's own state merged in"""
+        return _catalog_response(request, REWARDS, ('image', 'image_url'))
+
     @action(detail=False, methods=['get'])
     def user_rewards(self, request):
         """Get rewards redeemed by the current user"""
@@ -277,6 +326,9 @@ class RewardViewSet(viewsets.ReadOnlyModelViewSet):
         # Filter rewards that the user can afford
         available = self.get_queryset().filter(
             points_required__lte=user_points.current_points
+        ).exclude(
+            stock_total__isnull=False,
+            stock_remaining=0
         )
         serializer = self.get_serializer(available, many=True)
         return Response(serializer.data)
@@ -289,36 +341,10 @@ class RewardViewSet(viewsets.ReadOnlyModelViewSet):
             reward_id = serializer.validated_data['reward_id']
             reward = get_object_or_404(Reward, id=reward_id, is_active=True)
             
-            # Check if user has already redeemed this reward
-            existing_redemption = UserReward.objects.filter(user=request.user, reward=reward).first()
-            if existing_redemption:
-                return Response(
-                    {"detail": "You have already redeemed this reward."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Get user points
-            user_points, created = UserPoints.objects.get_or_create(user=request.user)
-            
-            # Check if user has enough points
-            if user_points.current_points < reward.points_required:
-                return Response(
-                    {"detail": "Not enough points to redeem this reward."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Generate redemption code
-            redemption_code = generate_redemption_code(reward, request.user)
-            
-            # Create user reward
-            user_reward = UserReward.objects.create(
-                user=request.user,
-                reward=reward,
-                redemption_code=redemption_code
-            )
-            
-            # Spend points
-            user_points.spend_points(reward.points_required)
+            try:
+                user_reward = redeem_reward(request.user, reward)
+            except RedemptionError as e:
+                return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
             
             # Return the created user reward
             result_serializer = UserRewardSerializer(user_reward, context={'request': request})
@@ -348,97 +374,73 @@ class UserPointsViewSet(viewsets.ReadOnlyModelViewSet):
         user_points, created = UserPoints.objects.get_or_create(user=request.user)
         serializer = self.get_serializer(user_points)
         return Response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def leaderboard(self, request):
+        """Get the global or weekly points leaderboard, optionally for one group"""
+        board = request.query_params.get('board', GLOBAL)
+        if board not in BOARDS:
+            return Response(
+                {"detail": f"board must be one of: {', '.join(BOARDS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        group_id = request.query_params.get('group')
+        if group_id is not None:
+            if not group_id.isdigit():
+                return Response({"detail": "group must be a group id."}, status=status.HTTP_400_BAD_REQUEST)
+            group_id = int(group_id)
+            if not request.user.joined_groups.filter(id=group_id).exists():
+                return Response(
+                    {"detail": "You are not a member of this group."},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+        
+        return Response(get_leaderboard(request.user, board, group_id))
     
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_user_streak(request):
     """Get user's current streak information"""
-    user = request.user
-    # Get all completed quests for this user, ordered by completion date
-    completed_quests = UserQuest.objects.filter(
-        user=user,
-        is_completed=True
-    ).order_by('-completed_at')
-
-    if not completed_quests.exists():
-        return Response({
-            'current_streak': 0,
-            'longest_streak': 0,
-            'last_completion_date': None,
-            'completed_today': False,
-            'days_until_next_level': 7,
-            'next_level_name': 'Week Warrior'
-        })
-
-    # Get unique completion dates
-    completion_dates = set()
-    for quest in completed_quests:
-        if quest.completed_at:
-            completion_dates.add(quest.completed_at.date())
-
-    # Sort dates in descending order (most recent first)
-    sorted_dates = sorted(completion_dates, reverse=True)
-
-    # Calculate current streak
-    current_streak = 0
-    today = date.today()
-    completed_today = today in completion_dates
-
-    # Check if user completed a quest today or yesterday
-    if sorted_dates[0] >= today - timedelta(days=1):
-        current_streak = 1
-        
-        # Count consecutive days backwards from the most recent completion
-        for i in range(1, len(sorted_dates)):
-            expected_date = sorted_dates[i-1] - timedelta(days=1)
-            if sorted_dates[i] == expected_date:
-                current_streak += 1
-            else:
-                break
-
-    # Calculate longest streak (simplified version)
-    longest_streak = current_streak # You might want to implement a more complex calculation
-
-    # Determine next level
-    days_until_next_level = 0
-    next_level_name = "Streak Master"
-    
-    if current_streak < 7:
-        days_until_next_level = 7 - current_streak
-        next_level_name = "Week Warrior"
-    elif current_streak < 30:
-        days_until_next_level = 30 - current_streak
-        next_level_name = "Month Master"
-    elif current_streak < 100:
-        days_until_next_level = 100 - current_streak
-        next_level_name = "Century Champion"
-
-    return Response({
-        'current_streak': current_streak,
-        'longest_streak': longest_streak,
-        'last_completion_date': sorted_dates[0].isoformat() if len(sorted_dates) > 0 else None,
-        'completed_today': completed_today,
-        'days_until_next_level': days_until_next_level,
-        'next_level_name': next_level_name
-    })
+    return Response(get_streak(request.user, get_client_timezone(request)))
+
+def _parse_date_param(request, name):
+    """Return the named YYYY-MM-DD query parameter as a date, or None; raises ValueError if invalid"""
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(value)
+    return day
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_completed_quest_dates(request):
-    """Get list of dates when user completed quests"""
-    user = request.user
+    """Get the dates when the user completed quests, optionally within ?start= and ?end="""
+    try:
+        start = _parse_date_param(request, 'start')
+        end = _parse_date_param(request, 'end')
+    except ValueError:
+        return Response({"detail": "Dates must be given as YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
     
-    completed_quests = UserQuest.objects.filter(
-        user=user,
-        is_completed=True
-    ).values_list('completed_at', flat=True)
-    
-    # Get unique dates
-    unique_dates = set()
-    for completed_at in completed_quests:
-        unique_dates.add(completed_at.date())
-    
-    # Convert to ISO format strings
-    date_strings = [date.isoformat() for date in sorted(unique_dates, reverse=True)]
+    dates = get_completed_dates(request.user, get_client_timezone(request), start, end)
+    return Response([day.isoformat() for day in dates])
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_quest_calendar(request):
+    """Get quest completions and points per day between ?start= and ?end= (default: the last year)"""
+    try:
+        start = _parse_date_param(request, 'start')
+        end = _parse_date_param(request, 'end')
+    except ValueError:
+        return Response({"detail": "Dates must be given as YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
     
-    return Response(date_strings)    
\ No newline at end of file
+    tz = user_timezone(request.user, get_client_timezone(request))
+    end = end or timezone.localtime(timezone.now(), tz).date()
+    start = start or end - timedelta(days=364)
+    try:
+        return Response(get_completion_calendar(request.user, start, end, tz))
+    except CalendarRangeError as e:
+        return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)